@@ -0,0 +1,219 @@
+"""
+Response compression: brotli (when the `brotli` package is installed) or gzip.
+
+CompressionMiddleware compresses text-like responses (JSON, HTML, CSS, JS,
+SVG...) of at least COMPRESSION_MIN_SIZE bytes in the best encoding the
+client accepts. Streaming responses (sync and async) are compressed as they
+go and flushed every COMPRESSION_STREAM_FLUSH bytes of input, so the client
+gets output steadily without a sync-flush block (and a worse ratio) after
+every row of an NDJSON/CSV export. Already encoded responses (precompressed static
+files, see common/staticfiles.py) and `Cache-Control: no-transform` are left
+alone.
+
+HTML pages put CSRF tokens next to reflected input, which is what the BREACH
+attack needs. They only get gzip, with a random-length file name in the
+gzip header, the same mitigation as Django's GZipMiddleware.
+
+Settings (all optional):
+    COMPRESSION_MIN_SIZE = 500       # Bytes; smaller bodies aren't worth it
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 5   # 0-11; 4-6 is the usual choice for dynamic responses
+    COMPRESSION_STREAM_FLUSH = 32 * 1024  # Bytes of input between flushes of a stream
+"""
+import secrets
+import struct
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional: without it everything is gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'application/vnd.oai.openapi',
+    'application/manifest+json', 'image/svg+xml', 'image/x-icon',
+}
+HTML_PADDING = 100  # Up to this many random bytes in the gzip header of HTML responses
+
+
+def is_compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+    return (
+        content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+        or content_type.endswith(('+json', '+xml'))
+    )
+
+
+def accepted_encodings(header):
+    # {'gzip': 1.0, 'br': 0.5, '*': 0.0} from an Accept-Encoding header
+    accepted = {}
+    for part in header.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    return accepted
+
+
+def choose_encoding(header, html=False):
+    # 'br', 'gzip' or None for this Accept-Encoding
+    accepted = accepted_encodings(header)
+    fallback = accepted.get('*', 0.0)
+    for coding in ('br', 'gzip'):
+        if coding == 'br' and (brotli is None or html):
+            continue
+        if accepted.get(coding, fallback) > 0:
+            return coding
+    return None
+
+
+class GzipEncoder:
+    # Deflate with a gzip header and trailer written by hand, so a stream can
+    # be flushed after each chunk and the header can carry random padding
+    def __init__(self, level=6, padding=0):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.crc = 0
+        self.size = 0
+        name = secrets.token_hex(secrets.randbelow(padding // 2) + 1).encode() + b'\0' if padding else b''
+        # Magic, deflate, FNAME flag if padded, mtime 0, no extra flags, unknown OS
+        self.header = b'\x1f\x8b\x08' + (b'\x08' if name else b'\x00') + b'\0\0\0\0\x00\xff' + name
+
+    def compress(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        out = self.header + self.compressor.compress(data)
+        self.header = b''
+        return out
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.header + self.compressor.flush() + struct.pack('<II', self.crc & 0xffffffff, self.size & 0xffffffff)
+
+
+class BrotliEncoder:
+    def __init__(self, quality=5):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def make_encoder(coding, html=False):
+    if coding == 'br':
+        return BrotliEncoder(getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5))
+    return GzipEncoder(getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), HTML_PADDING if html else 0)
+
+
+def compress(coding, data, html=False):
+    encoder = make_encoder(coding, html)
+    return encoder.compress(data) + encoder.finish()
+
+
+def compress_part(encoder, chunk, pending):
+    # (output, bytes of input not flushed yet). Flushing costs a few bytes and
+    # resets the compressor's block, so only do it once enough input piled up
+    data = encoder.compress(chunk)
+    pending += len(chunk)
+    if pending >= getattr(settings, 'COMPRESSION_STREAM_FLUSH', 32 * 1024):
+        return data + encoder.flush(), 0
+    return data, pending
+
+
+def compress_stream(encoder, chunks):
+    pending = 0
+    for chunk in chunks:
+        data, pending = compress_part(encoder, chunk, pending)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+async def acompress_stream(encoder, chunks):
+    pending = 0
+    async for chunk in chunks:
+        data, pending = compress_part(encoder, chunk, pending)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+# Sync and async like common.middleware.DisableCSRFOnAPI
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if (
+            response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.has_header('Content-Encoding')
+            or not is_compressible(response.get('Content-Type', ''))
+            or 'no-transform' in response.get('Cache-Control', '')
+        ):
+            return response
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 500)
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length is not None and int(length) < min_size:
+                return response
+        elif len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        html = response['Content-Type'].startswith('text/html')
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), html)
+        if coding is None:
+            return response
+
+        if response.streaming:
+            encoder = make_encoder(coding, html)
+            if response.is_async:
+                response.streaming_content = acompress_stream(encoder, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(encoder, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(coding, response.content, html)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body isn't byte-identical any more: a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
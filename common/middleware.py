@@ -1,7 +1,29 @@
-from django.utils.deprecation import MiddlewareMixin
-from django.conf import settings
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+# Works in both WSGI and ASGI mode. Under ASGI, MiddlewareMixin would run
+# process_request() through sync_to_async (a thread hop on every request);
+# this only sets a flag, so it stays on the event loop.
+class DisableCSRFOnAPI:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        return await self.get_response(request)
 
-class DisableCSRFOnAPI(MiddlewareMixin):
     def process_request(self, request):
         if request.path.startswith('/product/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
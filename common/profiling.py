@@ -0,0 +1,273 @@
+"""
+Per-request profiling: where did the time go?
+
+ProfilingMiddleware measures, for a sample of requests:
+
+* db         number of queries and time spent in them (all connections)
+* serialize  DRF serializers and the fast list rows (store/rows.py)
+* render     JSON rendering
+* template   Django template rendering (needs the ProfiledDjangoTemplates backend)
+* view       from the view being called until its response is ready
+* total      the whole request, as seen by this middleware
+
+Sampled requests get a JSON log line on the "common.profiling" logger and,
+when they come from staff users or INTERNAL_IPS, a Server-Timing header
+(query counts and phase timings are internals, not for every client). Requests slower than PROFILING_SLOW_MS are
+logged at WARNING even when not sampled (with the total time only), and
+sampled slow requests include their slowest queries with the line of our
+code that ran them. Unsampled requests cost one random() and two clock reads.
+
+Settings (all optional):
+    PROFILING_ENABLED = True
+    PROFILING_SAMPLE_RATE = 0.05        # Share of requests profiled in detail
+    PROFILING_SLOW_MS = 500             # Log requests slower than this
+    PROFILING_SERVER_TIMING = 'internal'  # Server-Timing for staff/INTERNAL_IPS; True = everyone, False = nobody
+    PROFILING_QUERY_DUMP = 5            # Slowest queries logged for slow requests (0 = off)
+"""
+import contextvars
+import heapq
+import json
+import logging
+import os
+import random
+import sys
+import sysconfig
+import time
+from collections import defaultdict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('common.profiling')
+
+PHASES = ['db', 'serialize', 'render', 'template', 'view', 'total']
+
+_current = contextvars.ContextVar('profile', default=None)
+
+# Frames from these directories are never reported as a query's call site
+_LIBRARY_PATHS = tuple(
+    os.path.normcase(path) for path in {sysconfig.get_paths()['stdlib'], sysconfig.get_paths()['purelib']}
+) + (os.path.normcase(os.path.dirname(__file__)) + os.sep + 'profiling',)
+
+
+class Profile:
+    def __init__(self, query_dump):
+        self.phases = defaultdict(float)   # name -> seconds
+        self.running = set()               # Phases being timed right now (only the outermost call counts)
+        self.queries = 0
+        self.query_dump = query_dump
+        self.slowest = []                  # Heap of (seconds, sequence, sql, call site)
+        self.view_started = None
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.phases['db'] += seconds
+        if not self.query_dump:
+            return
+        entry = (seconds, self.queries)
+        if len(self.slowest) < self.query_dump:
+            heapq.heappush(self.slowest, entry + (sql, call_site()))
+        elif seconds > self.slowest[0][0]:
+            # Only queries that make it into the top N pay for the stack walk
+            heapq.heapreplace(self.slowest, entry + (sql, call_site()))
+
+    def slow_queries(self):
+        return [
+            {'ms': round(seconds * 1000, 2), 'sql': sql[:500], 'at': site}
+            for seconds, _, sql, site in sorted(self.slowest, reverse=True)
+        ]
+
+
+def call_site():
+    # First frame outside Django, the stdlib, site-packages and this module
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.normcase(frame.f_code.co_filename)
+        if not filename.startswith(_LIBRARY_PATHS):
+            return f'{os.path.relpath(frame.f_code.co_filename, settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def measure(name, function, *args, **kwargs):
+    # Run function, adding its wall time to phase `name` of the current profile
+    profile = _current.get()
+    if profile is None or name in profile.running:
+        return function(*args, **kwargs)
+    profile.running.add(name)
+    started = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.phases[name] += time.perf_counter() - started
+        profile.running.discard(name)
+
+
+def timed(name):
+    # Decorator form of measure()
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            return measure(name, function, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def query_wrapper(execute, sql, params, many, context):
+    # Installed on every connection; does nothing outside a profiled request
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+def install(connection, **kwargs):
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+connection_created.connect(install, dispatch_uid='common.profiling.install')
+
+
+class ProfilingMiddleware:
+    # Put it first in MIDDLEWARE so "total" covers the other middleware too
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view  # Keeps the handler from wrapping it in a thread
+        else:
+            self.process_view = self.sync_process_view
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', True)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.05)
+        self.slow_ms = getattr(settings, 'PROFILING_SLOW_MS', 500)
+        self.server_timing = getattr(settings, 'PROFILING_SERVER_TIMING', 'internal')
+        self.query_dump = getattr(settings, 'PROFILING_QUERY_DUMP', 5)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = self.stop(token)
+        timing = profile is not None and self.send_timing(request, getattr(request, 'user', None))
+        return self.finish(request, response, profile, started, timing)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile = self.stop(token)
+        timing = False
+        if profile is not None:
+            # request.user would load the session user synchronously
+            user = await request.auser() if self.server_timing == 'internal' and hasattr(request, 'auser') else None
+            timing = self.send_timing(request, user)
+        return self.finish(request, response, profile, started, timing)
+
+    def send_timing(self, request, user):
+        if self.server_timing != 'internal':
+            return bool(self.server_timing)
+        return (
+            settings.DEBUG or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+            or (user is not None and user.is_staff)
+        )
+
+    def start(self):
+        profile = None
+        if random.random() < self.sample_rate:
+            profile = Profile(self.query_dump)
+            for connection in connections.all(initialized_only=True):
+                install(connection)
+        return _current.set(profile), time.perf_counter()
+
+    def stop(self, token):
+        profile = _current.get()
+        _current.reset(token)
+        if profile is not None and profile.view_started is not None:
+            profile.phases['view'] = time.perf_counter() - profile.view_started
+        return profile
+
+    def sync_process_view(self, request, view_func, view_args, view_kwargs):
+        self.mark_view()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.mark_view()
+
+    def mark_view(self):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+    def finish(self, request, response, profile, started, timing=False):
+        total = time.perf_counter() - started
+        slow = total * 1000 >= self.slow_ms
+        if profile is None and not slow:
+            return response
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sampled': profile is not None,
+            'slow': slow,
+        }
+        if request.META.get('QUERY_STRING'):
+            record['query'] = request.META['QUERY_STRING']  # Lets manage.py benchmark --replay rebuild the URL
+        if profile is not None:
+            profile.phases['total'] = total
+            for name in PHASES[:-1]:
+                record[f'{name}_ms'] = round(profile.phases[name] * 1000, 2)
+            record['db_queries'] = profile.queries
+            if slow and profile.slowest:
+                record['slow_queries'] = profile.slow_queries()
+            if timing:
+                response['Server-Timing'] = server_timing(profile)
+
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
+        return response
+
+
+def server_timing(profile):
+    # e.g. db;dur=4.1;desc="3 queries", serialize;dur=1.2, ..., total;dur=9.8
+    parts = []
+    for name in PHASES:
+        part = f'{name};dur={profile.phases[name] * 1000:.2f}'
+        if name == 'db':
+            part += f';desc="{profile.queries} queries"'
+        parts.append(part)
+    return ', '.join(parts)
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        return measure('template', super().render, context, request)
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    # DjangoTemplates whose templates report their render time to the profiler
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,279 @@
+"""
+Per-client rate limiting and admission control.
+
+RateLimitMiddleware puts each request in a group by its URL name
+(RATE_LIMIT_VIEWS, e.g. 'catalog', 'search', 'auth', 'checkout') and then:
+
+* Rate limit: every client has a token bucket per group, refilled at `rate`
+  requests per second up to `burst`. An empty bucket answers 429 with a
+  Retry-After of when the next token arrives. Clients are the logged-in user
+  (session or a valid JWT), otherwise the IP address. Catalog requests with
+  ?search= count as 'search', which is much more expensive. In the 'auth'
+  group only submissions count, not loading the login or sign-up page.
+* Admission control: at most ADMISSION_MAX_CONCURRENCY requests run at once
+  in this process. The last ADMISSION_RESERVED slots are kept for the groups
+  in ADMISSION_PRIORITY (checkout and orders), so when the process is
+  saturated the other requests are shed with 503 + Retry-After and a
+  checkout still gets through. A streaming response keeps its slot until
+  it's closed, i.e. until its body has been sent.
+
+  The count is per process, so it only caps anything where one process runs
+  many requests at once: ASGI (uvicorn workers) or threaded WSGI workers
+  (gunicorn --threads / gthread). A sync gunicorn worker handles one request
+  at a time and never reaches the cap; its concurrency is the worker count.
+
+Buckets live in this process (RATE_LIMIT_STORE = 'local') or in the shared
+cache (RATE_LIMIT_STORE = 'cache', RATE_LIMIT_CACHE_ALIAS) so that all
+workers share one budget per client. The cache store reads and writes the
+bucket without a lock, so concurrent requests of one client can overshoot
+by a few; it's a limit against abuse, not an exact quota.
+
+Settings:
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_STORE = 'local'
+    RATE_LIMITS = {'search': (2, 20), ...}     # group -> (requests per second, burst)
+    RATE_LIMIT_VIEWS = {'product-list': 'catalog', ...}   # URL name -> group
+    RATE_LIMIT_PROXY_COUNT = 0                 # Trusted proxies adding X-Forwarded-For
+    ADMISSION_MAX_CONCURRENCY = 100            # 0 = no cap
+    ADMISSION_RESERVED = 10
+    ADMISSION_PRIORITY = ('checkout',)
+    ADMISSION_RETRY_AFTER = 1                  # Seconds, for shed requests
+"""
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+
+class LocalStore:
+    # Buckets in a dict of this process: exact, but per worker process
+    max_keys = 100000
+
+    def __init__(self):
+        self.buckets = {}   # key -> (tokens, updated)
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        # Returns 0 when a token was taken, else seconds until there is one
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (burst, now))
+            tokens, wait = refill_and_take(tokens, updated, rate, burst, now)
+            if len(self.buckets) >= self.max_keys and key not in self.buckets:
+                self.prune(now)
+            self.buckets[key] = (tokens, now)
+        return wait
+
+    def prune(self, now):
+        # Drop the half seen longest ago: their buckets are most likely full again
+        oldest = sorted(self.buckets.items(), key=lambda item: item[1][1])
+        for key, _ in oldest[:len(oldest) // 2]:
+            del self.buckets[key]
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheStore:
+    # Buckets in the shared cache, so all processes count together
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def take(self, key, rate, burst, now):
+        cache = caches[self.alias]
+        tokens, updated = cache.get(f'ratelimit:{key}') or (burst, now)
+        tokens, wait = refill_and_take(tokens, updated, rate, burst, now)
+        # Kept until the bucket would be full again, then it's the same as no entry
+        cache.set(f'ratelimit:{key}', (tokens, now), math.ceil((burst - tokens) / rate) + 1)
+        return wait
+
+    def clear(self):
+        pass  # Entries expire on their own
+
+
+def refill_and_take(tokens, updated, rate, burst, now):
+    tokens = min(burst, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+UNSAFE_ONLY = {'auth'}   # Groups where only POST & co. take tokens
+
+_local_store = LocalStore()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def get_store():
+    if getattr(settings, 'RATE_LIMIT_STORE', 'local') == 'cache':
+        return CacheStore(getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default'))
+    return _local_store
+
+
+def reset():
+    # Forget all local buckets and in-flight slots (tests: the test client
+    # only closes a streaming response once its body has been read)
+    global _in_flight
+    _local_store.clear()
+    with _in_flight_lock:
+        _in_flight = 0
+
+
+def request_group(request):
+    try:
+        name = resolve(request.path_info).url_name
+    except Resolver404:
+        return None
+    group = getattr(settings, 'RATE_LIMIT_VIEWS', {}).get(name)
+    if group == 'catalog' and request.GET.get('search'):
+        return 'search'
+    if group in UNSAFE_ONLY and request.method in SAFE_METHODS:
+        return None  # Showing the login form costs nothing; submitting it does
+    return group
+
+
+def client_ip(request):
+    # REMOTE_ADDR, or behind N trusted proxies the address the outermost one saw
+    proxies = getattr(settings, 'RATE_LIMIT_PROXY_COUNT', 0)
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_key(request, user=None):
+    # 'user:<id>' for a session or JWT user, else 'ip:<address>'.
+    # The JWT is only checked (signature, expiry), no query: a forged or
+    # expired token falls back to the IP, so rotating tokens gains nothing.
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Bearer '):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+        try:
+            return f'user:{AccessToken(header[7:].strip())[api_settings.USER_ID_CLAIM]}'
+        except (TokenError, KeyError):
+            pass
+    return f'ip:{client_ip(request)}'
+
+
+def too_many(detail, retry_after, status):
+    response = JsonResponse({'detail': detail}, status=status)
+    response['Retry-After'] = str(max(math.ceil(retry_after), 1))
+    return response
+
+
+def get_limit(group):
+    return getattr(settings, 'RATE_LIMITS', {}).get(group) if group else None
+
+
+def check_rate(request, group, user):
+    # None, or the 429 response
+    rate, burst = get_limit(group)
+    wait = get_store().take(f'{group}:{client_key(request, user)}', rate, burst, time.time())
+    if wait:
+        return too_many('Request was throttled.', wait, 429)
+    return None
+
+
+def admit(group):
+    # Take an in-flight slot: True, or False when the request should be shed
+    global _in_flight
+    limit = getattr(settings, 'ADMISSION_MAX_CONCURRENCY', 0)
+    if group not in getattr(settings, 'ADMISSION_PRIORITY', ()):
+        limit -= getattr(settings, 'ADMISSION_RESERVED', 0)
+    with _in_flight_lock:
+        if _in_flight >= limit:
+            return False
+        _in_flight += 1
+    return True
+
+
+def release():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def in_flight():
+    return _in_flight
+
+
+def release_when_sent(response):
+    # A streaming body is produced while the server sends it, after the
+    # middleware returns: the slot goes back when the handler closes it
+    if response.streaming:
+        response._resource_closers.append(release)
+    else:
+        release()
+    return response
+
+
+# Sync and async like DisableCSRFOnAPI: no thread hop under ASGI
+class RateLimitMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return self.get_response(request)
+        group = request_group(request)
+        if get_limit(group):
+            response = check_rate(request, group, getattr(request, 'user', None))
+            if response is not None:
+                return response
+        response, capped = self.admit(group)
+        if response is not None or not capped:
+            return response or self.get_response(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            release()
+            raise
+        return release_when_sent(response)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return await self.get_response(request)
+        group = request_group(request)
+        if get_limit(group):
+            # request.user would load the session user synchronously
+            user = await request.auser() if hasattr(request, 'auser') else None
+            response = check_rate(request, group, user)
+            if response is not None:
+                return response
+        response, capped = self.admit(group)
+        if response is not None or not capped:
+            return response or await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            release()
+            raise
+        return release_when_sent(response)
+
+    def admit(self, group):
+        # (503 response or None, whether a slot was taken and must be released)
+        if not getattr(settings, 'ADMISSION_MAX_CONCURRENCY', 0):
+            return None, False
+        if not admit(group):
+            return too_many('Server busy, try again shortly.', getattr(settings, 'ADMISSION_RETRY_AFTER', 1), 503), False
+        return None, True
@@ -0,0 +1,181 @@
+"""
+Cached, database-backed sessions that avoid needless writes.
+
+Works like django.contrib.sessions.backends.cached_db (reads hit the cache,
+the database is the fallback), with two changes:
+
+* save() is skipped when the session payload didn't actually change, unless the
+  stored expiry date needs a refresh (SESSION_REFRESH_INTERVAL seconds).
+* If only keys listed in SESSION_DEFERRED_KEYS changed, the cache is updated
+  right away and the database write is queued and flushed in batches
+  (every SESSION_WRITE_DELAY seconds or SESSION_WRITE_BATCH sessions).
+
+Enable with SESSION_ENGINE = 'common.sessions', only with a shared
+SESSION_CACHE_ALIAS (Redis, memcached): entries are kept for the session's
+age, so a per-process cache would hide logouts and cart changes made in one
+worker from all the others. store/checks.py refuses local memory.
+"""
+import atexit
+import copy
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger('django.contrib.sessions')
+
+KEY_PREFIX = 'common.sessions'
+
+_pending = {}           # session_key -> Session instance waiting for a deferred write
+_pending_since = None   # time.monotonic() of the oldest pending write
+_pending_lock = threading.Lock()
+
+
+def deferred_keys():
+    return frozenset(getattr(settings, 'SESSION_DEFERRED_KEYS', ()))
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._snapshot = None   # Session data as loaded, to detect real changes
+        self._written = None    # When the database row was last written (epoch seconds)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            entry = None  # e.g. invalid key on memcached, treat as a miss
+
+        if entry is None:
+            s = self._get_session_from_db()
+            if s:
+                # The row doesn't say when it was written (expire_date depends on
+                # set_expiry()), so the next save refreshes it and records the time
+                entry = {'data': self.decode(s.session_data), 'written': None}
+                self._cache.set(self.cache_key, entry, self.get_expiry_age(expiry=s.expire_date))
+            else:
+                entry = {'data': {}, 'written': None}
+
+        self._snapshot = copy.deepcopy(entry['data'])
+        self._written = entry['written']
+        return entry['data']
+
+    def changed_keys(self, data):
+        if self._snapshot is None:
+            return None  # Never loaded: unknown, write it
+        keys = set(data) | set(self._snapshot)
+        return {key for key in keys if data.get(key) != self._snapshot.get(key)}
+
+    def needs_refresh(self):
+        interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', 60 * 60)
+        return self._written is None or time.time() - self._written >= interval
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+
+        data = self._get_session(no_load=must_create)
+        if not must_create and not self.needs_refresh():
+            changed = self.changed_keys(data)
+            if changed is not None and not changed:
+                return  # Same payload, nothing to write
+            if changed is not None and changed <= deferred_keys():
+                self.cache_entry(data, self._written)
+                defer_write(self.create_model_instance(data))
+                return
+
+        DBStore.save(self, must_create)
+        forget_write(self.session_key)  # This write supersedes any queued one
+        self._written = time.time()
+        self.cache_entry(data, self._written)
+
+    def cache_entry(self, data, written):
+        self._snapshot = copy.deepcopy(data)
+        try:
+            self._cache.set(self.cache_key, {'data': data, 'written': written}, self.get_expiry_age())
+        except Exception:
+            logger.exception('Error saving to cache (%s)', self._cache)
+
+    def delete(self, session_key=None):
+        forget_write(session_key or self.session_key)
+        super().delete(session_key)
+
+    # The async API shares the sync code path
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        purge_expired()
+
+
+def defer_write(session):
+    global _pending_since
+    with _pending_lock:
+        if not _pending:
+            _pending_since = time.monotonic()
+        _pending[session.session_key] = session
+        due = (
+            len(_pending) >= getattr(settings, 'SESSION_WRITE_BATCH', 100)
+            or time.monotonic() - _pending_since >= getattr(settings, 'SESSION_WRITE_DELAY', 30)
+        )
+    if due:
+        flush_deferred()
+
+
+def forget_write(session_key):
+    if session_key:
+        with _pending_lock:
+            _pending.pop(session_key, None)
+
+
+def flush_deferred():
+    # One UPDATE for every queued session. bulk_update only touches rows that
+    # still exist, so a session deleted meanwhile (logout) is never brought back.
+    global _pending_since
+    with _pending_lock:
+        sessions = list(_pending.values())
+        _pending.clear()
+        _pending_since = None
+    if not sessions:
+        return 0
+    model = SessionStore.get_model_class()
+    try:
+        with transaction.atomic():
+            model.objects.bulk_update(sessions, ['session_data', 'expire_date'])
+    except Exception:
+        logger.exception('Error flushing %d deferred session writes', len(sessions))
+        return 0
+    return len(sessions)
+
+
+def purge_expired(batch_size=5000):
+    # Delete expired sessions a batch at a time (one short transaction each)
+    # instead of one huge DELETE that locks the table
+    model = SessionStore.get_model_class()
+    now = timezone.now()
+    deleted = 0
+    while True:
+        keys = list(model.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size])
+        if not keys:
+            return deleted
+        with transaction.atomic():
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
+
+
+atexit.register(flush_deferred)
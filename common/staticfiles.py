@@ -0,0 +1,111 @@
+"""
+Static files for production: hashed names, precompressed copies, cached forever.
+
+CompressedManifestStaticFilesStorage (the 'staticfiles' storage in
+settings_production) makes `collectstatic` write content-hashed copies
+(admin/css/base.5af66c1b1797.css, which {% static %} links to) and, next to
+each compressible one, `.br` (with the `brotli` package) and `.gz`
+versions at maximum compression. They're made once per deploy, so
+requests never pay for compressing static files.
+
+serve() answers STATIC_URL from STATIC_ROOT: it sends the precompressed
+copy the client accepts. The copies themselves (name.css.gz) are 404s. Hashed names are sent with
+`Cache-Control: max-age=<1 year>, immutable`; a changed file gets a new name,
+so browsers and CDNs never need to revalidate. Other names get
+STATIC_MAX_AGE and Last-Modified.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .compression import accepted_encodings, brotli, is_compressible
+
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')   # ManifestStaticFilesStorage: name.<md5[:12]>.ext
+FOREVER = 365 * 24 * 60 * 60
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))           # Preferred first
+
+
+def content_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    min_size = 200       # Smaller files aren't worth a second request path
+    min_saving = 0.05    # Keep a compressed copy only if it's at least 5% smaller
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if is_compressible(content_type(name)):
+                self.write_compressed(name)
+
+    def write_compressed(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < self.min_size:
+            return
+        copies = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            copies['.br'] = brotli.compress(data, quality=11)
+        for extension, compressed in copies.items():
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            if len(compressed) <= len(data) * (1 - self.min_saving):
+                self._save(name + extension, ContentFile(compressed))
+
+
+def serve(request, path):
+    root = getattr(settings, 'STATIC_ROOT', None)
+    if not root:
+        raise Http404('STATIC_ROOT is not set')
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+    original, extension = os.path.splitext(full_path)
+    if extension in dict(ENCODINGS).values() and os.path.isfile(original):
+        # One of our precompressed copies: it's sent for the original name,
+        # with Content-Encoding. On its own it would go out as plain CSS/JS
+        # and be compressed a second time by CompressionMiddleware
+        raise Http404(path)
+
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    send, encoding, has_copies = full_path, None, False
+    for coding, extension in ENCODINGS:
+        if os.path.isfile(full_path + extension):
+            has_copies = True
+            if encoding is None and accepted.get(coding, accepted.get('*', 0)) > 0:
+                send, encoding = full_path + extension, coding
+
+    hashed = bool(HASHED_NAME.search(path))
+    modified = os.stat(full_path).st_mtime
+    if not hashed and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), modified):
+        return HttpResponseNotModified()
+
+    response = FileResponse(open(send, 'rb'), content_type=content_type(full_path))
+    del response.headers['Content-Disposition']  # Set from the file name by FileResponse; not a download
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if has_copies:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    response.headers['Last-Modified'] = http_date(modified)
+    if hashed:
+        response.headers['Cache-Control'] = f'public, max-age={FOREVER}, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={getattr(settings, "STATIC_MAX_AGE", 60)}'
+    return response
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,11 +47,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common.profiling.ProfilingMiddleware',   # First, so its total covers everything below
+    'common.compression.CompressionMiddleware',  # Before anything that sets or reads the body
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'common.ratelimit.RateLimitMiddleware',   # After auth: session users are limited per user, not per IP
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'common.middleware.DisableCSRFOnAPI',
@@ -61,7 +64,7 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'common.profiling.ProfiledDjangoTemplates',  # DjangoTemplates + render timing
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -99,6 +102,91 @@ else:
     }
 
 
+# Cache
+# Redis when REDIS_URL is set (needed as soon as more than one process runs: cache
+# invalidation goes through it, see store/checks.py); local memory otherwise
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'catalog',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Sessions
+# With a shared cache: read from the cache, fall back to the database, and only
+# write when the data changed. A per-process cache would let every worker keep
+# its own copy of a session (logins, logouts, carts), so then plain DB sessions.
+if os.environ.get('REDIS_URL'):
+    SESSION_ENGINE = 'common.sessions'
+SESSION_REFRESH_INTERVAL = 60 * 60   # Re-write an unchanged session at most once an hour to push its expiry
+SESSION_DEFERRED_KEYS = []           # Non-critical session keys whose DB writes may be batched
+SESSION_WRITE_DELAY = 30             # Flush batched session writes at least this often (seconds)
+SESSION_WRITE_BATCH = 100            # ...or once this many sessions are waiting
+
+# Response compression (common/compression.py): brotli if installed, else gzip
+COMPRESSION_MIN_SIZE = 500        # Bytes
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_STREAM_FLUSH = 32 * 1024  # Bytes of streamed input between flushes
+
+# Request profiling (common/profiling.py): Server-Timing header + JSON log line
+PROFILING_ENABLED = True
+PROFILING_SAMPLE_RATE = 0.05     # Share of requests profiled in detail
+PROFILING_SLOW_MS = 500          # Requests slower than this are always logged
+PROFILING_SERVER_TIMING = 'internal'  # Header only for staff users and INTERNAL_IPS (True = everyone)
+PROFILING_QUERY_DUMP = 5         # Slowest queries (with call site) logged for slow requests
+INTERNAL_IPS = config('INTERNAL_IPS', default='', cast=Csv())  # e.g. the load-test host
+
+# Rate limiting and admission control (common/ratelimit.py)
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_STORE = 'local'        # 'cache' to share the buckets between processes (through RATE_LIMIT_CACHE_ALIAS)
+RATE_LIMIT_CACHE_ALIAS = 'default'
+RATE_LIMIT_PROXY_COUNT = config('RATE_LIMIT_PROXY_COUNT', default=0, cast=int)  # Proxies in front adding X-Forwarded-For
+RATE_LIMITS = {                   # Group -> (requests per second, burst) per user or IP
+    'catalog': (20, 100),
+    'search': (2, 20),            # Catalog requests with ?search=
+    'auth': (0.2, 10),            # Login, sign-up and token POSTs (not loading the forms): 12 a minute
+    'checkout': (2, 20),
+}
+RATE_LIMIT_VIEWS = {              # URL name -> group; other URLs have no rate limit
+    'product_list': 'catalog', 'product_detail': 'catalog',
+    'product-list': 'catalog', 'product-detail': 'catalog', 'product-facets': 'catalog',
+    'category-list': 'catalog', 'category-detail': 'catalog',
+    'async_product_list': 'catalog', 'async_product_detail': 'catalog', 'async_category_list': 'catalog',
+    'login': 'auth', 'register': 'auth', 'token_obtain_pair': 'auth', 'token_refresh': 'auth',
+    'checkout': 'checkout',
+    'order-list': 'orders', 'order-detail': 'orders', 'order_history': 'orders', 'mark_order_paid': 'orders',
+}
+ADMISSION_MAX_CONCURRENCY = 100   # Requests running at once per process (0 = no cap)
+ADMISSION_RESERVED = 10           # ...of which only these groups may use the last ones:
+ADMISSION_PRIORITY = ('checkout', 'orders')
+ADMISSION_RETRY_AFTER = 1
+
+# Background jobs (store/jobs.py), run by `manage.py run_jobs`
+JOBS_POLL_INTERVAL = 1.0       # Seconds between polls when the queue is empty
+JOBS_BATCH_SIZE = 20           # Jobs claimed per query
+JOBS_RETRY_DELAY = 10          # Seconds before the first retry, doubled for each further one
+JOBS_MAX_RETRY_DELAY = 3600
+JOBS_LOCK_TIMEOUT = 600        # A job running longer than this is taken to have lost its worker
+
+# Order confirmation mails (sent by the job queue)
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='shop@localhost')
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 300  # Seconds; invalidation is done by generation counters, not TTL
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,6 +222,7 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_MAX_AGE = 60 * 60  # Seconds, for static files without a content hash (hashed ones are cached for a year)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -154,10 +243,14 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'store.authentication.CachedJWTAuthentication',  # JWTAuthentication without a user query per request
     )
 }
 
+# Users resolved by the API authentication are cached per process (store/authentication.py)
+AUTH_USER_CACHE_TTL = 60         # Seconds; with a shared cache, changes to a user invalidate it before that
+AUTH_USER_CACHE_SIZE = 10000     # Users/tokens kept per process
+
 
 from datetime import timedelta
 
@@ -21,7 +21,11 @@ SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+# collectstatic writes content-hashed names plus .br/.gz copies; served by common.staticfiles.serve
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'common.staticfiles.CompressedManifestStaticFilesStorage'},
+}
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 print("=== Production settings loaded ===")
@@ -11,6 +11,7 @@ from django.contrib import admin
 # Import path (to define URL patterns) and include (to include app URLs)
 from django.urls import (
     path,
+    re_path,
     include,
 )
 
@@ -22,7 +23,8 @@ from django.conf import settings
 # Import static to serve media files in development
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from store import views
+from store import views, async_views
+from common import staticfiles
 from store.views import ProductViewSet, CategoryViewSet, OrderViewSet
 from rest_framework_simplejwt.views import(
     TokenObtainPairView,
@@ -43,8 +45,18 @@ urlpatterns = [
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/cache/stats/', views.api_cache_stats, name='cache_stats'),
+    path('api/reports/sales/', views.api_sales_report, name='sales_report'),
+    path('api/cart/', views.api_cart, name='api_cart'),
+    # Async catalog reads for ASGI deployments (store/async_views.py)
+    path('api/async/products/', async_views.product_list, name='async_product_list'),
+    path('api/async/products/<int:pk>/', async_views.product_detail, name='async_product_detail'),
+    path('api/async/categories/', async_views.category_list, name='async_category_list'),
     path('api/', include(router.urls))
 ]
 
+# Collected static files (hashed, precompressed) from STATIC_ROOT; runserver serves them itself in DEBUG
+urlpatterns.append(re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', staticfiles.serve, name='static'))
+
 # Serve media files (images, uploads) during development
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
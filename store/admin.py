@@ -1,30 +1,140 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import Product, Category
-from .models import Order, OrderItem
+from .models import Order, OrderItem, Job
+from . import search
+
+
+# Admin paginator that never runs an unbounded COUNT(*).
+# Unfiltered lists use the table size the database already knows (planner
+# statistics on PostgreSQL, the highest id elsewhere); filtered lists are
+# counted up to `exact_limit` rows, so "more than that" shows as exact_limit + 1.
+class EstimatedCountPaginator(Paginator):
+    exact_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate > self.exact_limit:
+                return estimate
+        return queryset.order_by()[:self.exact_limit + 1].count()
+
+
+def estimate_rows(model, using='default'):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:  # -1 / 0 until the table has been analyzed
+            return row[0]
+    return model._base_manager.using(using).aggregate(top=Max('pk'))['top'] or 0
+
+
+# A sidebar filter with a text box instead of one link per value (e.g. per user)
+class InputFilter(admin.SimpleListFilter):
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ((),)  # Not used, but the filter only shows when there are lookups
+
+    def choices(self, changelist):
+        # Only the "All" link, plus the other active filters to keep as hidden inputs
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = [
+            (key, value)
+            for key, values in changelist.get_filters_params().items() if key != self.parameter_name
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        yield all_choice
+
+
+class UserFilter(InputFilter):
+    title = 'user (username or id)'
+    parameter_name = 'user'
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        if value.isdigit():
+            return queryset.filter(user_id=int(value))
+        return queryset.filter(user__username=value)
+
+
+# Products: searched through the full-text index (also used by the product autocomplete)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'sku', 'category', 'price', 'stock', 'updated_at')
+    list_select_related = ('category',)
+    list_filter = ('category',)          # Categories are few, a link each is fine
+    search_fields = ('name', 'sku')
+    autocomplete_fields = ('category',)
+    ordering = ('-created_at', '-id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False       # Skip the second COUNT(*) on filtered lists
+
+    def get_search_results(self, request, queryset, search_term):
+        backend = search.get_search_backend()
+        words = search.search_words([search_term])
+        if backend is None or not words:
+            return super().get_search_results(request, queryset, search_term)
+        by_sku = queryset.filter(sku=search_term.strip())
+        if by_sku.exists():
+            return by_sku, False
+        return backend.search(queryset, words), False
+
+
+class CategoryAdmin(admin.ModelAdmin):
+    search_fields = ('name',)  # Needed by the category autocomplete
 
 # Register Product and Category models to show in Django admin
-admin.site.register(Product)
-admin.site.register(Category)
+admin.site.register(Product, ProductAdmin)
+admin.site.register(Category, CategoryAdmin)
 
 # Inline display for OrderItem inside Order admin (like showing items in one order)
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0  # No extra empty rows when adding items
 
+    # Search box instead of a dropdown with every product
+    autocomplete_fields = ('product',)
+
+    # Item rows show the product name, load it in the same query
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 # Custom admin panel for Orders
 class OrderAdmin(admin.ModelAdmin):
     # Columns to show in the order list (order ID, user, status, total price, date)
     list_display = ('id', 'user', 'status', 'total', 'created_at')
-    
+
+    # Join users into the changelist query instead of one query per row
+    list_select_related = ('user',)
+
     # Filters on the right to quickly filter by status, date, or user
-    list_filter = ('status', 'created_at', 'user')
-    
-    # Search box to find orders by user’s username or order ID
-    search_fields = ('user__username', 'id')
-    
+    # (the user is typed in: a link per user doesn't scale)
+    list_filter = ('status', 'created_at', UserFilter)
+
+    # Search box to find orders by order ID or the start of the user's username
+    search_fields = ('=id', '^user__username')
+
+    # Newest first, served by the (created_at, id) index
+    ordering = ('-created_at', '-id')
+
+    # Counts and the user field that stay fast on big tables
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    autocomplete_fields = ('user',)
+
     # Show order items inline inside order details page
     inlines = [OrderItemInline]
-    
+
     # Allow changing order status directly from the list view
     list_editable = ('status', )
 
@@ -32,4 +142,30 @@ class OrderAdmin(admin.ModelAdmin):
 admin.site.register(Order, OrderAdmin)
 
 # Register OrderItem separately (can be edited individually if needed)
-admin.site.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'product', 'quantity', 'price')
+    list_select_related = ('order__user', 'product')  # Order.__str__ shows the username
+    autocomplete_fields = ('order', 'product')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+admin.site.register(OrderItem, OrderItemAdmin)
+
+
+# Background jobs: mostly to look at (and retry) the failed ones
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['retry']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry(self, request, queryset):
+        count = queryset.exclude(status='running').update(status='queued', attempts=0, run_at=timezone.now(), last_error='')
+        self.message_user(request, f'{count} job(s) queued again.')
+
+admin.site.register(Job, JobAdmin)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        from . import signals  # Connect cache invalidation receivers
+        from . import tasks  # noqa: F401  Register background job tasks
+        from . import checks  # noqa: F401  Register system checks
+        post_migrate.connect(signals.ensure_search_index, sender=self)
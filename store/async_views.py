@@ -0,0 +1,147 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, ValidationError
+from rest_framework.request import Request
+
+from .authentication import CachedJWTAuthentication
+from . import cache as catalog_cache
+from . import fieldsets
+from .filters import InStockFilter, ProductFilterSet, ProductOrderingFilter
+from .mixins import make_etag, not_modified, set_validators
+from .models import Category, Product
+from .pagination import ProductPagination
+from .renderers import FastJSONRenderer
+from .search import FullTextSearchFilter
+from .serializers import category_rows, product_rows
+from .views import ProductViewSet
+
+# Async versions of the catalog read endpoints, for running under ASGI
+# (config/asgi.py). They give the same JSON as the DRF viewsets, but every
+# query goes through the async ORM, so a slow request doesn't hold a worker.
+#   /api/async/products/            filters, ?search=, ?ordering=, cursors, ?fields=/?omit=
+#   /api/async/products/<id>/
+#   /api/async/categories/          JWT required, like /api/categories/
+# Only keyset cursors are supported here, not the legacy ?page= mode.
+
+MEDIA_TYPE = 'application/json'
+
+
+def render(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type=MEDIA_TYPE)
+
+
+def api_errors(view):
+    # Turn DRF exceptions into the same JSON error bodies DRF would send
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            return render(detail, status=exc.status_code)
+    return wrapper
+
+
+async def authenticate(request):
+    # JWT, like DEFAULT_AUTHENTICATION_CLASSES; only the user lookup needs a thread
+    if 'HTTP_AUTHORIZATION' not in request.META:
+        raise NotAuthenticated()
+    result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    if result is None:
+        raise NotAuthenticated()
+    return result[0]
+
+
+def filter_products(api_request, view):
+    # Same filters as ProductViewSet.filter_backends, without queries of their own
+    queryset = Product.objects.with_stock()
+    for field, lookups in ProductFilterSet._meta.fields.items():
+        for lookup in lookups:
+            name = field if lookup == 'exact' else f'{field}__{lookup}'  # e.g. ?price__gte=10
+            queryset = filter_param(api_request, queryset, name, name, Product._meta.get_field(field).to_python)
+    for name, declared in ProductFilterSet.declared_filters.items():  # ?stock=, ?stock__gte=, ...
+        lookup = f'{declared.field_name}__{declared.lookup_expr}'
+        queryset = filter_param(api_request, queryset, name, lookup, declared.field.to_python)
+    queryset = InStockFilter().filter_queryset(api_request, queryset, view)
+    queryset = FullTextSearchFilter().filter_queryset(api_request, queryset, view)
+    return ProductOrderingFilter().filter_queryset(api_request, queryset, view)
+
+
+def filter_param(api_request, queryset, name, lookup, to_python):
+    value = api_request.query_params.get(name)
+    if value in (None, ''):
+        return queryset
+    try:
+        value = to_python(value)
+    except DjangoValidationError:
+        raise ValidationError({name: ['Enter a valid value.']})
+    return queryset.filter(**{lookup: value})
+
+
+async def list_response(request, api_request, namespace, queryset, builder, paginator=None):
+    # ConditionalGetMixin + CatalogCacheMixin + FastListMixin, async
+    etag = make_etag('list', request.get_full_path(), MEDIA_TYPE, await catalog_cache.aget_generation(namespace))
+    response = not_modified(request, etag)
+    if response is not None:
+        return set_validators(response, etag)
+
+    key = await catalog_cache.arequest_key(namespace, 'list', api_request)
+    data = await catalog_cache.alookup(key)
+    hit = data is not None
+    if not hit:
+        builder = builder.narrow(*fieldsets.from_request(api_request))
+        columns = builder.columns()
+        if paginator is not None:
+            columns += [key.lstrip('-') for key in paginator.get_keys(queryset)]
+        rows = queryset.values(*dict.fromkeys(columns))
+        if paginator is not None:
+            page = await paginator.apaginate_queryset(rows, api_request)
+            data = paginator.get_paginated_response(builder.build(page, request)).data
+        else:
+            data = builder.build([row async for row in rows], request)
+        await catalog_cache.astore(key, data)
+
+    response = render(data)
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return set_validators(response, etag)
+
+
+@require_GET
+@api_errors
+async def product_list(request):
+    api_request = Request(request)
+    queryset = filter_products(api_request, ProductViewSet())
+    return await list_response(
+        request, api_request, 'product', queryset, product_rows,
+        paginator=ProductPagination(),
+    )
+
+
+@require_GET
+@api_errors
+async def product_detail(request, pk):
+    api_request = Request(request)
+    builder = product_rows.narrow(*fieldsets.from_request(api_request))
+    # One query gives both the validators and the data
+    columns = dict.fromkeys(builder.columns() + ['updated_at', 'slot_stock'])
+    row = await Product.objects.with_stock().filter(pk=pk).values(*columns).afirst()
+    if row is None:
+        raise NotFound()
+
+    etag = make_etag('detail', request.get_full_path(), MEDIA_TYPE, row['id'], row['updated_at'], row['slot_stock'])
+    last_modified = row['updated_at'] if not row['slot_stock'] else None
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = render(builder.build([row], request)[0])
+    return set_validators(response, etag, last_modified)
+
+
+@require_GET
+@api_errors
+async def category_list(request):
+    await authenticate(request)
+    return await list_response(request, Request(request), 'category', Category.objects.all(), category_rows)
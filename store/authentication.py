@@ -0,0 +1,127 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import cache as catalog_cache
+
+# JWT / token authentication without a user query on every request.
+#
+# Users (and API tokens) are kept for AUTH_USER_CACHE_TTL seconds in a small
+# dict in each process. Each entry remembers a generation from the catalog
+# cache (store/cache.py): 'user:<id>' for a user, 'tokens' for token rows.
+# Saving or deleting a user or a token bumps it once the change commits
+# (store/signals.py). With a shared cache (Redis, see REDIS_URL) every
+# process then drops its copy on the next request, so deactivation, a
+# password change or a logout take effect at once. With the local-memory
+# cache only the process that made the change sees the bump; the others
+# keep their copy until the TTL runs out (`manage.py check --deploy` warns
+# about that setup, store/checks.py). Writes that skip signals (queryset.update()) need
+# invalidate_user().
+#
+# A hit costs one shared-cache get per entry instead of a database query.
+
+_entries = OrderedDict()   # key -> (expires, generation, value), oldest first
+_lock = threading.Lock()
+
+
+def get_ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+
+def get_size():
+    return getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000)
+
+
+def invalidate_user(user_id):
+    # After the commit: a request between the write and the commit would
+    # otherwise cache the old row under the new generation
+    transaction.on_commit(lambda: catalog_cache.bump_generation(f'user:{user_id}'))
+
+
+def invalidate_tokens():
+    transaction.on_commit(lambda: catalog_cache.bump_generation('tokens'))
+
+
+def cached(key, namespace, load):
+    # load() -> value or None; values are kept until the TTL or until the
+    # generation of `namespace` moves on. Read before loading, so a change
+    # committed meanwhile leaves the entry already out of date.
+    current = catalog_cache.get_generation(namespace)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > now and entry[1] == current:
+            return entry[2]
+    value = load()
+    if value is None:
+        return None  # Not remembered: random keys would push out real entries
+    with _lock:
+        _entries[key] = (now + get_ttl(), current, value)
+        _entries.move_to_end(key)
+        while len(_entries) > get_size():
+            _entries.popitem(last=False)
+    return value
+
+
+def get_user(user_id):
+    # The user with this pk, or None; returns a copy, since views may set
+    # attributes on request.user and the cached one is shared between threads
+    user = cached(f'user:{user_id}', f'user:{user_id}', lambda: get_user_model()._default_manager.filter(pk=user_id).first())
+    return copy.copy(user)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # JWTAuthentication with the user lookup cached; the active and
+    # password-change (CHECK_REVOKE_TOKEN) checks still run on every request
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_FIELD not in ('id', 'pk'):
+            return super().get_user(validated_token)  # Generations are keyed by pk
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_user(user_id)
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise exceptions.AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication with the token and its user cached separately
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        token = cached(f'token:{key}', 'tokens', lambda: model.objects.filter(key=key).first())
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        user = get_user(token.user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        token = copy.copy(token)
+        token.user = user
+        return (user, token)
@@ -0,0 +1,290 @@
+import http.cookiejar
+import json
+import random
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .datagen import WORDS
+from .loadtest import percentile
+from .models import Product
+
+# Request-level benchmarks for the main user flows (manage.py benchmark).
+#
+# A scenario is one user action, e.g. "open a product page" or "add to cart and
+# check out", made of one or more requests. Each iteration is timed end to end
+# and its SQL queries are counted, then p50/p95/p99 and queries per iteration
+# are reported and can be compared against a saved baseline.
+#
+# Drivers send the requests:
+#   InProcessDriver  Django's test Client against the configured database,
+#                    queries counted with CaptureQueriesContext
+#   HttpDriver       a running server (runserver, gunicorn, uvicorn); queries come
+#                    from the Server-Timing header, so set PROFILING_SAMPLE_RATE=1 and
+#                    run it from an INTERNAL_IPS address (or PROFILING_SERVER_TIMING=True)
+
+
+class Workload:
+    # Inputs for the scenarios: which products exist, what to search for
+    def __init__(self, product_ids, seed=1, words=WORDS):
+        if not product_ids:
+            raise ValueError('The benchmark needs products; run manage.py generate_data first.')
+        self.product_ids = list(product_ids)
+        self.random = random.Random(seed)
+        self.words = words
+
+    def product_id(self):
+        return self.random.choice(self.product_ids)
+
+    def word(self):
+        return self.random.choice(self.words)
+
+
+def sample_products(count=1000, seed=1, run=50):
+    # In-stock product ids from random points of the pk range: short index
+    # range scans instead of ORDER BY RANDOM(), which sorts the whole table
+    bounds = Product.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    rng = random.Random(seed)
+    in_stock = Product.objects.filter(stock__gt=0).order_by('pk').values_list('pk', flat=True)
+    ids = set()
+    for _ in range(2 * count // run + 1):  # Runs overlap on small tables, so a few spare ones
+        ids.update(in_stock.filter(pk__gte=rng.randint(bounds['low'], bounds['high']))[:run])
+        if len(ids) >= count:
+            break
+    return sorted(ids)[:count]
+
+
+class InProcessDriver:
+    def __init__(self, user, using='default'):
+        self.client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+        self.client.force_login(user)  # Session for the HTML pages
+        self.token = str(RefreshToken.for_user(user).access_token)  # JWT for the API
+        self.connection = connections[using]
+        self.reset()
+
+    def reset(self):
+        self.queries = 0
+        self.errors = 0
+
+    def get(self, path, auth=False):
+        return self.send('get', path, None, auth)
+
+    def post(self, path, data, auth=False):
+        return self.send('post', path, data, auth)
+
+    def send(self, method, path, data, auth):
+        headers = {'authorization': f'Bearer {self.token}'} if auth else {}
+        with CaptureQueriesContext(self.connection) as queries:
+            response = getattr(self.client, method)(path, data, headers=headers)
+        self.queries += len(queries)
+        if response.status_code >= 400:
+            self.errors += 1
+        return response.status_code
+
+
+class HttpDriver:
+    SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+    def __init__(self, base_url, username, password, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+        self.reset()
+        self.login(username, password)
+
+    def reset(self):
+        self.queries = 0   # None once a response comes without Server-Timing
+        self.errors = 0
+
+    def login(self, username, password):
+        self.get('/login/')  # Sets the csrftoken cookie
+        status = self.post('/login/', {'username': username, 'password': password})
+        body = json.dumps({'username': username, 'password': password}).encode()
+        request = urllib.request.Request(
+            self.base_url + '/api/token/', body, {'Content-Type': 'application/json'},
+        )
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                self.token = json.load(response)['access']
+        except (urllib.error.URLError, KeyError, ValueError) as exc:
+            raise ValueError(f'Could not log in to {self.base_url} as {username}: {exc}')
+        if status >= 400:
+            raise ValueError(f'Could not log in to {self.base_url} as {username}: HTTP {status}')
+        self.reset()
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def get(self, path, auth=False):
+        return self.send('GET', path, None, auth)
+
+    def post(self, path, data, auth=False):
+        data = dict(data, csrfmiddlewaretoken=self.csrf_token())
+        return self.send('POST', path, urllib.parse.urlencode(data).encode(), auth)
+
+    def send(self, method, path, body, auth):
+        headers = {'Referer': self.base_url + path}
+        if auth:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = urllib.request.Request(self.base_url + path, body, headers, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                status, timing = response.status, response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as exc:
+            status, timing = exc.code, exc.headers.get('Server-Timing')
+        except OSError:
+            status, timing = 599, None  # Connection error
+        match = self.SERVER_TIMING_QUERIES.search(timing or '')
+        if match is None:
+            self.queries = None
+        elif self.queries is not None:
+            self.queries += int(match.group(1))
+        if status >= 400:
+            self.errors += 1
+        return status
+
+
+# Scenarios: function(driver, workload), one user action per call
+
+def catalog_list(driver, workload):
+    ordering = workload.random.choice(['', 'price', '-price', '-created_at'])
+    driver.get('/api/products/' + (f'?ordering={ordering}' if ordering else ''))
+
+
+def catalog_search(driver, workload):
+    driver.get(f'/api/products/?search={workload.word()}')
+
+
+def catalog_detail(driver, workload):
+    driver.get(f'/api/products/{workload.product_id()}/')
+
+
+def order_history(driver, workload):
+    driver.get('/api/orders/', auth=True)
+
+
+def checkout(driver, workload):
+    # Add a product to the cart, then place the order (a redirect back to the
+    # cart when it sold out still counts as a handled request)
+    driver.post(f'/product/{workload.product_id()}/', {'quantity': 1})
+    driver.post('/checkout/', {'name': 'Bench User', 'address': '1 Benchmark Road', 'phone': '555-0100'})
+
+
+SCENARIOS = {
+    'catalog_list': catalog_list,
+    'catalog_search': catalog_search,
+    'catalog_detail': catalog_detail,
+    'order_history': order_history,
+    'checkout': checkout,
+}
+
+
+def summarize(timings, queries, errors):
+    timings = sorted(seconds * 1000 for seconds in timings)
+    return {
+        'iterations': len(timings),
+        'errors': errors,
+        'p50': round(percentile(timings, 50), 2),
+        'p95': round(percentile(timings, 95), 2),
+        'p99': round(percentile(timings, 99), 2),
+        'queries': round(sum(queries) / len(queries), 2) if queries and None not in queries else None,
+    }
+
+
+def measure(driver, action, iterations, warmup=0):
+    for _ in range(warmup):
+        action()
+    timings, queries, errors = [], [], 0
+    for _ in range(iterations):
+        driver.reset()
+        started = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - started)
+        queries.append(driver.queries)
+        errors += driver.errors
+    return summarize(timings, queries, errors)
+
+
+def run(driver, workload, names, iterations=50, warmup=3):
+    return {
+        name: measure(driver, lambda name=name: SCENARIOS[name](driver, workload), iterations, warmup)
+        for name in names
+    }
+
+
+# Replaying recorded traffic
+
+# Access log lines: ... "GET /api/products/?search=x HTTP/1.1" ...
+ACCESS_LOG = re.compile(r'"?(GET|HEAD) (/\S*)')
+NUMBERS = re.compile(r'/\d+(?=/|$)')
+
+
+def parse_log(lines):
+    # (method, path) of the GET/HEAD requests in common.profiling JSON lines or
+    # access log lines; writes aren't replayed
+    requests = []
+    for line in lines:
+        start = line.find('{')
+        if start != -1:
+            try:
+                record = json.loads(line[start:])
+            except ValueError:
+                record = None
+            if isinstance(record, dict) and 'path' in record:
+                if record.get('method') in ('GET', 'HEAD'):
+                    query = record.get('query')
+                    requests.append((record['method'], record['path'] + (f'?{query}' if query else '')))
+                continue
+        match = ACCESS_LOG.search(line)
+        if match:
+            requests.append(match.groups())
+    return requests
+
+
+def replay(driver, requests, repeat=1):
+    # Results per endpoint, with ids folded together: "GET /api/products/{id}/"
+    groups = defaultdict(list)
+    for method, path in requests:
+        endpoint = NUMBERS.sub('/{id}', path.split('?', 1)[0])
+        groups[f'{method} {endpoint}'].append(path)
+    results = {}
+    for name, paths in sorted(groups.items()):
+        paths = iter(paths * max(repeat, 1))
+        results[name] = measure(driver, lambda paths=paths: driver.get(next(paths), auth=True), len(groups[name]) * max(repeat, 1))
+    return results
+
+
+def regressions(results, baseline, tolerance=0.25, noise_ms=1.0):
+    # What got worse than the baseline: p50/p95 by more than `tolerance`
+    # (and more than noise_ms), queries per iteration by half a query or more,
+    # and new errors
+    problems = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ('p50', 'p95'):
+            limit = base[metric] * (1 + tolerance)
+            if result[metric] > limit and result[metric] - base[metric] > noise_ms:
+                problems.append(f'{name}: {metric} {result[metric]} ms > {base[metric]} ms + {tolerance:.0%}')
+        if base['queries'] is not None and result['queries'] is not None and result['queries'] > base['queries'] + 0.5:
+            problems.append(f'{name}: {result["queries"]} queries per iteration, baseline {base["queries"]}')
+        if result['errors'] > base['errors']:
+            problems.append(f'{name}: {result["errors"]} errors, baseline {base["errors"]}')
+    return problems
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Product, Category
+from . import cache as catalog_cache
+from . import inventory
+
+# Bulk catalog import/export for supplier feeds.
+# Import reads the request body line by line and upserts products in batches
+# keyed by SKU; export streams rows straight from a database iterator.
+# Neither ever holds the whole catalog in memory.
+# A feed's stock is the product's total: for hot products (stock split into
+# InventorySlot rows) it goes through inventory.set_stock(), not the column.
+
+EXPORT_FIELDS = ['sku', 'name', 'description', 'price', 'stock', 'category']
+UPSERT_FIELDS = ['name', 'description', 'price', 'stock', 'category', 'updated_at']
+
+
+class ImportRowSerializer(serializers.Serializer):
+    # Validation only: no unique/foreign key validators, those would cost a query per row
+    sku = serializers.CharField(max_length=64)
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField(allow_blank=True, default='')
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0, default=0)
+    category = serializers.CharField()  # Category slug
+
+
+def read_ndjson(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield None, f'Invalid JSON: {exc}'
+            continue
+        if not isinstance(row, dict):
+            yield None, 'Each line must be a JSON object'
+            continue
+        yield row, None
+
+
+def read_csv(lines):
+    for row in csv.DictReader(line.decode('utf-8') if isinstance(line, bytes) else line for line in lines):
+        yield row, None
+
+
+def import_products(rows, batch_size=1000):
+    # rows: iterable of (dict, parse_error) pairs from read_ndjson/read_csv
+    categories = dict(Category.objects.values_list('slug', 'pk'))  # Small table, load it once
+    result = {'upserted': 0, 'batches': 0, 'errors': []}
+    batch = {}
+
+    for number, (row, error) in enumerate(rows, start=1):
+        if error:
+            result['errors'].append({'row': number, 'errors': {'non_field_errors': [error]}})
+            continue
+        serializer = ImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            result['errors'].append({'row': number, 'sku': row.get('sku'), 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        category_id = categories.get(data['category'])
+        if category_id is None:
+            result['errors'].append({'row': number, 'sku': data['sku'], 'errors': {'category': ['Unknown category.']}})
+            continue
+
+        # Keyed by SKU: a repeated SKU in one batch keeps the last row (ON CONFLICT can't touch a row twice)
+        batch[data['sku']] = Product(
+            sku=data['sku'], name=data['name'], description=data['description'],
+            price=data['price'], stock=data['stock'], category_id=category_id,
+        )
+        if len(batch) >= batch_size:
+            result['upserted'] += write_batch(batch)
+            result['batches'] += 1
+            batch = {}
+
+    if batch:
+        result['upserted'] += write_batch(batch)
+        result['batches'] += 1
+    if result['upserted']:
+        # bulk_create() sends no post_save signals
+        catalog_cache.bump_generation('product')
+    return result
+
+
+def write_batch(batch):
+    # INSERT .. ON CONFLICT (sku) DO UPDATE, one statement per batch
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            list(batch.values()),
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=UPSERT_FIELDS,
+        )
+        # The upsert put the total into the pool column; spread it over the
+        # slots instead of adding it to what they already hold
+        for product in Product.objects.filter(sku__in=list(batch), stock_slots__gt=0).only('pk', 'sku'):
+            inventory.set_stock(product, batch[product.sku].stock)
+    return len(batch)
+
+
+def export_rows(chunk_size=2000):
+    # Server-side cursor on PostgreSQL, chunked fetches on SQLite
+    # Stock is the total (slots included), what an import of the same feed writes back
+    queryset = (
+        Product.objects.with_stock().order_by('pk')
+        .values_list('sku', 'name', 'description', 'price', 'stock', 'stock_slots', 'slot_stock', 'category__slug')
+    )
+    rows = queryset.iterator(chunk_size=chunk_size)
+    for sku, name, description, price, stock, stock_slots, slot_stock, category in rows:
+        yield {
+            'sku': sku, 'name': name, 'description': description,
+            'price': str(price), 'stock': stock + slot_stock if stock_slots else stock, 'category': category,
+        }
+
+
+def export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
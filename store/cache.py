@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Versioned read-through cache for catalog API responses.
+# Every cached entry is keyed with the current "generation" of the model it
+# depends on. Saving or deleting a Product/Category bumps the generation, so
+# old entries are simply never looked up again (they expire on their own).
+#
+# The counters only reach other processes (web workers, run_jobs, management
+# commands) through a shared cache backend: with a per-process one, a write
+# elsewhere leaves this process serving stale pages until they time out.
+# `manage.py check --deploy` warns about a local-memory CATALOG_CACHE_ALIAS.
+#
+# Checkout changes stock with queryset.update() (no signals), so it bumps the
+# product generation itself once the order commits.
+
+GENERATION_KEY = 'catalog:gen:{}'
+ENTRY_KEY = 'catalog:{}:{}:{}'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_generation(namespace):
+    cache = get_cache()
+    key = GENERATION_KEY.format(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from a fresh value (not 1) so an evicted counter can never
+        # line up with entries written under an older generation
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*namespaces):
+    cache = get_cache()
+    for namespace in namespaces:
+        key = GENERATION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)  # Counter missing or evicted
+
+
+def make_key(namespace, kind, *parts):
+    # e.g. catalog:product:1718000000000:<md5 of scheme/host/path/params>
+    raw = '|'.join(str(part) for part in parts)
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return ENTRY_KEY.format(namespace, get_generation(namespace), f'{kind}:{digest}')
+
+
+def request_key(namespace, kind, request, *extra):
+    # Filter, search, ordering and page params all live in the query string,
+    # so a sorted copy of it identifies the page. Scheme and host too: pages
+    # carry absolute URLs (images, next/previous links).
+    params = sorted((k, v) for k in request.query_params for v in request.query_params.getlist(k))
+    return make_key(namespace, kind, request.scheme, request.get_host(), request.path, params, *extra)
+
+
+def lookup(key):
+    value = get_cache().get(key)
+    _record('misses' if value is None else 'hits')
+    return value
+
+
+def store(key, value):
+    get_cache().set(key, value, get_timeout())
+
+
+# Async versions for the ASGI views (store/async_views.py), through Django's async cache API
+
+async def aget_generation(namespace):
+    cache = get_cache()
+    key = GENERATION_KEY.format(namespace)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, time.time_ns(), None)
+        generation = await cache.aget(key)
+    return generation
+
+
+async def arequest_key(namespace, kind, request, *extra):
+    params = sorted((k, v) for k in request.query_params for v in request.query_params.getlist(k))
+    raw = '|'.join(str(part) for part in (request.scheme, request.get_host(), request.path, params, *extra))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return ENTRY_KEY.format(namespace, await aget_generation(namespace), f'{kind}:{digest}')
+
+
+async def alookup(key):
+    value = await get_cache().aget(key)
+    _record('misses' if value is None else 'hits')
+    return value
+
+
+async def astore(key, value):
+    await get_cache().aset(key, value, get_timeout())
+
+
+def _record(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats['hits'] = 0
+        _stats['misses'] = 0
@@ -0,0 +1,169 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Cart, CartLine, Product
+from . import cache as catalog_cache
+
+# Cart storage.
+# Logged-in users have a Cart row with CartLines; many line changes are applied
+# in one transaction with bulk writes. Anonymous visitors keep the old
+# {product_id: quantity} dict in the session, merged into the Cart on login.
+
+TOTALS_KEY = 'cart:{}:{}:{}:totals'
+TOTALS_TIMEOUT = 60 * 60
+
+
+def get_cart(user):
+    cart, _ = Cart.objects.get_or_create(user=user)
+    return cart
+
+
+class CartConflict(Exception):
+    # The client edited an older version of the cart
+    def __init__(self, version):
+        self.version = version
+        super().__init__(f'Cart has changed (now version {version})')
+
+
+def apply_changes(cart, changes, expected_version=None):
+    # changes: [{'product': id, 'quantity': n} | {'product': id, 'delta': +-n} | {'product': id, 'remove': True}]
+    # applied in order; a line that drops to 0 is removed. Constant number of queries.
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+        if expected_version is not None and expected_version != cart.version:
+            raise CartConflict(cart.version)
+        ids = {change['product'] for change in changes}
+        lines = {line.product_id: line for line in cart.lines.filter(product_id__in=ids)}
+        quantities = {product_id: line.quantity for product_id, line in lines.items()}
+
+        for change in changes:
+            product_id = change['product']
+            if change.get('remove'):
+                quantity = 0
+            elif change.get('quantity') is not None:
+                quantity = change['quantity']
+            else:
+                quantity = quantities.get(product_id, 0) + change.get('delta', 0)
+            quantities[product_id] = max(quantity, 0)
+
+        created = [
+            CartLine(cart=cart, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items() if quantity and product_id not in lines
+        ]
+        changed = []
+        for product_id, line in lines.items():
+            if quantities[product_id] and quantities[product_id] != line.quantity:
+                line.quantity = quantities[product_id]
+                changed.append(line)
+        removed = [product_id for product_id in lines if not quantities[product_id]]
+
+        if created:
+            CartLine.objects.bulk_create(created)
+        if changed:
+            CartLine.objects.bulk_update(changed, ['quantity'])
+        if removed:
+            cart.lines.filter(product_id__in=removed).delete()
+        Cart.objects.filter(pk=cart.pk).update(version=F('version') + 1, updated_at=timezone.now())
+        cart.refresh_from_db(fields=['version', 'updated_at'])
+    return cart
+
+
+def clear(cart):
+    with transaction.atomic():
+        cart.lines.all().delete()
+        Cart.objects.filter(pk=cart.pk).update(version=F('version') + 1, updated_at=timezone.now())
+        cart.refresh_from_db(fields=['version', 'updated_at'])
+    return cart
+
+
+def totals(cart):
+    # SUM(quantity) and SUM(quantity * price) in one query, memoized until the
+    # cart changes (version) or any product changes (catalog generation, e.g. a new price)
+    key = TOTALS_KEY.format(cart.pk, cart.version, catalog_cache.get_generation('product'))
+    result = cache.get(key)
+    if result is None:
+        result = cart.lines.aggregate(
+            items=Coalesce(Sum('quantity'), 0),
+            total=Coalesce(
+                Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Decimal('0.00'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+        cache.set(key, result, TOTALS_TIMEOUT)
+    return result
+
+
+def lines(cart):
+    # {product_id: quantity}, the shape place_order() takes
+    return dict(cart.lines.values_list('product_id', 'quantity'))
+
+
+def merge_session_cart(request, user):
+    # Called on login: add the anonymous session cart on top of the saved cart
+    session_cart = request.session.get('cart') or {}
+    if not session_cart:
+        return
+    existing = set(Product.objects.filter(pk__in=session_cart.keys()).values_list('pk', flat=True))
+    changes = [
+        {'product': int(product_id), 'delta': int(quantity)}
+        for product_id, quantity in session_cart.items() if int(product_id) in existing
+    ]
+    if changes:
+        apply_changes(get_cart(user), changes)
+    request.session['cart'] = {}
+
+
+# Helpers for the HTML views: same calls whether the cart is in the DB or the session
+
+def cart_items(request):
+    # Returns ([{'product', 'quantity', 'subtotal'}], total)
+    if request.user.is_authenticated:
+        cart = get_cart(request.user)
+        items = [
+            {'product': line.product, 'quantity': line.quantity, 'subtotal': line.product.price * line.quantity}
+            for line in cart.lines.select_related('product').order_by('pk')
+        ]
+        return items, totals(cart)['total']
+
+    session_cart = request.session.get('cart', {})
+    items = []
+    total = 0
+    for product in Product.objects.filter(pk__in=session_cart.keys()):
+        quantity = session_cart[str(product.pk)]
+        subtotal = product.price * quantity
+        total += subtotal
+        items.append({'product': product, 'quantity': quantity, 'subtotal': subtotal})
+    return items, total
+
+
+def contains(request, product_id):
+    if request.user.is_authenticated:
+        return CartLine.objects.filter(cart__user=request.user, product_id=product_id).exists()
+    return str(product_id) in request.session.get('cart', {})
+
+
+def change(request, changes):
+    if request.user.is_authenticated:
+        apply_changes(get_cart(request.user), changes)
+        return
+
+    session_cart = request.session.get('cart', {})
+    for item in changes:
+        product_id = str(item['product'])
+        if item.get('remove'):
+            quantity = 0
+        elif item.get('quantity') is not None:
+            quantity = item['quantity']
+        else:
+            quantity = session_cart.get(product_id, 0) + item.get('delta', 0)
+        if quantity > 0:
+            session_cart[product_id] = quantity
+        else:
+            session_cart.pop(product_id, None)
+    request.session['cart'] = session_cart
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+# Caches that several processes must agree on. Generation counters
+# (store/cache.py) only reach the process that bumped them when the cache is
+# local memory, so web workers, run_jobs and management commands would each
+# see their own catalog until its pages time out: a warning for
+# `manage.py check --deploy`. Cached sessions (common/sessions.py) are worse:
+# a logout or a cart change in one worker stays invisible to the others for
+# the session's whole age, so that setup is refused outside DEBUG.
+
+LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def is_process_local(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in LOCAL_BACKENDS
+
+
+@register('caches', deploy=True)
+def check_catalog_cache(app_configs, **kwargs):
+    alias = getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')
+    if settings.DEBUG or not is_process_local(alias):
+        return []
+    return [Warning(
+        f"CATALOG_CACHE_ALIAS '{alias}' is a local-memory cache: catalog invalidation "
+        'does not reach the other processes, which serve stale pages for up to CATALOG_CACHE_TIMEOUT.',
+        hint='Set REDIS_URL (or point CATALOG_CACHE_ALIAS at another shared cache) when more than one process runs.',
+        id='store.W001',
+    )]
+
+
+@register('caches')
+def check_session_cache(app_configs, **kwargs):
+    if settings.DEBUG or settings.SESSION_ENGINE != 'common.sessions':
+        return []
+    if not is_process_local(settings.SESSION_CACHE_ALIAS):
+        return []
+    return [Error(
+        f"SESSION_ENGINE 'common.sessions' needs a shared cache, SESSION_CACHE_ALIAS "
+        f"'{settings.SESSION_CACHE_ALIAS}' is local memory: each process would serve its own copy of a session.",
+        hint="Set REDIS_URL, or use 'django.contrib.sessions.backends.db'.",
+        id='store.E002',
+    )]
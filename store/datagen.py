@@ -0,0 +1,166 @@
+import random
+import time
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .loader import reset_sequences
+from .models import Category, Order, OrderItem, Product
+from . import cache as catalog_cache
+
+# Synthetic catalog and order history for benchmarks (manage.py generate_data).
+# Rows go in with multi-row INSERTs and explicit primary keys, one batch at a
+# time, so even 1M products / 10M order items never sit in memory at once.
+# The same seed always produces the same rows.
+
+ADJECTIVES = [
+    'red', 'blue', 'green', 'black', 'white', 'silver', 'golden', 'compact', 'wireless', 'portable',
+    'classic', 'vintage', 'smart', 'heavy', 'light', 'organic', 'premium', 'budget', 'ultra', 'mini',
+]
+NOUNS = [
+    'laptop', 'phone', 'camera', 'headphones', 'speaker', 'watch', 'keyboard', 'mouse', 'monitor', 'tablet',
+    'jacket', 'shirt', 'shoes', 'backpack', 'lamp', 'chair', 'desk', 'kettle', 'blender', 'bicycle',
+]
+FILLER = [
+    'with', 'and', 'for', 'everyday', 'use', 'durable', 'design', 'fast', 'shipping', 'quality',
+    'battery', 'cotton', 'steel', 'warranty', 'gift', 'home', 'office', 'travel', 'sport', 'kids',
+]
+WORDS = ADJECTIVES + NOUNS  # Good ?search= terms for generated products
+
+BENCH_USERNAME = 'bench'
+BENCH_PASSWORD = 'bench-password'
+
+
+def get_bench_user():
+    # The user benchmarks log in as; owns part of the generated order history
+    user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+    if created:
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+    return user
+
+
+class Generator:
+    def __init__(self, seed=1, batch_size=5000, using='default', progress=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.using = using
+        self.progress = progress
+        self.now = timezone.now()
+        self.counts = {}
+
+    def next_id(self, model):
+        return (model._base_manager.using(self.using).aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def insert(self, model, objects):
+        # raw=True keeps our created_at/updated_at instead of auto_now(_add)
+        if not objects:
+            return
+        with transaction.atomic(using=self.using):
+            model._base_manager.using(self.using)._insert(
+                objects, fields=model._meta.concrete_fields, using=self.using, raw=True,
+            )
+        label = model._meta.label
+        self.counts[label] = self.counts.get(label, 0) + len(objects)
+        if self.progress:
+            self.progress(label, self.counts[label])
+
+    def some_time_ago(self, days):
+        return self.now - timedelta(seconds=self.random.randrange(days * 24 * 60 * 60))
+
+    def categories(self, count):
+        first = self.next_id(Category)
+        ids = range(first, first + count)
+        self.insert(Category, [
+            Category(pk=pk, name=f'Synthetic {pk}', slug=f'syn-{pk}', updated_at=self.now) for pk in ids
+        ])
+        return ids
+
+    def users(self, count):
+        first = self.next_id(User)
+        ids = range(first, first + count)
+        password = make_password(None)  # Unusable: generated users never log in
+        for start in range(first, first + count, self.batch_size):
+            self.insert(User, [
+                User(pk=pk, username=f'syn{pk}', password=password, date_joined=self.some_time_ago(365))
+                for pk in range(start, min(start + self.batch_size, first + count))
+            ])
+        return ids
+
+    def products(self, count, category_ids):
+        # Returns (product ids, price in cents per product) for the order generator
+        first = self.next_id(Product)
+        prices = array('l')
+        for start in range(first, first + count, self.batch_size):
+            batch = []
+            for pk in range(start, min(start + self.batch_size, first + count)):
+                cents = self.random.randrange(100, 200000)
+                prices.append(cents)
+                created = self.some_time_ago(730)
+                batch.append(Product(
+                    pk=pk, sku=f'SYN-{pk:08d}',
+                    name=f'{self.random.choice(ADJECTIVES).title()} {self.random.choice(NOUNS)} {pk}',
+                    description=' '.join(self.random.choice(FILLER + WORDS) for _ in range(self.random.randrange(20, 40))),
+                    price=Decimal(cents) / 100, stock=self.random.randrange(0, 500),
+                    category_id=self.random.choice(category_ids), image='',
+                    created_at=created, updated_at=created, stock_slots=0,
+                ))
+            self.insert(Product, batch)
+        return range(first, first + count), prices
+
+    def orders(self, count, items_per_order, user_ids, bench_user, product_ids, prices):
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        order_id = self.next_id(Order)
+        item_id = self.next_id(OrderItem)
+        orders, items = [], []
+        for number in range(count):
+            # The bench user gets the first orders so "order history" has something to show
+            user_id = bench_user.pk if number < 50 else self.random.choice(user_ids)
+            total = 0
+            for _ in range(self.random.randrange(1, 2 * items_per_order)):  # Averages items_per_order
+                index = self.random.randrange(len(product_ids))
+                quantity = self.random.randrange(1, 4)
+                total += prices[index] * quantity
+                items.append(OrderItem(
+                    pk=item_id, order_id=order_id, product_id=product_ids[index],
+                    quantity=quantity, price=Decimal(prices[index]) / 100,
+                ))
+                item_id += 1
+            created = self.some_time_ago(365)
+            orders.append(Order(
+                pk=order_id, user_id=user_id, name=f'Customer {user_id}', address=f'{order_id} Synthetic Street',
+                phone='555-0100', total=Decimal(total) / 100, status=self.random.choice(statuses),
+                created_at=created, updated_at=created,
+            ))
+            order_id += 1
+            if len(items) >= self.batch_size:
+                self.insert(Order, orders)   # Parents first
+                self.insert(OrderItem, items)
+                orders, items = [], []
+        self.insert(Order, orders)
+        self.insert(OrderItem, items)
+
+
+def generate(products=1000, orders=1000, items_per_order=10, users=100, categories=20,
+             seed=1, batch_size=5000, using='default', progress=None):
+    started = time.monotonic()
+    generator = Generator(seed=seed, batch_size=batch_size, using=using, progress=progress)
+    bench_user = get_bench_user()
+    category_ids = generator.categories(max(categories, 1))
+    user_ids = generator.users(max(users, 1))
+    product_ids, prices = generator.products(products, category_ids)
+    if orders and products:
+        generator.orders(orders, max(items_per_order, 1), user_ids, bench_user, product_ids, prices)
+
+    reset_sequences(using, [Category, User, Product, Order, OrderItem])
+    catalog_cache.bump_generation('product', 'category')  # Raw inserts send no signals
+    return {
+        'rows': generator.counts,
+        'seconds': round(time.monotonic() - started, 2),
+    }
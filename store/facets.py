@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from . import cache as catalog_cache
+from .models import in_stock_condition
+
+# Facet counts for the storefront filters (GET /api/products/facets/):
+# products per category, per price bucket and in stock, for the current
+# filters. All three come from one GROUP BY (category, price bucket) query,
+# folded together in Python, and are cached per filter signature.
+
+# Lower bounds of the price buckets; the last bucket has no upper bound
+DEFAULT_PRICE_BUCKETS = [0, 10, 25, 50, 100, 250, 500, 1000]
+
+# Query params that change which products match. Ordering, cursors, page
+# size and ?fields= don't change the counts, so they aren't part of the key
+FILTER_PARAMS = ('category', 'price', 'price__gte', 'price__lte', 'stock', 'stock__gte', 'stock__lte', 'in_stock', 'search')
+
+
+def price_buckets():
+    return getattr(settings, 'CATALOG_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+
+
+def bucket_expression(bounds):
+    # Index of the bucket a product's price falls in
+    whens = [When(price__lt=upper, then=Value(index)) for index, upper in enumerate(bounds[1:])]
+    return Case(*whens, default=Value(len(bounds) - 1), output_field=IntegerField())
+
+
+def signature(request):
+    return sorted(
+        (name, value) for name in FILTER_PARAMS for value in request.query_params.getlist(name) if value != ''
+    )
+
+
+def compute(queryset):
+    bounds = price_buckets()
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=bucket_expression(bounds))
+        .values('category', 'category__name', 'category__slug', 'price_bucket')
+        .annotate(count=Count('id'), in_stock=Count('id', filter=in_stock_condition()))
+    )
+    categories = {}
+    buckets = [0] * len(bounds)
+    total = in_stock = 0
+    for row in rows:
+        category = categories.setdefault(row['category'], {
+            'id': row['category'], 'name': row['category__name'], 'slug': row['category__slug'], 'count': 0,
+        })
+        category['count'] += row['count']
+        buckets[row['price_bucket']] += row['count']
+        total += row['count']
+        in_stock += row['in_stock']
+    return {
+        'count': total,
+        'in_stock': in_stock,
+        'categories': sorted(categories.values(), key=lambda category: (-category['count'], category['name'])),
+        'price': [
+            {'min': lower, 'max': bounds[index + 1] if index + 1 < len(bounds) else None, 'count': buckets[index]}
+            for index, lower in enumerate(bounds)
+        ],
+    }
+
+
+def get_facets(request, get_queryset):
+    # Cached under the product generation, like the list pages themselves;
+    # get_queryset() (the filtered products) is only called on a miss
+    key = catalog_cache.make_key('product', 'facets', signature(request))
+    facets = catalog_cache.lookup(key)
+    if facets is None:
+        facets = compute(get_queryset())
+        catalog_cache.store(key, facets)
+    return facets
@@ -0,0 +1,168 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import Serializer
+
+# Sparse fieldsets for the API.
+#   ?fields=id,name,price      only these fields
+#   ?omit=description,image    everything but these
+# Nested fields use dots: /api/orders/?fields=id,total,items.quantity,items.product.name
+# Both parameters are parsed into trees like
+#   {'id': {}, 'items': {'quantity': {}, 'product': {'name': {}}}}
+# where {} means "the whole field". The same trees narrow the SQL: .only() on the
+# serializer path, fewer .values() columns on the fast list path (store/rows.py).
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse(value):
+    if not value:
+        return None
+    tree = {}
+    for item in value.split(','):
+        parts = [part.strip() for part in item.split('.')]
+        if not all(parts):
+            continue  # Skip empty entries like "name,,price"
+        node = tree
+        for part in parts:
+            node = node.setdefault(part, {})
+    return tree or None
+
+
+def from_request(request):
+    # (fields, omit) trees; only reads narrow the output, writes always see every field
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, None
+    params = getattr(request, 'query_params', request.GET)
+    return parse(params.get(FIELDS_PARAM)), parse(params.get(OMIT_PARAM))
+
+
+def child(tree, name):
+    # Selection below a nested field; None means "no restriction"
+    if tree is None:
+        return None
+    return tree.get(name) or None
+
+
+def at(tree, path):
+    for name in path:
+        tree = child(tree, name)
+    return tree
+
+
+def pick(names, fields=None, omit=None):
+    # Field names to keep, in serializer order
+    for param, tree in ((FIELDS_PARAM, fields), (OMIT_PARAM, omit)):
+        unknown = [name for name in tree or () if name not in names]
+        if unknown:
+            raise ValidationError({param: [f'Unknown field(s): {", ".join(unknown)}']})
+    return [
+        name for name in names
+        if (fields is None or name in fields) and not (omit and omit.get(name) == {})
+    ]
+
+
+def narrow_queryset(queryset, serializer_class, fields=None, omit=None):
+    # .only() the columns the kept fields read, drop joins/prefetches nobody renders
+    if fields is None and omit is None:
+        return queryset
+    return narrow(queryset, serializer_class, fields, omit)
+
+
+def narrow(queryset, serializer_class, fields, omit, required=()):
+    # Also used for the querysets of nested Prefetch()es, which are narrowed to
+    # their serializer's fields even without a selection below them.
+    # `required` columns are read by Django itself (a prefetch's foreign key).
+    joined = select_paths(queryset.query.select_related) if isinstance(queryset.query.select_related, dict) else []
+    read = read_columns(queryset.model, serializer_class, fields, omit, joined)
+    if read is None:
+        return queryset
+    columns, relations = read
+
+    if joined:
+        queryset = queryset.select_related(None)
+        paths = [path for path in joined if path.split('__')[0] in columns]
+        if paths:
+            queryset = queryset.select_related(*paths)
+    lookups = []
+    for lookup in queryset._prefetch_related_lookups:
+        name = getattr(lookup, 'prefetch_to', lookup).split('__')[0]
+        if name in relations:
+            lookups.append(narrow_prefetch(queryset.model, lookup, relations[name], child(fields, name), child(omit, name)))
+    return queryset.prefetch_related(None).prefetch_related(*lookups).only(*columns, *required)
+
+
+def read_columns(model, serializer_class, fields, omit, joined=()):
+    # (columns, relations) for the kept fields: the model columns they read,
+    # with those of select_related() rows in `joined` as 'product__name', and
+    # the reverse/many-to-many fields they render ({name: serializer field}).
+    # None when a field reads a property or method: no telling which columns.
+    serializer_fields = {
+        name: field for name, field in serializer_class().fields.items() if not field.write_only
+    }
+    keep = pick(list(serializer_fields), fields, omit)
+    field_columns = getattr(serializer_class, 'field_columns', {})
+
+    columns = {model._meta.pk.name}
+    relations = {}
+    whole = set()   # Joined rows some field reads entirely
+    for name in keep:
+        field = serializer_fields[name]
+        for source in field_columns.get(name) or [field.source]:
+            path = source.split('.')
+            try:
+                model_field = model._meta.get_field(path[0])
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete:
+                relations[path[0]] = field
+                continue
+            columns.add(path[0])
+            below = [join.split('__', 1)[1] for join in joined if join.startswith(path[0] + '__')]
+            if path[0] not in joined and not below:
+                continue
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, Serializer):
+                read = read_columns(model_field.related_model, type(nested), child(fields, name), child(omit, name), below)
+            elif len(path) == 2:
+                read = ({path[1]}, {})  # e.g. source='user.username'
+            else:
+                read = None
+            if read is None:
+                whole.add(path[0])
+            else:
+                columns.update(f'{path[0]}__{column}' for column in read[0])
+    # A partly listed row would load its other columns one query per row
+    columns = {column for column in columns if column.split('__')[0] not in whole or '__' not in column}
+    return columns, relations
+
+
+def narrow_prefetch(model, lookup, field, fields, omit):
+    # Prefetch('items', queryset=...) narrowed to what the nested serializer
+    # renders; deeper lookups and non-serializer fields are left as they are
+    nested = getattr(field, 'child', field)
+    name = getattr(lookup, 'prefetch_to', lookup)
+    if '__' in name or not isinstance(nested, Serializer):
+        return lookup
+    relation = model._meta.get_field(name)
+    queryset = getattr(lookup, 'queryset', None)
+    if queryset is None:
+        queryset = relation.related_model._default_manager.all()
+    required = [relation.field.name] if relation.one_to_many else []  # Matches rows back to their parent
+    return Prefetch(
+        getattr(lookup, 'prefetch_through', name),
+        queryset=narrow(queryset, type(nested), fields, omit, required),
+        to_attr=getattr(lookup, 'to_attr', None),
+    )
+
+
+def select_paths(tree, prefix=''):
+    # {'user': {'profile': {}}} -> ['user__profile']
+    paths = []
+    for name, children in tree.items():
+        if children:
+            paths.extend(select_paths(children, f'{prefix}{name}__'))
+        else:
+            paths.append(prefix + name)
+    return paths
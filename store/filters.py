@@ -0,0 +1,51 @@
+from django import forms
+from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .models import Product
+
+# Product list filters that don't map onto a single model field
+
+
+class InStockFilter(BaseFilterBackend):
+    # ?in_stock=true hides sold-out products, hot ones included (see in_stock_condition())
+    param = 'in_stock'
+    true_values = ('1', 'true', 'yes', 'on')
+
+    def filter_queryset(self, request, queryset, view):
+        if request.query_params.get(self.param, '').lower() in self.true_values:
+            return queryset.in_stock()
+        return queryset
+
+
+class StockFilter(filters.NumberFilter):
+    # ?stock= on everything that can be sold: a hot product's stock column is
+    # only the pool, the rest is in its slots (Product.objects.with_stock())
+    field_class = forms.IntegerField
+
+    def __init__(self, lookup_expr='exact', **kwargs):
+        super().__init__(field_name='sellable_stock', lookup_expr=lookup_expr, **kwargs)
+
+
+class ProductFilterSet(filters.FilterSet):
+    stock = StockFilter()
+    stock__gte = StockFilter(lookup_expr='gte')
+    stock__lte = StockFilter(lookup_expr='lte')
+
+    class Meta:
+        model = Product
+        fields = {'category': ['exact'], 'price': ['exact', 'gte', 'lte']}
+
+
+class ProductOrderingFilter(OrderingFilter):
+    # ?ordering=stock sorts by the sellable stock too, like ?stock=
+    aliases = {'stock': 'sellable_stock'}
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        return [
+            ('-' if term.startswith('-') else '') + self.aliases.get(term.lstrip('-'), term.lstrip('-'))
+            for term in ordering
+        ]
@@ -0,0 +1,184 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.db import connections
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from .models import Product
+from . import jobs
+
+# Resized JPEG + WebP copies of product images, so pages don't send the
+# full-resolution upload for a 220px card.
+#
+# Variants are written next to the upload as product/variants/<name>-<size>.<hash>.<ext>,
+# with <hash> taken from the encoded bytes: a URL never changes content, so
+# they can be cached forever. Product.image_variants records them:
+#   {'source': 'product/shoe.png', 'version': 1,
+#    'sizes': {'thumb': {'width': 150, 'height': 100, 'jpeg': 'product/variants/...', 'webp': '...'}, ...}}
+# They're made by a background job when an image is uploaded (store/signals.py) and by
+# `manage.py generate_image_variants` for the whole catalog.
+
+# Name -> longest side in pixels. Sizes bigger than the original are skipped (never upscaled)
+SIZES = {'thumb': 150, 'small': 300, 'medium': 600, 'large': 1200}
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+VERSION = 1  # Bump after changing SIZES/FORMATS so the batch command redoes everything
+
+
+def is_current(product):
+    variants = product.image_variants or {}
+    return variants.get('source') == product.image.name and variants.get('version') == VERSION
+
+
+def flatten(image):
+    # JPEG has no alpha channel: put transparent images on white
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, 'white')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render(source):
+    # {size name: (width, height, {format: bytes})} for an image file object
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)  # Phone photos are often stored sideways
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+
+    rendered = {}
+    longest = max(image.size)
+    for name, size in sorted(SIZES.items(), key=lambda item: item[1]):
+        if size > longest and rendered:
+            break  # Keep the smallest size even for tiny images, skip the rest
+        copy = image.copy()
+        copy.thumbnail((size, size), Image.LANCZOS)
+        encoded = {}
+        for key, (pil_format, _, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            (flatten(copy) if pil_format == 'JPEG' else copy).save(buffer, pil_format, **options)
+            encoded[key] = buffer.getvalue()
+        rendered[name] = (copy.width, copy.height, encoded)
+    return rendered
+
+
+def variant_name(source_name, size, extension, data):
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f'{os.path.dirname(source_name) or "product"}/variants/{stem}-{size}.{digest}.{extension}'
+
+
+def generate(product):
+    # Write the variants of product.image and save the manifest; returns it
+    storage = product.image.storage
+    old = product.image_variants or {}
+    if not product.image:
+        manifest = {}
+    else:
+        with product.image.open('rb') as source:
+            rendered = render(source)
+        sizes = {}
+        for size, (width, height, encoded) in rendered.items():
+            entry = {'width': width, 'height': height}
+            for key, data in encoded.items():
+                name = variant_name(product.image.name, size, FORMATS[key][1], data)
+                if not storage.exists(name):  # Same bytes, same name: nothing to do
+                    name = storage.save(name, ContentFile(data))
+                entry[key] = name
+            sizes[size] = entry
+        manifest = {'source': product.image.name, 'version': VERSION, 'sizes': sizes}
+
+    # save() rather than update(): bumps updated_at and the catalog cache generation
+    product.image_variants = manifest
+    product.save(update_fields=['image_variants', 'updated_at'])
+    delete_unused(storage, old, manifest)
+    return manifest
+
+
+def variant_names(manifest):
+    return {
+        name for entry in (manifest or {}).get('sizes', {}).values()
+        for key, name in entry.items() if key in FORMATS
+    }
+
+
+def delete_unused(storage, old, new):
+    for name in variant_names(old) - variant_names(new):
+        storage.delete(name)
+
+
+def generate_later(product):
+    # Queued for `manage.py run_jobs` (store/tasks.py), in the same transaction
+    # as the save; a failure is retried there, the page falls back to the original.
+    # Once per product: the job reads the image as it is when it runs
+    jobs.enqueue_once('make_image_variants', product_id=product.pk)
+
+
+def generate_for(pk):
+    # One product of the batch command (also runs in pool workers); returns (pk, error)
+    try:
+        product = Product.objects.get(pk=pk)
+        generate(product)
+    except Exception as exc:
+        return pk, f'{type(exc).__name__}: {exc}'
+    return pk, None
+
+
+def regenerate(pks, workers=None, progress=None):
+    # Variants for many products; with workers > 1 across a process pool.
+    # Returns {'done': n, 'errors': {pk: message}}
+    done, errors = 0, {}
+    if workers == 1:
+        results = map(generate_for, pks)
+    else:
+        # Workers must open their own database connections, not share ours
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(generate_for, pks, chunksize=16)
+    try:
+        for pk, error in results:
+            done += 1
+            if error:
+                errors[pk] = error
+            if progress:
+                progress(done, pk, error)
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    return {'done': done, 'errors': errors}
+
+
+# API / templates
+
+def urls(manifest, url):
+    # {size: {'width', 'height', 'jpeg': url, 'webp': url}} with url(name) making the URLs
+    return {
+        size: {key: url(value) if key in FORMATS else value for key, value in entry.items()}
+        for size, entry in (manifest or {}).get('sizes', {}).items()
+    }
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    # Product.image_variants as URLs (absolute when there's a request, like ImageField)
+    def to_representation(self, manifest):
+        request = self.context.get('request')
+        return urls(manifest, self.url_maker(request))
+
+    def url_maker(self, request):
+        storage = Product._meta.get_field('image').storage
+        if request is None:
+            return storage.url
+        return lambda name: request.build_absolute_uri(storage.url(name))
+
+    def row_converter(self, model_field, request):
+        # Fast list path (store/rows.py): same output from the .values() column
+        url = self.url_maker(request)
+        return lambda manifest: urls(manifest, url)
@@ -0,0 +1,113 @@
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, InventorySlot
+
+# Split inventory for hot products.
+# A hot product keeps its stock in N InventorySlot rows instead of one
+# Product.stock value. Each checkout decrements a random slot, so parallel
+# checkouts of the same product mostly lock different rows.
+# Product.stock stays usable as an unsplit "pool" (e.g. admin restocks);
+# rebalance() spreads the pool and uneven slots back out evenly.
+
+DEFAULT_SLOTS = 8
+
+
+def make_hot(product, slots=DEFAULT_SLOTS):
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        product.stock_slots = slots
+        product.save(update_fields=['stock_slots'])
+        for slot in range(slots):
+            InventorySlot.objects.get_or_create(product=product, slot=slot)
+        return rebalance(product)
+
+
+def make_cold(product):
+    # Move every slot back into Product.stock and drop the slots
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        slots = InventorySlot.objects.select_for_update().filter(product=product)
+        product.stock += slots.aggregate(total=Coalesce(Sum('stock'), 0))['total']
+        product.stock_slots = 0
+        product.save(update_fields=['stock', 'stock_slots'])
+        slots.delete()
+    return product
+
+
+def rebalance(product):
+    # Spread pool + slot stock evenly over the product's slots
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        slots = list(InventorySlot.objects.select_for_update().filter(product=product).order_by('slot'))
+        active = [slot for slot in slots if slot.slot < product.stock_slots]
+        if not active:
+            return product
+        total = product.stock + sum(slot.stock for slot in slots)
+        share, remainder = divmod(total, len(active))
+        for slot in slots:
+            slot.stock = 0
+        for index, slot in enumerate(active):
+            slot.stock = share + (1 if index < remainder else 0)
+        InventorySlot.objects.bulk_update(slots, ['stock'])
+        InventorySlot.objects.filter(product=product, slot__gte=product.stock_slots).delete()
+        product.stock = 0
+        product.save(update_fields=['stock'])
+    return product
+
+
+def set_stock(product, total):
+    # Replace a hot product's whole stock (e.g. from a supplier feed): the
+    # slots are emptied, the pool takes the total and rebalance() spreads it
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        InventorySlot.objects.filter(product=product).update(stock=0)
+        product.stock = total
+        product.save(update_fields=['stock'])
+        return rebalance(product)
+
+
+def rebalance_all():
+    count = 0
+    for product in Product.objects.filter(stock_slots__gt=0).only('pk'):
+        rebalance(product)
+        count += 1
+    return count
+
+
+def claim(product, quantity):
+    # Take `quantity` units of a hot product. Must run inside a transaction.
+    # Returns False (and changes nothing) if there isn't enough stock in total.
+    slots = list(range(product.stock_slots))
+    random.shuffle(slots)
+
+    # Fast path: one conditional UPDATE on a random slot that can cover it
+    for slot in slots:
+        if InventorySlot.objects.filter(product=product, slot=slot, stock__gte=quantity).update(
+            stock=F('stock') - quantity
+        ):
+            return True
+    if Product.objects.filter(pk=product.pk, stock__gte=quantity).update(
+        stock=F('stock') - quantity, updated_at=timezone.now()
+    ):
+        return True
+
+    # Slow path: no single row is big enough, gather units from all of them.
+    # Lock order matches rebalance() (product, then slots) to avoid deadlocks
+    pool = Product.objects.select_for_update().get(pk=product.pk)
+    rows = list(InventorySlot.objects.select_for_update().filter(product=product).order_by('slot'))
+    if pool.stock + sum(row.stock for row in rows) < quantity:
+        return False
+    needed = quantity
+    for row in rows:
+        taken = min(row.stock, needed)
+        row.stock -= taken
+        needed -= taken
+    InventorySlot.objects.bulk_update(rows, ['stock'])
+    if needed:
+        Product.objects.filter(pk=product.pk).update(stock=F('stock') - needed, updated_at=timezone.now())
+    return True
@@ -0,0 +1,234 @@
+import logging
+import random
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+# Background jobs kept in the database, so there's no broker to run.
+#
+# enqueue() inserts a Job row on the caller's connection: inside a
+# transaction.atomic() block the job commits (or rolls back) together with the
+# order it belongs to, and a worker can never see a job for an order that
+# doesn't exist. `manage.py run_jobs` claims due jobs and runs them on a thread
+# or process pool. Failures are retried with exponential backoff until the
+# task's max_attempts, then the job stays as 'failed'. A job can run twice
+# (a worker dying after the task but before the delete), so tasks should be
+# safe to repeat.
+#
+# Claiming is one UPDATE ... WHERE status = 'queued' stamped with a unique
+# token, so two workers can never run the same job. On PostgreSQL the rows
+# are picked with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers
+# skip each other's rows instead of waiting on them; SQLite serializes writes
+# anyway, and the status check in the UPDATE is what makes it safe there.
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}  # Task name -> (function, max_attempts), filled by @task
+
+
+def get_setting(name, default):
+    return getattr(settings, f'JOBS_{name}', default)
+
+
+def task(name=None, max_attempts=5):
+    # Register a function as a task: @task() def send_receipt(order_id): ...
+    # It's called with the job payload as keyword arguments (JSON values only)
+    def register(function):
+        TASKS[name or function.__name__] = (function, max_attempts)
+        return function
+    return register
+
+
+def enqueue(name, delay=0, **payload):
+    # Add a job; call it inside the transaction whose data the job needs
+    if name not in TASKS:
+        raise KeyError(f'Unknown task: {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=TASKS[name][1],
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_once(name, **payload):
+    # enqueue(), unless the same job is already waiting to run: ten saves of a
+    # product need one image job, not ten. One waiting for a retry is moved
+    # up to now. Two transactions can still both add it; tasks are safe to repeat.
+    now = timezone.now()
+    waiting = Job.objects.filter(name=name, payload=payload, status='queued').order_by('run_at').first()
+    if waiting is None:
+        return enqueue(name, **payload)
+    if waiting.run_at > now:
+        Job.objects.filter(pk=waiting.pk, status='queued').update(run_at=now)
+    return waiting
+
+
+def retry_delay(attempts):
+    # 10s, 20s, 40s ... (JOBS_RETRY_DELAY doubled per attempt), capped, with
+    # up to 10% jitter so jobs failing together don't all come back together
+    delay = min(get_setting('RETRY_DELAY', 10) * 2 ** (attempts - 1), get_setting('MAX_RETRY_DELAY', 3600))
+    return delay * (1 + random.random() / 10)
+
+
+def claim(limit, using='default'):
+    # Mark up to `limit` due jobs as running; returns their ids
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    due = Job.objects.using(using).filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+
+    def mark(ids):
+        Job.objects.using(using).filter(id__in=ids, status='queued').update(
+            status='running', locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            mark(list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit]))
+    else:
+        # No row locks (SQLite): a plain read, and a job another worker took
+        # in between no longer matches status='queued' in the UPDATE
+        mark(list(due.values_list('id', flat=True)[:limit]))
+    return list(Job.objects.using(using).filter(locked_by=token, status='running').values_list('id', flat=True))
+
+
+def retry_locked(function, attempts=4):
+    # The queue's own reads and writes, retried when the database is briefly
+    # busy (SQLite's "database is locked" while another worker writes)
+    for attempt in range(attempts):
+        try:
+            return function()
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
+
+def execute(job_id):
+    # Run one claimed job (in a pool thread or process); returns (job_id, error)
+    try:
+        job = retry_locked(lambda: Job.objects.get(pk=job_id))
+        function = TASKS.get(job.name, (None,))[0]
+        try:
+            if function is None:
+                raise LookupError(f'Unknown task: {job.name}')
+            function(**job.payload)
+        except Exception as exc:
+            retry_locked(lambda exc=exc: fail(job, exc))
+            return job_id, f'{type(exc).__name__}: {exc}'
+        retry_locked(lambda: Job.objects.filter(pk=job_id).delete())
+        return job_id, None
+    except DatabaseError as exc:
+        # Left 'running': requeue_stale() gives it back to a worker later
+        logger.exception('Job #%s: queue update failed', job_id)
+        return job_id, f'{type(exc).__name__}: {exc}'
+    finally:
+        close_old_connections()  # Pool threads keep their connection between jobs
+
+
+def fail(job, exc):
+    # Schedule a retry, or give up once the attempts are used
+    error = ''.join(traceback.format_exception(exc))[-5000:]
+    if job.attempts >= job.max_attempts or isinstance(exc, LookupError):
+        logger.error('Job %s failed for good after %s attempt(s): %s', job, job.attempts, exc)
+        Job.objects.filter(pk=job.pk).update(status='failed', last_error=error, locked_by='', locked_at=None)
+    else:
+        logger.warning('Job %s failed (attempt %s of %s), retrying: %s', job, job.attempts, job.max_attempts, exc)
+        Job.objects.filter(pk=job.pk).update(
+            status='queued', last_error=error, locked_by='', locked_at=None,
+            run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+        )
+
+
+def requeue_stale(timeout=None):
+    # Jobs left 'running' by a worker that died (killed, OOM, deploy) go back
+    # in the queue, or to 'failed' when that was their last attempt
+    timeout = timeout if timeout is not None else get_setting('LOCK_TIMEOUT', 600)
+    stale = Job.objects.filter(status='running', locked_at__lt=timezone.now() - timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', last_error='Worker stopped while running the job', locked_by='', locked_at=None,
+    )
+    requeued = stale.update(status='queued', locked_by='', locked_at=None, run_at=timezone.now())
+    return requeued + failed
+
+
+def init_process():
+    # Pool processes: set Django up (needed with the spawn start method) and
+    # open fresh connections instead of the ones inherited from the parent
+    django.setup()
+    connections.close_all()
+
+
+class Worker:
+    # Claims due jobs and runs them on `concurrency` threads or processes.
+    # stop() (or SIGTERM/SIGINT in run_jobs) lets running jobs finish first.
+
+    def __init__(self, concurrency=4, processes=False, batch_size=None, poll_interval=None):
+        self.concurrency = concurrency
+        self.processes = processes
+        self.batch_size = batch_size or get_setting('BATCH_SIZE', 20)
+        self.poll_interval = poll_interval if poll_interval is not None else get_setting('POLL_INTERVAL', 1.0)
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def make_pool(self):
+        if self.processes:
+            connections.close_all()  # Don't hand our connection to the children
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=init_process)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+
+    def run(self, once=False, max_jobs=None, progress=None):
+        # once: stop when no job is due; max_jobs: stop after that many
+        last_requeue = 0
+        with self.make_pool() as pool:
+            while not self.stopping.is_set():
+                limit = self.batch_size if max_jobs is None else min(self.batch_size, max_jobs - self.processed)
+                try:
+                    if time.monotonic() - last_requeue > 60:
+                        requeue_stale()
+                        last_requeue = time.monotonic()
+                    ids = retry_locked(lambda limit=limit: claim(limit)) if limit > 0 else []
+                except DatabaseError:
+                    # Database restarting or unreachable: keep the worker alive and try again
+                    logger.exception('Could not claim jobs')
+                    close_old_connections()
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if not ids:
+                    if once or limit <= 0:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                for job_id, error in pool.map(execute, ids):
+                    self.processed += 1
+                    self.failed += bool(error)
+                    if progress:
+                        progress(job_id, error)
+        return self.processed
+
+
+def run_pending(limit=None):
+    # Run every due job in this thread: tests, shells, management commands
+    done = 0
+    while limit is None or done < limit:
+        ids = claim(1)
+        if not ids:
+            break
+        execute(ids[0])
+        done += 1
+    return done
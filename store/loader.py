@@ -0,0 +1,230 @@
+import codecs
+import io
+import json
+import time
+from collections import defaultdict
+
+from django.core.serializers import python as python_serializer
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import cache as catalog_cache
+
+# Streaming fixture loader for big catalog seeds.
+# Unlike loaddata it never holds the whole file in memory and it inserts
+# rows with bulk INSERTs (no save(), no signals), one transaction per chunk.
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def detect_encoding(head, default='utf-8'):
+    # BOM first, then the zero-byte pattern of "[" in UTF-16 without a BOM
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    if len(head) >= 2 and head[0] == 0:
+        return 'utf-16-be'
+    if len(head) >= 2 and head[1] == 0:
+        return 'utf-16-le'
+    return default
+
+
+def open_fixture(path, encoding=None):
+    raw = open(path, 'rb')
+    encoding = encoding or detect_encoding(raw.read(4))
+    raw.seek(0)
+    return io.TextIOWrapper(raw, encoding=encoding), encoding
+
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+    # Yield the objects of a top-level JSON array one at a time.
+    # Only the current object (plus one read chunk) is ever kept in memory.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError('Fixture must be a JSON array')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+
+        if position < len(buffer):
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                obj = None  # Object continues in the next chunk
+            else:
+                position = end
+                yield obj
+                continue
+
+        if eof:
+            if not started or position >= len(buffer):
+                raise ValueError('Unexpected end of fixture')
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+class BulkLoader:
+    # Queues deserialized objects and writes them in chunked transactions.
+    # An object whose foreign key points at a row not seen yet (e.g. a product
+    # listed before its category) waits until that row is queued, so no chunk
+    # ever commits a dangling reference.
+
+    def __init__(self, using='default', batch_size=1000, chunk_size=10000, progress=None):
+        self.using = using
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.queued = defaultdict(list)        # model -> [instance]
+        self.queued_m2m = defaultdict(list)    # through model -> [through instance]
+        self.queued_count = 0
+        self.seen = defaultdict(set)           # model label -> pks loaded or queued
+        self.absent = set()                    # (model label, pk) known not to be in the database
+        self.waiting = defaultdict(list)       # (model label, pk) -> [DeserializedObject]
+        self.models = set()
+        self.loaded = 0
+        self.started = time.monotonic()
+        self.now = timezone.now()
+
+    def add(self, deserialized):
+        missing = self.missing_parent(deserialized.object)
+        if missing:
+            self.waiting[missing].append(deserialized)
+            return
+        self.queue(deserialized)
+
+    def missing_parent(self, instance):
+        for field in instance._meta.concrete_fields:
+            if not field.many_to_one:
+                continue
+            value = getattr(instance, field.attname)
+            related = field.related_model
+            label = related._meta.label
+            if value is None or value in self.seen[label]:
+                continue
+            if (label, value) not in self.absent:
+                if related._base_manager.using(self.using).filter(pk=value).exists():
+                    self.seen[label].add(value)  # Row was already in the database
+                    continue
+                self.absent.add((label, value))
+            return label, value
+        return None
+
+    def queue(self, deserialized):
+        instance = deserialized.object
+        model = instance.__class__
+        for field in model._meta.concrete_fields:
+            # Older fixtures lack newer auto_now columns; raw inserts would write NULL
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                if getattr(instance, field.attname) is None:
+                    setattr(instance, field.attname, self.now)
+        self.queued[model].append(instance)
+        self.models.add(model)
+        for field_name, values in deserialized.m2m_data.items():
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+            for value in values:
+                self.queued_m2m[through].append(through(**{f'{source}_id': instance.pk, f'{target}_id': value}))
+                self.queued_count += 1
+        self.queued_count += 1
+
+        key = (model._meta.label, instance.pk)
+        self.seen[key[0]].add(instance.pk)
+        for child in self.waiting.pop(key, []):
+            self.add(child)  # Its parent is queued now; it may still wait on another one
+
+        if self.queued_count >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.queued_count:
+            return
+        with transaction.atomic(using=self.using):
+            for model, instances in list(self.queued.items()) + list(self.queued_m2m.items()):
+                with_pk = [instance for instance in instances if instance.pk is not None]
+                without_pk = [instance for instance in instances if instance.pk is None]
+                self.insert(model, with_pk, model._meta.concrete_fields)
+                self.insert(model, without_pk, [field for field in model._meta.concrete_fields if not field.primary_key])
+        self.loaded += self.queued_count
+        self.queued.clear()
+        self.queued_m2m.clear()
+        self.queued_count = 0
+        if self.progress:
+            self.progress(self.loaded, self.rate())
+
+    def insert(self, model, instances, fields):
+        # Foreign keys are checked at commit (Django creates them DEFERRABLE
+        # INITIALLY DEFERRED), so insert order inside a chunk doesn't matter
+        for start in range(0, len(instances), self.batch_size):
+            # raw=True keeps fixture values for auto_now/auto_now_add fields
+            model._base_manager.using(self.using)._insert(
+                instances[start:start + self.batch_size], fields=fields, using=self.using, raw=True,
+            )
+
+    def finish(self):
+        if self.waiting:
+            (label, pk), _ = next(iter(self.waiting.items()))
+            count = sum(len(children) for children in self.waiting.values())
+            raise ValueError(f'{count} object(s) reference rows that do not exist, e.g. {label} pk={pk}')
+        self.flush()
+        self.reset_sequences()
+        catalog_cache.bump_generation('product', 'category')
+
+    def reset_sequences(self):
+        reset_sequences(self.using, self.models)
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.loaded / elapsed if elapsed else 0.0
+
+
+def reset_sequences(using, models):
+    # Explicit pks were inserted, move PostgreSQL sequences past them
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), list(models))
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def load_fixture(path, using='default', encoding=None, batch_size=1000, chunk_size=10000, progress=None):
+    stream, encoding = open_fixture(path, encoding)
+    loader = BulkLoader(using=using, batch_size=batch_size, chunk_size=chunk_size, progress=progress)
+    with stream:
+        objects = python_serializer.Deserializer(
+            iter_json_array(stream), using=using, ignorenonexistent=True, handle_forward_references=False,
+        )
+        for deserialized in objects:
+            loader.add(deserialized)
+    loader.finish()
+    return {
+        'objects': loader.loaded,
+        'models': sorted(model._meta.label for model in loader.models),
+        'seconds': round(time.monotonic() - loader.started, 3),
+        'rate': round(loader.rate(), 1),
+        'encoding': encoding,
+    }
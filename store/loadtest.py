@@ -0,0 +1,59 @@
+import math
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Small HTTP load driver: N requests against one URL with a fixed number of
+# clients in flight, reporting throughput and latency percentiles.
+
+
+def percentile(values, percent):
+    # Nearest-rank percentile of a sorted list
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def fetch(url, headers=None, timeout=30):
+    # (status or None on connection errors, seconds)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - started
+
+
+def run_load(url, total, concurrency, headers=None, timeout=30):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(lambda _: fetch(url, headers, timeout), range(total)))
+        elapsed = time.perf_counter() - started
+    timings = sorted(seconds * 1000 for _, seconds in results)
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': sum(1 for status, _ in results if status is None or status >= 400),
+        'seconds': round(elapsed, 3),
+        'rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'p50': round(percentile(timings, 50), 2),
+        'p95': round(percentile(timings, 95), 2),
+        'p99': round(percentile(timings, 99), 2),
+    }
+
+
+def wait_until_up(url, timeout=30):
+    # Poll until the server answers at all (any HTTP status)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, _ = fetch(url, timeout=2)
+        if status is not None:
+            return True
+        time.sleep(0.2)
+    return False
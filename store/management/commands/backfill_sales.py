@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import reports
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the sales rollup tables from the orders (all days, or --from/--to).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day, e.g. 2025-01-01 (default: the first order)')
+        parser.add_argument('--to', dest='end', help='Last day, inclusive (default: the last order)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as exc:
+            raise CommandError(f'Bad date: {exc}')
+        counts = reports.rebuild(start, end, batch_size=max(options['batch_size'], 1))
+        rows = ', '.join(f'{count} {label}' for label, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups: {rows}'))
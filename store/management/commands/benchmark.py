@@ -0,0 +1,82 @@
+import json
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from store import benchmark
+from store.datagen import BENCH_PASSWORD, BENCH_USERNAME, get_bench_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the main user flows (catalog, search, product page, order history, checkout) '
+        'in-process or against a running server, and compare with a saved baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f'{", ".join(benchmark.SCENARIOS)} (default: all)')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed iterations per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed iterations per scenario')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000 (default: in-process)')
+        parser.add_argument('--username', default=BENCH_USERNAME, help='User for --url (see generate_data)')
+        parser.add_argument('--password', default=BENCH_PASSWORD)
+        parser.add_argument('--replay', help='Replay the GET requests of a profiling or access log instead of the scenarios')
+        parser.add_argument('--repeat', type=int, default=1, help='Times to replay the log')
+        parser.add_argument('--baseline', help='JSON results to compare with; regressions make the command fail')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p50/p95 slowdown (0.25 = 25%%)')
+        parser.add_argument('--save-baseline', help='Write the results to this file')
+
+    def handle(self, *args, **options):
+        unknown = set(options['scenarios']) - set(benchmark.SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenario(s): {", ".join(sorted(unknown))}')
+
+        if options['url']:
+            try:
+                driver = benchmark.HttpDriver(options['url'], options['username'], options['password'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        else:
+            driver = benchmark.InProcessDriver(get_bench_user())
+
+        # In process, measure the app rather than our own rate limits (the
+        # middleware still runs); a live server applies its own settings
+        limits = override_settings(RATE_LIMITS={}) if not options['url'] else nullcontext()
+        with limits:
+            if options['replay']:
+                with open(options['replay'], encoding='utf-8') as log:
+                    requests = benchmark.parse_log(log)
+                if not requests:
+                    raise CommandError(f'No GET requests found in {options["replay"]}')
+                results = benchmark.replay(driver, requests, options['repeat'])
+            else:
+                # A random sample of products in stock, so checkouts mostly succeed
+                product_ids = benchmark.sample_products(1000, seed=options['seed'])
+                try:
+                    workload = benchmark.Workload(product_ids, seed=options['seed'])
+                except ValueError as exc:
+                    raise CommandError(str(exc))
+                names = options['scenarios'] or list(benchmark.SCENARIOS)
+                results = benchmark.run(driver, workload, names, options['iterations'], options['warmup'])
+
+        for name, result in results.items():
+            queries = '-' if result['queries'] is None else result['queries']
+            self.stdout.write(
+                f'{name}: p50 {result["p50"]} ms, p95 {result["p95"]} ms, p99 {result["p99"]} ms, '
+                f'{queries} queries, {result["errors"]}/{result["iterations"]} errors'
+            )
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved results to {options["save_baseline"]}')
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as saved:
+                baseline = json.load(saved)
+            problems = benchmark.regressions(results, baseline, options['tolerance'])
+            if problems:
+                raise CommandError('Slower than the baseline:\n  ' + '\n  '.join(problems))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from store.models import Category, Order, Product
+from store.renderers import FastJSONRenderer
+from store.serializers import (
+    CategorySerializer, OrderSerializer, ProductSerializer, category_rows, order_rows, product_rows,
+)
+
+# name -> (queryset, serializer, row builder)
+TARGETS = {
+    'products': (lambda: Product.objects.with_stock().order_by('created_at', 'id'), ProductSerializer, product_rows),
+    'categories': (lambda: Category.objects.order_by('id'), CategorySerializer, category_rows),
+    'orders': (lambda: Order.objects.with_items().order_by('-created_at', '-id'), OrderSerializer, order_rows),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare serializer + JSONRenderer against the fast .values() list path on the current database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f'What to benchmark: {", ".join(TARGETS)} (default: all)')
+        parser.add_argument('--limit', type=int, default=500, help='Rows per list')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per path')
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/api/')
+        unknown = set(options['targets']) - set(TARGETS)
+        if unknown:
+            raise CommandError(f'Unknown target(s): {", ".join(sorted(unknown))}')
+        for name in options['targets'] or list(TARGETS):
+            queryset, serializer_class, builder = TARGETS[name]
+            limit = options['limit']
+
+            # Bound as defaults: each pass of the loop times its own target
+            def slow(queryset=queryset, serializer_class=serializer_class, limit=limit):
+                objects = queryset()[:limit]
+                return JSONRenderer().render(serializer_class(objects, many=True, context={'request': request}).data)
+
+            def fast(queryset=queryset, builder=builder, limit=limit):
+                rows = queryset().prefetch_related(None).values(*builder.columns())[:limit]
+                return FastJSONRenderer().render(builder.build(rows, request))
+
+            slow_body, fast_body = slow(), fast()
+            if slow_body != fast_body:
+                raise CommandError(f'{name}: fast path output differs from the serializer')
+
+            slow_ms = self.time(slow, options['repeat'])
+            fast_ms = self.time(fast, options['repeat'])
+            speedup = slow_ms / fast_ms if fast_ms else 0
+            self.stdout.write(
+                f'{name}: {len(slow_body)} bytes, serializer {slow_ms:.2f} ms, '
+                f'fast path {fast_ms:.2f} ms ({speedup:.1f}x)'
+            )
+
+    def time(self, function, repeat):
+        # Median wall time in milliseconds, queries included
+        timings = []
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,60 @@
+import importlib.util
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.loadtest import run_load, wait_until_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the app with one worker under gunicorn (WSGI, sync worker) and under uvicorn (ASGI) '
+        'and compare throughput and latency at rising concurrency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated client counts')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+        parser.add_argument('--workers', type=int, default=1, help='Server worker processes')
+        parser.add_argument('--port', type=int, default=8301)
+        parser.add_argument('--wsgi-path', default='/api/products/', help='Endpoint hit on the WSGI server')
+        parser.add_argument('--asgi-path', default='/api/async/products/', help='Endpoint hit on the ASGI server')
+        parser.add_argument('--token', help='JWT access token, for endpoints that need a login')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must look like 1,8,32')
+        address = f'127.0.0.1:{options["port"]}'
+        workers = str(options['workers'])
+        servers = [
+            ('WSGI', 'gunicorn', options['wsgi_path'],
+             [sys.executable, '-m', 'gunicorn', 'config.wsgi:application', '--workers', workers, '--bind', address]),
+            ('ASGI', 'uvicorn', options['asgi_path'],
+             [sys.executable, '-m', 'uvicorn', 'config.asgi:application', '--workers', workers,
+              '--host', '127.0.0.1', '--port', str(options['port']), '--no-access-log']),
+        ]
+        headers = {'Authorization': f'Bearer {options["token"]}'} if options['token'] else {}
+
+        self.stdout.write(f'{"server":<6} {"clients":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>6}')
+        for name, package, path, command in servers:
+            if importlib.util.find_spec(package) is None:
+                self.stderr.write(f'{name}: skipped, "{package}" is not installed')
+                continue
+            url = f'http://{address}{path}'
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not wait_until_up(url):
+                    raise CommandError(f'{name} server did not start ({" ".join(command)})')
+                run_load(url, min(options['requests'], 20), 1, headers)  # Warm up
+                for level in levels:
+                    result = run_load(url, options['requests'], level, headers)
+                    self.stdout.write(
+                        f'{name:<6} {level:>7} {result["rps"]:>8} {result["p50"]:>8} '
+                        f'{result["p95"]:>8} {result["p99"]:>8} {result["errors"]:>6}'
+                    )
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from store.datagen import BENCH_PASSWORD, BENCH_USERNAME, generate
+
+
+class Command(BaseCommand):
+    help = 'Add a synthetic catalog and order history (e.g. 1M products, 10M order items) for benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--items-per-order', type=int, default=10, help='Average order items per order')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1, help='Same seed, same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT transaction')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        def progress(label, count):
+            if count % 100000 < options['batch_size']:
+                self.stdout.write(f'  {label}: {count} rows')
+
+        stats = generate(
+            products=options['products'], orders=options['orders'], items_per_order=options['items_per_order'],
+            users=options['users'], categories=options['categories'], seed=options['seed'],
+            batch_size=options['batch_size'], using=options['database'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        rows = ', '.join(f'{count} {label}' for label, count in stats['rows'].items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {rows} in {stats["seconds"]}s'))
+        self.stdout.write(f'Benchmark user: {BENCH_USERNAME} / {BENCH_PASSWORD}')
+        self.stdout.write('Run manage.py backfill_sales to include the generated orders in the sales reports.')
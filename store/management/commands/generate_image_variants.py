@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from store import images
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Create the resized/WebP variants of product images, across a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Redo products whose variants are already current')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes (1 = no pool)')
+        parser.add_argument('--ids', type=int, nargs='*', help='Only these products')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        if options['ids']:
+            products = products.filter(pk__in=options['ids'])
+        if not options['all']:
+            # Only the stale ones: the manifest doesn't match the image or VERSION
+            products = [
+                pk for pk, name, variants in products.values_list('pk', 'image', 'image_variants').iterator()
+                if (variants or {}).get('source') != name or (variants or {}).get('version') != images.VERSION
+            ]
+        else:
+            products = list(products.values_list('pk', flat=True))
+        if not products:
+            self.stdout.write('All product image variants are up to date')
+            return
+
+        self.stdout.write(f'Generating variants for {len(products)} product(s) with {options["workers"]} worker(s)')
+
+        def progress(done, pk, error):
+            if error:
+                self.stderr.write(f'  product {pk}: {error}')
+            elif done % 100 == 0:
+                self.stdout.write(f'  {done}/{len(products)}')
+
+        result = images.regenerate(products, workers=max(options['workers'], 1), progress=progress)
+        style = self.style.WARNING if result['errors'] else self.style.SUCCESS
+        self.stdout.write(style(f'Done: {result["done"]} product(s), {len(result["errors"])} error(s)'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from store import loader
+
+
+class Command(BaseCommand):
+    help = 'Stream a (large) JSON fixture into the database with bulk inserts, e.g. clean_store_data.json.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', help='Path to a JSON fixture (any encoding, UTF-16 is detected)')
+        parser.add_argument('--encoding', help='Force a text encoding instead of detecting it')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT statement')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per transaction')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--batch-size and --chunk-size must be positive')
+
+        def progress(loaded, rate):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  {loaded} objects ({rate:.0f}/s)')
+
+        try:
+            result = loader.load_fixture(
+                options['fixture'],
+                using=options['database'],
+                encoding=options['encoding'],
+                batch_size=options['batch_size'],
+                chunk_size=options['chunk_size'],
+                progress=progress,
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {result['objects']} objects ({', '.join(result['models'])}) "
+            f"in {result['seconds']}s, {result['rate']:.0f} objects/s [{result['encoding']}]"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.sessions import purge_expired, flush_deferred
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches (use instead of clearsessions on big tables).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Sessions deleted per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        flush_deferred()
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} expired session(s)')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import inventory
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Spread hot products\' stock evenly over their inventory slots (run periodically, e.g. every minute).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hot', type=int, metavar='PRODUCT_ID', help='Split this product\'s stock into slots')
+        parser.add_argument('--cold', type=int, metavar='PRODUCT_ID', help='Merge this product\'s slots back into stock')
+        parser.add_argument('--slots', type=int, default=inventory.DEFAULT_SLOTS, help='Number of slots for --hot')
+
+    def handle(self, *args, **options):
+        product_id = options['hot'] or options['cold']
+        if product_id:
+            try:
+                product = Product.objects.get(pk=product_id)
+            except Product.DoesNotExist:
+                raise CommandError(f'Product {product_id} does not exist')
+            if options['hot']:
+                if options['slots'] < 1:
+                    raise CommandError('--slots must be at least 1')
+                inventory.make_hot(product, options['slots'])
+                self.stdout.write(f'{product.name}: stock split over {options["slots"]} slots')
+            else:
+                inventory.make_cold(product)
+                self.stdout.write(f'{product.name}: slots merged back into stock')
+            return
+
+        count = inventory.rebalance_all()
+        self.stdout.write(f'Rebalanced {count} hot product(s)')
@@ -0,0 +1,43 @@
+import os
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs (order mails, image variants) from the database queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Jobs run at the same time')
+        parser.add_argument('--processes', action='store_true',
+                            help='Run jobs in a process pool instead of threads (CPU-heavy tasks)')
+        parser.add_argument('--batch-size', type=int, help='Jobs claimed per query (default: JOBS_BATCH_SIZE)')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due instead of polling')
+        parser.add_argument('--max-jobs', type=int, help='Exit after this many jobs (e.g. to recycle the worker)')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be positive')
+        worker = jobs.Worker(
+            concurrency=options['concurrency'],
+            processes=options['processes'],
+            batch_size=options['batch_size'],
+        )
+        # Finish the running jobs on a deploy's SIGTERM or Ctrl-C, then exit
+        previous = {signum: signal.signal(signum, worker.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        mode = 'processes' if options['processes'] else 'threads'
+        self.stdout.write(f'Worker {os.getpid()} running jobs on {options["concurrency"]} {mode}')
+
+        def progress(job_id, error):
+            if error:
+                self.stderr.write(f'  job {job_id}: {error}')
+
+        try:
+            processed = worker.run(once=options['once'], max_jobs=options['max_jobs'], progress=progress)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'Stopped after {processed} job(s), {worker.failed} failed'))
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from store import search
+    search.install(schema_editor.connection, rebuild=True)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from store import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_orderitem'),
+    ]
+
+    operations = [
+        # Vendor-specific full-text index (FTS5 on SQLite, tsvector + GIN on PostgreSQL)
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,149 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from . import cache as catalog_cache
+from . import fieldsets
+
+
+class CatalogCacheMixin:
+    # Serve list/retrieve responses from the versioned catalog cache.
+    # Set cache_namespace to the generation the data depends on ('product', 'category')
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        key = catalog_cache.request_key(self.cache_namespace, 'list', request)
+        return self.cached_response(key, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        key = catalog_cache.request_key(self.cache_namespace, f'detail:{lookup}', request)
+        return self.cached_response(key, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
+
+    def cached_response(self, key, view):
+        data = catalog_cache.lookup(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = view()
+        if response.status_code == 200:
+            catalog_cache.store(key, response.data)  # Never cache errors
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+def make_etag(*parts):
+    # Weak ETag: the same data may be sent gzip'ed or not
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(request, etag, last_modified=None):
+    # 304 (or 412) response if the client's copy is current, else None
+    # HTTP dates have whole seconds
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified=None):
+    if response.status_code in (200, 304):  # A 304 repeats the validators (RFC 9110)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalGetMixin:
+    # ETag / Last-Modified support for list and retrieve.
+    # The validators come from a cheap query (MAX(updated_at) + COUNT for lists,
+    # the row's updated_at for details), so a 304 never touches the serializer.
+    # Lists only send an ETag: deleting a row doesn't move MAX(updated_at),
+    # so Last-Modified alone can't tell that a list changed.
+    # Cached catalog lists (cache_namespace set) use the cache generation
+    # instead: it moves on every change the cached page depends on, and an
+    # aggregate over a whole filtered catalog would read every matching row.
+    last_modified_field = 'updated_at'
+    etag_sum_fields = ()   # Extra columns/annotations that change the representation
+
+    def list(self, request, *args, **kwargs):
+        namespace = getattr(self, 'cache_namespace', None)
+        if namespace is not None:
+            state = [catalog_cache.get_generation(namespace)]
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+            aggregates = {f'sum_{name}': Sum(name) for name in self.etag_sum_fields}
+            state = sorted(queryset.aggregate(latest=Max(self.last_modified_field), count=Count('pk'), **aggregates).items())
+        etag = make_etag('list', request.get_full_path(), request.accepted_media_type, *state)
+        return self.conditional(request, etag, None, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        view = lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        try:
+            row = (
+                self.get_queryset().filter(**lookup)
+                .values_list('pk', self.last_modified_field, *self.etag_sum_fields).first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            row = None  # Malformed lookup (e.g. /products/abc/), same errors get_object_or_404 catches
+        if row is None:
+            return view()  # Let the normal path raise 404
+        etag = make_etag('detail', request.get_full_path(), request.accepted_media_type, *row)
+        # Values not covered by updated_at (e.g. inventory slots) make the timestamp unreliable
+        last_modified = row[1] if not any(row[2:]) else None
+        return self.conditional(request, etag, last_modified, view)
+
+    def conditional(self, request, etag, last_modified, view):
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = view()
+        return set_validators(response, etag, last_modified)
+
+
+class FastListMixin:
+    # List pages built from .values() rows by a RowBuilder (store/rows.py)
+    # instead of model instances + serializer; same JSON, a lot less CPU.
+    # Set FAST_LIST_RENDERING = False to go back to the serializer.
+    row_builder = None
+
+    def list(self, request, *args, **kwargs):
+        if self.row_builder is None or not getattr(settings, 'FAST_LIST_RENDERING', True):
+            return super().list(request, *args, **kwargs)
+
+        builder = self.row_builder.narrow(*fieldsets.from_request(request))
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = builder.columns()
+        get_keys = getattr(self.paginator, 'get_keys', None)
+        if get_keys is not None:
+            # Keyset cursors are built from the ordering columns, so select them too
+            columns += [key.lstrip('-') for key in get_keys(queryset)]
+        rows = queryset.prefetch_related(None).values(*dict.fromkeys(columns))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(builder.build(page, request))
+        return Response(builder.build(rows, request))
+
+
+class SparseFieldsViewMixin:
+    # ?fields= / ?omit= on reads (store/fieldsets.py): the serializer drops the
+    # other fields and the queryset stops selecting their columns.
+    # Serializers need SparseFieldsMixin for the output part.
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, omit = fieldsets.from_request(self.request)
+        if fields is not None or omit is not None:
+            context['fieldset'] = (fields, omit)
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return fieldsets.narrow_queryset(queryset, self.get_serializer_class(), *fieldsets.from_request(self.request))
@@ -1,28 +1,116 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Coalesce
 
 # Product category (e.g., Electronics, Clothing)
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)  # Category name, must be unique
     slug = models.SlugField(max_length=100, unique=True) # URL-friendly version of name
+    updated_at = models.DateTimeField(auto_now=True)     # Last update time (used for ETags)
 
     def __str__(self):
         return self.name  # Show category name in admin or shell
 
+# Could be sellable: stock on the row, or a hot product whose stock lives in
+# slots. Also the condition of the partial index below, so keep the two identical
+MAYBE_IN_STOCK = models.Q(stock__gt=0) | models.Q(stock_slots__gt=0)
+
+
+def in_stock_condition():
+    # Sellable right now: stock on the row, or a slot with stock left (a sold-out
+    # hot product keeps stock_slots > 0). MAYBE_IN_STOCK stays in as its own AND
+    # term so the planner can tell product_in_stock_idx covers the query.
+    # A function: the subquery can't be built before the models are loaded
+    slots = InventorySlot.objects.filter(product=models.OuterRef('pk'), stock__gt=0)
+    return MAYBE_IN_STOCK & (models.Q(stock__gt=0) | models.Q(models.Exists(slots)))
+
+# Products with the stock held in inventory slots added up (see store/inventory.py)
+class ProductQuerySet(models.QuerySet):
+    def in_stock(self):
+        return self.filter(in_stock_condition())
+
+    def with_stock(self):
+        slot_stock = (
+            InventorySlot.objects.filter(product=models.OuterRef('pk'))
+            .values('product').annotate(total=models.Sum('stock')).values('total')
+        )
+        return (
+            self.annotate(slot_stock=Coalesce(models.Subquery(slot_stock), 0))
+            # Everything that can be sold, what ?stock= and ?ordering=stock go by
+            .annotate(sellable_stock=models.ExpressionWrapper(
+                models.F('stock') + models.F('slot_stock'), output_field=models.IntegerField(),
+            ))
+        )
+
 # Product for sale (e.g., iPhone, T-Shirt)
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # Supplier stock code, natural key for imports
     name = models.CharField(max_length=200)                # Product name
     description = models.TextField()                        # Detailed product description
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Price (e.g., 299.99)
     image = models.ImageField(upload_to='product/', blank=True, null=True)  # Product image
     stock = models.PositiveIntegerField(default=0)         # How many available in stock
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')  # Link to category
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products', db_index=False)  # Link to category (indexed below)
     created_at = models.DateTimeField(auto_now_add=True)   # When product was added
     updated_at = models.DateTimeField(auto_now=True)       # Last update time
+    stock_slots = models.PositiveSmallIntegerField(default=0)  # Hot products: number of InventorySlot rows (0 = normal)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized copies of image (store/images.py)
+
+    objects = ProductQuerySet.as_manager()
+
+    # One index per list shape of the API: filter columns first, then the
+    # ordering, then id (the keyset tiebreaker), so "WHERE ... ORDER BY x, id
+    # LIMIT n" reads n index entries instead of sorting the table
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),    # Default ordering
+            models.Index(fields=['price', 'id'], name='product_price_idx'),           # ?ordering=price, ?price=
+            models.Index(fields=['stock', 'id'], name='product_stock_idx'),           # Admin's stock column
+            models.Index(fields=['category', 'created_at', 'id'], name='product_category_created_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            # Shoppers browsing a category by price with sold-out products hidden (?in_stock=true).
+            # Same columns as the one above, but without the sold-out rows, so the ordered
+            # walk doesn't step over them before filling a page. EXPLAIN on ?category=&in_stock=&ordering=price
+            # picks it: "SEARCH store_product USING INDEX product_in_stock_idx (category_id=?)"
+            models.Index(fields=['category', 'price', 'id'], condition=MAYBE_IN_STOCK, name='product_in_stock_idx'),
+        ]
 
     def __str__(self):
         return self.name  # Show product name
 
+    # Everything that can be sold: the stock column plus any inventory slots
+    @property
+    def total_stock(self):
+        if not self.stock_slots:
+            return self.stock
+        slot_stock = getattr(self, 'slot_stock', None)  # Set by Product.objects.with_stock()
+        if slot_stock is None:
+            slot_stock = self.inventory_slots.aggregate(total=Coalesce(models.Sum('stock'), 0))['total']
+        return self.stock + slot_stock
+
+# Part of a hot product's stock (e.g., slot 3 of 8 for a flash-sale item).
+# Checkouts decrement different slot rows, so they don't all wait on one Product row
+class InventorySlot(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_slots')
+    slot = models.PositiveSmallIntegerField()           # 0 .. product.stock_slots - 1
+    stock = models.PositiveIntegerField(default=0)      # Units held by this slot
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'slot'], name='unique_inventory_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} slot {self.slot}: {self.stock}"
+
+# Orders with their user, items and item products loaded up front,
+# so listing N orders costs a fixed number of queries instead of 1 + N + N*items
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        return self.select_related('user').prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
+
 # Customer order (e.g., Ryan’s order #1024)
 class Order(models.Model):
     # Possible order statuses
@@ -33,13 +121,23 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # Who placed the order
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # Who placed the order (indexed below)
     name = models.CharField(max_length=200)                   # Name for shipping (could be different from user)
     address = models.TextField()                               # Shipping address
     phone = models.CharField(max_length=20)                    # Contact phone number
     total = models.DecimalField(max_digits=10, decimal_places=2)  # Total order price
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')  # Order status
     created_at = models.DateTimeField(auto_now_add=True)       # When order was created
+    updated_at = models.DateTimeField(auto_now=True)           # Last change, e.g. status (used for ETags)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Order history: a user's orders, newest first (also serves the user_id foreign key)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),  # Staff: all orders
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"  # Example: "Order #1024 by ryan123"
@@ -53,3 +151,103 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"  # Example: "T-Shirt x 2"
+
+# Shopping cart of a logged-in user, stored in the database (anonymous visitors keep a session cart)
+class Cart(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')  # Owner of the cart
+    version = models.PositiveIntegerField(default=0)    # Bumped on every change, keys the cached totals
+    updated_at = models.DateTimeField(auto_now=True)    # Last change
+
+    def __str__(self):
+        return f"Cart of {self.user.username}"
+
+# One product in a cart (e.g., 3 x T-Shirt)
+class CartLine(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='lines')  # Which cart
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)                 # Product in the cart
+    quantity = models.PositiveIntegerField()                                      # How many units
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity}"
+
+# Sales rollups (see store/reports.py): one row per day and product / category / order status,
+# kept up to date as orders are placed, change status or are deleted. Reports read these
+# instead of scanning every Order and OrderItem
+class DailyProductSales(models.Model):
+    day = models.DateField()                                         # Day the orders were placed
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)                        # Units sold
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Sum of price * quantity
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id}: {self.quantity}"
+
+class DailyCategorySales(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)  # The product's category when it was sold
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='unique_daily_category_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category_id}: {self.quantity}"
+
+class DailyOrderStatus(models.Model):
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField(default=0)                          # Orders of that day now in this status
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Sum of their totals
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='unique_daily_order_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders}"
+
+
+# Background job waiting for (or being run by) `manage.py run_jobs` (store/jobs.py).
+# Successful jobs are deleted; failed ones stay for a look in the admin.
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),     # Waiting for run_at
+        ('running', 'Running'),   # Claimed by a worker
+        ('failed', 'Failed'),     # Out of attempts
+    ]
+
+    name = models.CharField(max_length=100)                # Registered task name, e.g. send_order_confirmation
+    payload = models.JSONField(default=dict, blank=True)   # Keyword arguments of the task
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0) # Runs started so far
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()                        # Not before this time (pushed back on retries)
+    locked_by = models.CharField(max_length=64, blank=True)     # Claim token of the worker running it
+    locked_at = models.DateTimeField(null=True, blank=True)     # When it was claimed
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The workers' "next due jobs" query, over queued rows only
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='queued'), name='job_due_idx'),
+            # Finding jobs of crashed workers
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='job_running_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
@@ -1,4 +1,252 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
 
-class ProductPagination(PageNumberPagination):
-    page_size = 5 
\ No newline at end of file
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Cursor pagination on a composite key, e.g. (price, id) or (created_at, id).
+    # Each page is a "WHERE (price, id) > (last price, last id) LIMIT n" query,
+    # so there is no COUNT(*) and deep pages cost the same as the first one.
+    # The ordering comes from the queryset (OrderingFilter, search rank, get_queryset)
+    # and falls back to `ordering`; `id` is always added as the tiebreaker.
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('created_at',)
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Same thing with the async ORM (store/async_views.py)
+        return self.finish_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keys(queryset)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor['d'] == 'prev'
+        keys = [self.flip(key) for key in self.keys] if self.reverse else self.keys
+
+        queryset = queryset.order_by(*keys)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.after(keys, self.cursor_values(queryset, self.cursor['v'])))
+
+        # One extra row tells us whether there is a page beyond this one
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        # Walking backwards, "more rows" means more pages before this one
+        self.page = rows
+        self.has_next = True if self.reverse else has_more
+        self.has_previous = has_more if self.reverse else self.cursor is not None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_keys(self, queryset):
+        keys = list(queryset.query.order_by)
+        if not keys or not all(isinstance(key, str) for key in keys):
+            keys = list(self.ordering)
+        names = [key.lstrip('-') for key in keys]
+        if self.tiebreaker not in names and 'pk' not in names:
+            # Break ties in the same direction as the last key
+            keys.append(('-' if keys[-1].startswith('-') else '') + self.tiebreaker)
+        return keys
+
+    def flip(self, key):
+        return key[1:] if key.startswith('-') else '-' + key
+
+    def key_field(self, queryset, name):
+        # Model field (or annotation output field) behind an ordering key
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        model, field = queryset.model, None
+        for part in name.split('__'):
+            field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+            model = field.related_model
+        return field
+
+    def cursor_values(self, queryset, values):
+        # The cursor comes from the client: turn each value into its key's
+        # Python type so a tampered one is a 404, not a 500 from the filter
+        if len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        parsed = []
+        try:
+            for key, value in zip(self.keys, values):
+                field = self.key_field(queryset, key.lstrip('-'))
+                value = field.to_python(value)
+                if value is None:
+                    raise ValueError(key)
+                field.run_validators(value)  # e.g. the backend's integer range
+                parsed.append(value)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return parsed
+
+    def after(self, keys, values):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        # with > swapped for < on descending keys
+        condition = Q()
+        equal = Q()
+        for key, value in zip(keys, values):
+            name = key.lstrip('-')
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def position(self, row):
+        values = []
+        for key in self.keys:
+            name = key.lstrip('-')
+            if isinstance(row, dict):
+                value = row[name]  # .values() row from the fast list path
+            else:
+                value = row
+                for part in name.split('__'):
+                    value = getattr(value, part)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, direction, row):
+        payload = json.dumps({'d': direction, 'v': self.position(row)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            assert cursor['d'] in ('next', 'prev') and isinstance(cursor['v'], list)
+        except (TypeError, ValueError, KeyError, AssertionError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor('next', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor('prev', self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results to return per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class LegacyPageNumberPagination(PageNumberPagination):
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class OptInPageNumberMixin:
+    # Old clients that still send ?page=N get the previous page-number
+    # responses (with "count"); everyone else gets keyset cursors
+    page_number_class = LegacyPageNumberPagination
+    legacy = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_number_class.page_query_param in request.query_params:
+            self.legacy = self.page_number_class()
+            self.legacy.page_size = self.page_size
+            self.legacy.max_page_size = self.max_page_size
+            queryset = queryset.order_by(*self.get_keys(queryset))  # Stable order for OFFSET pages
+            return self.legacy.paginate_queryset(queryset, request, view)
+        self.legacy = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [{
+            'name': self.page_number_class.page_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Page number (legacy page-number mode).',
+            'schema': {'type': 'integer'},
+        }]
+
+
+class ProductPagination(OptInPageNumberMixin, KeysetPagination):
+    page_size = 5
+    ordering = ('created_at',)
+
+
+class OrderPagination(OptInPageNumberMixin, KeysetPagination):
+    page_size = 20
+    ordering = ('-created_at',)
@@ -0,0 +1,163 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyOrderStatus, DailyProductSales, Order, OrderItem
+
+# Sales rollups: revenue and units per day and product / category, orders per
+# day and status. They're updated in the same transaction as the order change
+# (place_order(), status changes and deletes through store/signals.py), so a
+# report reads a few rows per day instead of every Order and OrderItem.
+# Writes that bypass the ORM (loaders, raw inserts, item edits in the admin)
+# are caught up with `manage.py backfill_sales`.
+#
+# Days are in the current time zone (TIME_ZONE), for both the incremental
+# updates and the backfill's TruncDate.
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def add(model, day, key, deltas):
+    # {key value: {column: delta}} added to the rows of `day`, in two queries
+    # whatever the number of keys: create missing rows, then
+    # UPDATE ... SET column = column + CASE key WHEN .. THEN delta END
+    if not deltas:
+        return
+    model.objects.bulk_create([model(day=day, **{key: value}) for value in deltas], ignore_conflicts=True)
+    columns = next(iter(deltas.values()))
+    updates = {
+        column: F(column) + Case(
+            *[When(**{key: value}, then=Value(delta[column])) for value, delta in deltas.items()],
+            default=Value(0), output_field=model._meta.get_field(column).clone(),
+        )
+        for column in columns
+    }
+    model.objects.filter(day=day, **{f'{key}__in': list(deltas)}).update(**updates)
+
+
+def record_items(order, items, sign=1):
+    # Items need their product loaded (for the category); sign=-1 takes them back out
+    products = defaultdict(lambda: {'quantity': 0, 'revenue': Decimal(0)})
+    categories = defaultdict(lambda: {'quantity': 0, 'revenue': Decimal(0)})
+    for item in items:
+        for totals in (products[item.product_id], categories[item.product.category_id]):
+            totals['quantity'] += sign * item.quantity
+            totals['revenue'] += sign * item.price * item.quantity
+    day = order_day(order)
+    add(DailyProductSales, day, 'product_id', products)
+    add(DailyCategorySales, day, 'category_id', categories)
+
+
+def record_status(order, status, sign=1):
+    add(DailyOrderStatus, order_day(order), 'status', {status: {'orders': sign, 'revenue': sign * order.total}})
+
+
+def move_status(order, old, new):
+    add(DailyOrderStatus, order_day(order), 'status', {
+        old: {'orders': -1, 'revenue': -order.total},
+        new: {'orders': 1, 'revenue': order.total},
+    })
+
+
+def remove_order(order):
+    record_items(order, order.items.select_related('product'), sign=-1)
+    record_status(order, order.status, sign=-1)
+
+
+def rebuild(start=None, end=None, batch_size=5000):
+    # Recompute the rollups of days start..end (inclusive, None = open ended) from the orders
+    days = {}
+    if start is not None:
+        days['day__gte'] = start
+    if end is not None:
+        days['day__lte'] = end
+    orders = Order.objects.annotate(day=TruncDate('created_at')).filter(**days)
+    items = OrderItem.objects.annotate(day=TruncDate('order__created_at')).filter(**days)
+    revenue = Sum(F('price') * F('quantity'), output_field=MONEY)
+    sources = [
+        (DailyProductSales, items.values('day', 'product').annotate(units=Sum('quantity'), revenue=revenue),
+         lambda row: DailyProductSales(day=row['day'], product_id=row['product'], quantity=row['units'], revenue=row['revenue'])),
+        (DailyCategorySales, items.values('day', 'product__category').annotate(units=Sum('quantity'), revenue=revenue),
+         lambda row: DailyCategorySales(day=row['day'], category_id=row['product__category'], quantity=row['units'], revenue=row['revenue'])),
+        (DailyOrderStatus, orders.values('day', 'status').annotate(orders=Count('id'), revenue=Sum('total')),
+         lambda row: DailyOrderStatus(day=row['day'], status=row['status'], orders=row['orders'], revenue=row['revenue'])),
+    ]
+    counts = {}
+    with transaction.atomic():
+        for model, rows, build in sources:
+            model.objects.filter(**days).delete()
+            batch, count = [], 0
+            for row in rows.order_by().iterator(chunk_size=batch_size):
+                batch.append(build(row))
+                if len(batch) >= batch_size:
+                    model.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            model.objects.bulk_create(batch)
+            counts[model._meta.label] = count + len(batch)
+    return counts
+
+
+# Reports: reads of the rollups only
+
+GROUPS = ('day', 'product', 'category', 'status')
+
+
+def money(value):
+    return str((value or Decimal(0)).quantize(Decimal('0.01')))
+
+
+def default_range(today=None):
+    end = today or timezone.localdate()
+    return end - timedelta(days=29), end
+
+
+def sales_report(group, start, end, limit=50):
+    days = {'day__gte': start, 'day__lte': end}
+    totals = {'quantity': Sum('quantity'), 'revenue': Sum('revenue')}
+    if group == 'day':
+        orders = dict(
+            DailyOrderStatus.objects.filter(**days).values('day').annotate(orders=Sum('orders')).values_list('day', 'orders')
+        )
+        rows = DailyCategorySales.objects.filter(**days).values('day').annotate(**totals).order_by('day')
+        return [
+            {'day': row['day'].isoformat(), 'orders': orders.get(row['day'], 0),
+             'quantity': row['quantity'], 'revenue': money(row['revenue'])}
+            for row in rows
+        ]
+    if group == 'product':
+        rows = (
+            DailyProductSales.objects.filter(**days).values('product', 'product__name')
+            .annotate(**totals).order_by('-revenue', 'product')[:limit]
+        )
+        return [
+            {'product': row['product'], 'name': row['product__name'],
+             'quantity': row['quantity'], 'revenue': money(row['revenue'])}
+            for row in rows
+        ]
+    if group == 'category':
+        rows = (
+            DailyCategorySales.objects.filter(**days).values('category', 'category__name')
+            .annotate(**totals).order_by('-revenue', 'category')[:limit]
+        )
+        return [
+            {'category': row['category'], 'name': row['category__name'],
+             'quantity': row['quantity'], 'revenue': money(row['revenue'])}
+            for row in rows
+        ]
+    if group == 'status':
+        rows = (
+            DailyOrderStatus.objects.filter(**days).values('status')
+            .annotate(orders=Sum('orders'), revenue=Sum('revenue')).order_by('status')
+        )
+        return [{'status': row['status'], 'orders': row['orders'], 'revenue': money(row['revenue'])} for row in rows]
+    raise ValueError(f'Unknown report group: {group}')
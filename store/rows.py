@@ -0,0 +1,228 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+from common.profiling import timed
+
+from . import fieldsets
+
+# Fast read path for list endpoints.
+# Instead of loading model instances and running a ModelSerializer field by field,
+# a RowBuilder reads plain .values() rows and passes each column through one
+# converter picked up front from the serializer's fields. The dicts it returns
+# are the same as serializer.data (tests/test_rows.py keeps them in step).
+
+
+def identity(value):
+    return value
+
+
+def decimal_converter(field, model_field, request):
+    # Same as DecimalField.to_representation for values that come from the database
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    quantum = Decimal('.1') ** field.decimal_places
+
+    def convert(value):
+        if value is None:
+            return ''
+        return f'{value.quantize(quantum, rounding=field.rounding):f}'
+    return convert
+
+
+def datetime_converter(field, model_field, request):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not value:
+            return None
+        if timezone.is_aware(value):
+            value = value.astimezone(field_timezone)
+        else:
+            value = timezone.make_aware(value, field_timezone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def file_converter(field, model_field, request):
+    # .values() gives the stored name; build the same (absolute) URL as FileField
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda name: name or None
+    storage = model_field.storage
+
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def passthrough(field, model_field, request):
+    return identity
+
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.ChoiceField, serializers.PrimaryKeyRelatedField, serializers.ReadOnlyField,
+)
+
+CONVERTERS = [
+    (serializers.DecimalField, decimal_converter),
+    (serializers.DateTimeField, datetime_converter),
+    (serializers.FileField, file_converter),
+    (PASSTHROUGH_FIELDS, passthrough),
+]
+
+
+def converter_for(field):
+    # Fields can bring their own: row_converter(model_field, request) -> function(value)
+    if hasattr(field, 'row_converter'):
+        return lambda field, model_field, request: field.row_converter(model_field, request)
+    for field_class, factory in CONVERTERS:
+        if isinstance(field, field_class):
+            return factory
+    # Anything else goes through the field itself: slower, but always the same output
+    return lambda field, model_field, request: field.to_representation
+
+
+class RowBuilder:
+    # Builds serializer-shaped dicts from .values() rows.
+    #   computed: {'field': (['column', ...], function)} for fields the serializer
+    #             computes itself; function gets the column values in order
+    # Nested serializers are supported for forward relations (flattened into
+    # product__name style columns) and reverse relations with many=True
+    # (one extra query per page, like prefetch_related).
+
+    def __init__(self, serializer_class, computed=None, prefix=''):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.computed = computed or {}
+        self.prefix = prefix
+        self._plan = None
+
+    def plan(self):
+        # Field introspection runs once per builder, not per request
+        if self._plan is None:
+            self._plan = self.compile()
+        return self._plan
+
+    def compile(self):
+        plan = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in self.computed:
+                columns, function = self.computed[name]
+                plan.append((name, 'computed', ([self.prefix + column for column in columns], function)))
+            elif isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                if self.prefix or not relation.one_to_many:
+                    raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name}: only top-level reverse relations are supported')
+                child = RowBuilder(field.child.__class__)
+                plan.append((name, 'many', (child, relation.field.name)))
+            elif isinstance(field, serializers.BaseSerializer):
+                child = RowBuilder(field.__class__, prefix=self.prefix + field.source.replace('.', '__') + '__')
+                plan.append((name, 'nested', child))
+            else:
+                path = field.source.split('.')
+                model_field = self.model_field(path)
+                plan.append((name, 'column', (self.prefix + '__'.join(path), converter_for(field), field, model_field)))
+        return plan
+
+    def narrow(self, fields=None, omit=None):
+        # Builder for a ?fields= / ?omit= selection (store/fieldsets.py); fewer fields, fewer columns
+        if fields is None and omit is None:
+            return self
+        plan = self.plan()
+        keep = fieldsets.pick([name for name, kind, spec in plan], fields, omit)
+        narrowed = []
+        for name, kind, spec in plan:
+            if name not in keep:
+                continue
+            child_fields, child_omit = fieldsets.child(fields, name), fieldsets.child(omit, name)
+            if kind == 'nested':
+                spec = spec.narrow(child_fields, child_omit)
+            elif kind == 'many':
+                spec = (spec[0].narrow(child_fields, child_omit), spec[1])
+            narrowed.append((name, kind, spec))
+        builder = RowBuilder(self.serializer_class, self.computed, self.prefix)
+        builder._plan = narrowed
+        return builder
+
+    def model_field(self, path):
+        model = self.model
+        model_field = None
+        for part in path:
+            model_field = model._meta.get_field(part)
+            model = model_field.related_model or model
+        return model_field
+
+    def columns(self):
+        # Everything .values() has to select for this builder
+        columns = [self.prefix + self.model._meta.pk.name]
+        for name, kind, spec in self.plan():
+            if kind == 'column':
+                columns.append(spec[0])
+            elif kind == 'computed':
+                columns.extend(spec[0])
+            elif kind == 'nested':
+                columns.extend(spec.columns())
+        return list(dict.fromkeys(columns))
+
+    def steps(self, rows, request):
+        # (name, function(row)) pairs with the request-bound converters
+        steps = []
+        for name, kind, spec in self.plan():
+            if kind == 'column':
+                column, factory, field, model_field = spec
+                convert = factory(field, model_field, request)
+                steps.append((name, lambda row, column=column, convert=convert: convert(row[column])))
+            elif kind == 'computed':
+                columns, function = spec
+                steps.append((name, lambda row, columns=columns, function=function: function(*[row[column] for column in columns])))
+            elif kind == 'nested':
+                child_steps = spec.steps(rows, request)
+                steps.append((name, lambda row, child_steps=child_steps: {key: step(row) for key, step in child_steps}))
+            else:
+                children = self.load_children(spec, rows, request)
+                steps.append((name, lambda row, children=children, pk=self.pk_column(): children.get(row[pk], [])))
+        return steps
+
+    def pk_column(self):
+        return self.prefix + self.model._meta.pk.name
+
+    def load_children(self, spec, rows, request):
+        child, fk_name = spec
+        ids = [row[self.pk_column()] for row in rows]
+        if not ids:
+            return {}
+        child_rows = list(
+            child.model._default_manager.filter(**{f'{fk_name}__in': ids})
+            .order_by('pk').values(fk_name, *child.columns())
+        )
+        children = defaultdict(list)
+        for raw, built in zip(child_rows, child.build(child_rows, request)):
+            children[raw[fk_name]].append(built)
+        return children
+
+    @timed('serialize')
+    def build(self, rows, request=None):
+        rows = list(rows)
+        steps = self.steps(rows, request)
+        return [{name: step(row) for name, step in steps} for row in rows]
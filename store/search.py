@@ -0,0 +1,155 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+
+# Full-text search for products.
+# SQLite (dev) uses an FTS5 external-content table kept in sync by triggers.
+# PostgreSQL uses a generated tsvector column with a GIN index.
+# Both are maintained by the database itself, so admin edits, queryset.update()
+# and bulk_create() can never leave the index stale.
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_words(terms):
+    # Strip operators/quotes so user input can never break the query syntax
+    words = []
+    for term in terms:
+        words.extend(WORD_RE.findall(term))
+    return words
+
+
+class SqliteSearchBackend:
+    table = 'store_product_fts'
+    rank_ordering = 'search_rank'  # bm25(): lower is a better match
+
+    install_sql = [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table}
+            USING fts5(name, description, content='store_product', content_rowid='id',
+                       tokenize='porter unicode61')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON store_product BEGIN
+                INSERT INTO {table}(rowid, name, description) VALUES (new.id, new.name, new.description);
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON store_product BEGIN
+                INSERT INTO {table}({table}, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END""",
+        # Only reindex when searchable text changes, not on every stock update
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF name, description ON store_product BEGIN
+                INSERT INTO {table}({table}, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO {table}(rowid, name, description) VALUES (new.id, new.name, new.description);
+            END""",
+    ]
+    rebuild_sql = [f"INSERT INTO {table}({table}) VALUES ('rebuild')"]
+    uninstall_sql = [
+        f'DROP TRIGGER IF EXISTS {table}_ai',
+        f'DROP TRIGGER IF EXISTS {table}_ad',
+        f'DROP TRIGGER IF EXISTS {table}_au',
+        f'DROP TABLE IF EXISTS {table}',
+    ]
+
+    def build_query(self, words):
+        # "lap"* "pro"* -> every word must match, as a prefix (search-as-you-type)
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search(self, queryset, words):
+        query = self.build_query(words)
+        matches = RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [query])
+        rank = RawSQL(
+            f'SELECT rank FROM {self.table} WHERE {self.table} MATCH %s AND rowid = store_product.id',
+            [query], output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+
+class PostgresSearchBackend:
+    rank_ordering = '-search_rank'  # ts_rank(): higher is a better match
+
+    install_sql = [
+        """ALTER TABLE store_product ADD COLUMN IF NOT EXISTS search_vector tsvector
+           GENERATED ALWAYS AS (
+               setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+               setweight(to_tsvector('english', coalesce(description, '')), 'B')
+           ) STORED""",
+        'CREATE INDEX IF NOT EXISTS store_product_search_vector_gin ON store_product USING GIN (search_vector)',
+    ]
+    rebuild_sql = []  # Generated column is always current
+    uninstall_sql = [
+        'DROP INDEX IF EXISTS store_product_search_vector_gin',
+        'ALTER TABLE store_product DROP COLUMN IF EXISTS search_vector',
+    ]
+
+    def build_query(self, words):
+        return ' & '.join(f'{word}:*' for word in words)
+
+    def search(self, queryset, words):
+        query = self.build_query(words)
+        matches = RawSQL(
+            "store_product.search_vector @@ to_tsquery('english', %s)", [query], output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            "ts_rank(store_product.search_vector, to_tsquery('english', %s))", [query], output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(conn=None):
+    # Returns None when the database has no full-text support we know about
+    path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    backend_class = BACKENDS.get((conn or connection).vendor)
+    return backend_class() if backend_class else None
+
+
+def install(conn, rebuild=False):
+    backend = get_search_backend(conn)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        for sql in backend.install_sql:
+            cursor.execute(sql)
+        if rebuild:
+            for sql in backend.rebuild_sql:
+                cursor.execute(sql)
+
+
+def uninstall(conn):
+    backend = get_search_backend(conn)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        for sql in backend.uninstall_sql:
+            cursor.execute(sql)
+
+
+class FullTextSearchFilter(SearchFilter):
+    # Drop-in replacement for SearchFilter: same ?search= param, but matched
+    # through the full-text index and ranked by relevance. Falls back to the
+    # regular ILIKE search on databases without a backend.
+
+    def filter_queryset(self, request, queryset, view):
+        backend = get_search_backend()
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        words = search_words(terms)
+        if not words:
+            return queryset.none()  # Only punctuation: nothing can match
+        queryset = backend.search(queryset, words)
+        return queryset.order_by(backend.rank_ordering, '-id')
@@ -1,28 +1,159 @@
 from rest_framework import serializers
-from .models import Product, Category, Order, OrderItem
+from .models import Product, Category, Order, OrderItem, Cart, CartLine
+from . import carts
+from .rows import RowBuilder
+from .images import ImageVariantsField
+from . import fieldsets
+from common.profiling import measure
+
+
+# Serialization time shows up as "serialize" in the request profile (common/profiling.py)
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        return measure('serialize', super().to_representation, instance)
+
+
+# ?fields= / ?omit= support (store/fieldsets.py), nested serializers included.
+# field_columns lists the model columns a field reads when that isn't just its source.
+class SparseFieldsMixin:
+    field_columns = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.context.get('fieldset')
+        if not selection:
+            return fields
+        path = self.fieldset_path()
+        keep = fieldsets.pick(list(fields), fieldsets.at(selection[0], path), fieldsets.at(selection[1], path))
+        return {name: field for name, field in fields.items() if name in keep}
+
+    def fieldset_path(self):
+        # e.g. ['items', 'product'] for the product inside an order item
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return path[::-1]
+
+class ProductSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    field_columns = {'stock': ['stock', 'stock_slots']}  # See to_representation()
+    image_variants = ImageVariantsField()  # Thumbnail / WebP URLs by size
 
-class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        read_only_fields = ['stock_slots']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'stock' in data:
+            data['stock'] = instance.total_stock  # Includes inventory slots of hot products
+        return data
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name']
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+# Just enough product info to show an order line, no description/image/stock
+class OrderItemProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price']
+
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    product = OrderItemProductSerializer(read_only=True)
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity', 'price']
 
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(source='orderitem_set', many=True, read_only=True)
+# One cart line when placing an order through the API
+class OrderLineSerializer(serializers.Serializer):
+    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    quantity = serializers.IntegerField(min_value=1)
+
+class OrderSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+    lines = OrderLineSerializer(many=True, write_only=True, required=False)
     user = serializers.ReadOnlyField(source='user.username')
     class Meta:
         model = Order
         fields = '__all__'
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'total', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        if self.instance is None and not attrs.get('lines'):
+            raise serializers.ValidationError({'lines': ['An order needs at least one line.']})
+        return attrs
+
+    def update(self, instance, validated_data):
+        validated_data.pop('lines', None)  # Items can't be changed after the order is placed
+        return super().update(instance, validated_data)
+
+
+class CartLineSerializer(serializers.ModelSerializer):
+    product = OrderItemProductSerializer(read_only=True)
+    subtotal = serializers.SerializerMethodField()
+    class Meta:
+        model = CartLine
+        fields = ['product', 'quantity', 'subtotal']
+
+    def get_subtotal(self, line):
+        return str(line.product.price * line.quantity)
+
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    lines = serializers.SerializerMethodField()
+    items = serializers.SerializerMethodField()
+    total = serializers.SerializerMethodField()
+    class Meta:
+        model = Cart
+        fields = ['version', 'items', 'total', 'lines', 'updated_at']
+
+    def get_lines(self, cart):
+        return CartLineSerializer(cart.lines.select_related('product').order_by('pk'), many=True).data
+
+    def get_items(self, cart):
+        return carts.totals(cart)['items']
+
+    def get_total(self, cart):
+        return str(carts.totals(cart)['total'])
+
+# One change in a batched cart update: set a quantity, add/subtract, or remove
+class CartChangeSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    delta = serializers.IntegerField(required=False)
+    remove = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        given = [name for name in ('quantity', 'delta', 'remove') if name in attrs]
+        if len(given) != 1:
+            raise serializers.ValidationError('Give exactly one of quantity, delta or remove.')
+        return attrs
+
+class CartUpdateSerializer(serializers.Serializer):
+    changes = CartChangeSerializer(many=True, allow_empty=False)
+    version = serializers.IntegerField(required=False)  # Optional: reject if the cart changed since
+
+    def validate_changes(self, changes):
+        # One query for all products instead of a PrimaryKeyRelatedField lookup per change
+        ids = {change['product'] for change in changes}
+        found = set(Product.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        missing = sorted(ids - found)
+        if missing:
+            raise serializers.ValidationError(f'Unknown product(s): {missing}')
+        return changes
+
+
+# Rows for the fast list path (store/rows.py): same output as the serializers above.
+# ProductSerializer computes "stock" itself, so the builder does the same from the
+# columns that Product.objects.with_stock() selects.
+def product_stock(stock, stock_slots, slot_stock):
+    return stock + slot_stock if stock_slots else stock
 
+product_rows = RowBuilder(ProductSerializer, computed={'stock': (['stock', 'stock_slots', 'slot_stock'], product_stock)})
+category_rows = RowBuilder(CategorySerializer)
+order_rows = RowBuilder(OrderSerializer)
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Product, Order, OrderItem
+from . import cache as catalog_cache
+from . import inventory
+from . import jobs
+from . import reports
+
+
+class OutOfStock(Exception):
+    # Raised when at least one cart line asks for more than is in stock
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(product.name for product in products)
+        super().__init__(f'Not enough stock for: {names}')
+
+
+class EmptyOrder(Exception):
+    pass
+
+
+def place_order(user, lines, **fields):
+    # Create an order from {product_id: quantity} in one transaction:
+    #   1 SELECT for prices, 1 conditional UPDATE for all stock, 1 INSERT for the order,
+    #   1 bulk INSERT for its items, the sales rollup updates and 1 INSERT per queued job.
+    #   Either all of it commits or none of it does.
+    lines = {int(product_id): int(qty) for product_id, qty in lines.items() if int(qty) > 0}
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk(list(lines))
+        lines = {pk: qty for pk, qty in lines.items() if pk in products}  # Drop products deleted since
+        if not lines:
+            raise EmptyOrder('Your cart is empty.')
+
+        # Hot products take stock from their inventory slots instead of the Product row
+        hot = {pk: qty for pk, qty in lines.items() if products[pk].stock_slots}
+        if len(hot) < len(lines):
+            reserve_stock({pk: qty for pk, qty in lines.items() if pk not in hot})
+        for pk in sorted(hot):
+            if not inventory.claim(products[pk], hot[pk]):
+                raise OutOfStock([products[pk]])
+
+        order = Order.objects.create(
+            user=user,
+            total=sum(products[pk].price * qty for pk, qty in lines.items()),
+            **fields,
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[pk], quantity=qty, price=products[pk].price)
+            for pk, qty in lines.items()
+        ])
+        reports.record_items(order, items)  # Sales rollups, 4 queries whatever the cart size
+        # Slow side effects run in `manage.py run_jobs`; the job commits with the order
+        jobs.enqueue('send_order_confirmation', order_id=order.pk)
+
+        # queryset.update() skips post_save, so invalidate cached stock ourselves:
+        # lists, facets, in_stock filters and list ETags all show it
+        transaction.on_commit(lambda: catalog_cache.bump_generation('product'))
+    return order
+
+
+def reserve_stock(lines):
+    # UPDATE store_product SET stock = stock - CASE id WHEN .. END
+    # WHERE id IN (..) AND stock >= CASE id WHEN .. END
+    # The WHERE makes the check and the decrement a single atomic step, so two
+    # checkouts can never both take the last unit.
+    wanted = Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in lines.items()],
+        output_field=IntegerField(),
+    )
+    savepoint = transaction.savepoint()
+    updated = (
+        Product.objects.filter(pk__in=list(lines), stock__gte=wanted)
+        .update(stock=F('stock') - wanted, updated_at=timezone.now())
+    )
+    if updated == len(lines):
+        transaction.savepoint_commit(savepoint)
+        return
+
+    # Undo the lines that did fit, then report the ones that did not
+    transaction.savepoint_rollback(savepoint)
+    current = Product.objects.filter(pk__in=list(lines)).order_by('pk')
+    raise OutOfStock([product for product in current if product.stock < lines[product.pk]])
@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import Product, Category, Order
+from . import cache as catalog_cache
+from . import carts
+from . import reports
+from . import images
+from . import authentication
+
+
+# Any product change (API, admin, shell) makes cached product pages stale
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_cache(sender, **kwargs):
+    catalog_cache.bump_generation('product')
+
+
+# A new or replaced image gets its resized variants from a background job
+@receiver(post_save, sender=Product)
+def make_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return  # loaddata; manage.py generate_image_variants catches up
+    if instance.image and not images.is_current(instance):
+        images.generate_later(instance)
+    elif not instance.image and instance.image_variants:
+        images.generate_later(instance)  # Image removed: drop the variants too
+
+
+# Category changes can also change product filter results (?category=), so bump both
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    catalog_cache.bump_generation('category', 'product')
+
+
+# Cached API users (store/authentication.py): a saved user may have been
+# deactivated or changed their password, a deleted token must stop working
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    authentication.invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_tokens(sender, **kwargs):
+    authentication.invalidate_tokens()
+
+
+# Remember the status an order was loaded with, so a save can tell it changed.
+# __dict__ avoids a query when status was deferred with .only()
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+# Keep the sales rollups in step with new orders and status changes
+# (mark_order_paid, the admin's list_editable status, the API)
+@receiver(post_save, sender=Order)
+def update_order_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # loaddata; backfill_sales catches up
+    if created:
+        reports.record_status(instance, instance.status)
+    elif instance._loaded_status is not None and instance.status != instance._loaded_status:
+        reports.move_status(instance, instance._loaded_status, instance.status)
+    instance._loaded_status = instance.status
+
+
+# Take a deleted order (and its items, still there at pre_delete) out of the rollups
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollups(sender, instance, **kwargs):
+    reports.remove_order(instance)
+
+
+# SQLite drops triggers when Django rebuilds a table during a migration,
+# so make sure the search index triggers are in place after every migrate
+def ensure_search_index(sender, using='default', **kwargs):
+    from django.db import connections
+    from . import search
+    search.install(connections[using])
+
+
+# Keep what an anonymous visitor put in their session cart when they log in
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        carts.merge_session_cart(request, user)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from .jobs import task
+from .models import Order, Product
+from . import images
+
+# Work done by `manage.py run_jobs` instead of inside the request (store/jobs.py).
+# Queued with jobs.enqueue('<function name>', **kwargs).
+
+
+# Queued by place_order() in the order's transaction
+@task(max_attempts=8)  # Mail servers have bad minutes
+def send_order_confirmation(order_id):
+    order = Order.objects.with_items().select_related('user').filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return  # Deleted since, or nowhere to send it
+    send_mail(
+        subject=f'Your order #{order.id}',
+        message=render_to_string('store/emails/order_confirmation.txt', {'order': order}),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[order.user.email],
+    )
+
+
+# Queued by the Product post_save signal when an image is uploaded or removed
+@task(max_attempts=3)
+def make_image_variants(product_id):
+    product = Product.objects.filter(pk=product_id).first()
+    if product is not None and not (product.image and images.is_current(product)):
+        images.generate(product)
@@ -0,0 +1,30 @@
+from django import template
+
+from store import images
+
+register = template.Library()
+
+
+# <picture> with WebP and JPEG srcsets of a product's image variants, falling
+# back to the original upload until the variants exist:
+#   {% load product_images %}
+#   {% product_picture product sizes="220px" %}
+@register.inclusion_tag('store/picture.html')
+def product_picture(product, sizes='100vw', default_size='small'):
+    context = {'product': product, 'sizes': sizes, 'sources': [], 'src': None}
+    if not product.image:
+        return context
+    variants = images.urls(product.image_variants, product.image.storage.url) if images.is_current(product) else {}
+    if not variants:
+        context['src'] = product.image.url
+        return context
+
+    by_width = sorted(variants.values(), key=lambda entry: entry['width'])
+    for key, mime in (('webp', 'image/webp'), ('jpeg', 'image/jpeg')):
+        context['sources'].append({
+            'type': mime,
+            'srcset': ', '.join(f'{entry[key]} {entry["width"]}w' for entry in by_width),
+        })
+    fallback = variants.get(default_size) or by_width[0]
+    context.update(src=fallback['jpeg'], width=fallback['width'], height=fallback['height'])
+    return context
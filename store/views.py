@@ -1,8 +1,8 @@
 # Import shortcuts to render templates, get an object or show 404 error, and redirect users
 from django.shortcuts import render, get_object_or_404, redirect
 
-# Import models to access Products, Categories, Orders, and OrderItems in the database
-from .models import Product, Category, Order, OrderItem
+# Import models to access Products, Categories, and Orders in the database
+from .models import Product, Category, Order
 
 # Decorator to restrict views to POST requests only (security for form actions)
 from django.views.decorators.http import require_POST
@@ -26,11 +26,17 @@ from .models import Product
 from .serializers import ProductSerializer
 
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import permission_classes
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import authentication_classes
-from .serializers import ProductSerializer, CategorySerializer, OrderSerializer
+from .serializers import ProductSerializer, CategorySerializer, OrderSerializer, CartSerializer, CartUpdateSerializer
+from .serializers import product_rows, category_rows, order_rows
+from .renderers import FastJSONRenderer
+from .authentication import CachedTokenAuthentication
+from rest_framework.renderers import BrowsableAPIRenderer
+from .services import place_order, OutOfStock, EmptyOrder
+from . import carts
+from rest_framework.exceptions import ValidationError
 
 
 # Show all products and categories on homepage (like Amazon main page)
@@ -44,46 +50,38 @@ def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)   # Find product by ID (pk)
     if request.method == "POST":
         quantity = int(request.POST.get('quantity', 1))  # How many to add (default 1)
-        cart = request.session.get('cart', {})           # Get current session cart
-        if str(pk) in cart:
-            cart[str(pk)] += quantity                     # Increase quantity if already in cart
-        else:
-            cart[str(pk)] = quantity                       # Add new product to cart
-        request.session['cart'] = cart                     # Save cart back to session
+        carts.change(request, [{'product': pk, 'delta': quantity}])  # Add to DB cart (or session cart if anonymous)
         return redirect('cart_view')                       # Redirect to cart page
     return render(request, 'store/product_detail.html', {'product': product})
 
 # Show the cart page with items user added
 def cart_view(request):
-    cart = request.session.get('cart', {})                 # Get cart from session
-    products = Product.objects.filter(pk__in=cart.keys())  # Get products in cart
-    cart_items = []
-    total = 0
-    for product in products:
-        qty = cart[str(product.pk)]                         # Quantity of this product
-        subtotal = product.price * qty                       # Price * quantity
-        total += subtotal                                    # Add to total cost
-        cart_items.append({'product': product, 'quantity': qty, 'subtotal': subtotal})
+    cart_items, total = carts.cart_items(request)          # Lines with subtotals, total from one SUM query
     return render(request, 'store/cart.html', {'cart_items': cart_items, 'total': total})
 
 # Update cart (increase, decrease, remove products)
 @require_POST  # Only allow POST for safety
 def update_cart(request):
-    product_id = str(request.POST.get('product_id'))  # Product to update (by ID)
+    try:
+        product_id = int(request.POST.get('product_id'))  # Product to update (by ID)
+    except (TypeError, ValueError):
+        messages.error(request, 'Unknown product.')       # Missing or not a number
+        return redirect('cart_view')
     action = request.POST.get('action')                # What to do: increase, decrease, remove
-    cart = request.session.get('cart', {})
-
-    if product_id in cart:
-        if action == 'increase':
-            cart[product_id] += 1       # Add one more of the product
-        elif action == 'decrease':
-            cart[product_id] -= 1       # Remove one
-            if cart[product_id] <= 0:
-                del cart[product_id]    # Remove from cart if zero or less
-        elif action == 'remove':
-            del cart[product_id]        # Remove all of this product
-
-    request.session['cart'] = cart   # Save updated cart
+
+    # Only lines already in the cart change (adding goes through the product page)
+    if not carts.contains(request, product_id):
+        if not Product.objects.filter(pk=product_id).exists():
+            messages.error(request, 'Unknown product.')
+        return redirect('cart_view')
+
+    if action == 'increase':
+        carts.change(request, [{'product': product_id, 'delta': 1}])     # Add one more of the product
+    elif action == 'decrease':
+        carts.change(request, [{'product': product_id, 'delta': -1}])    # Remove one (line goes away at zero)
+    elif action == 'remove':
+        carts.change(request, [{'product': product_id, 'remove': True}]) # Remove all of this product
+
     return redirect('cart_view')     # Go back to cart page
 
 # Handle user login (Ryan or Saba logging in)
@@ -122,41 +120,22 @@ def register_view(request):
 # Checkout page for placing orders (Saba buying items)
 @login_required
 def checkout_view(request):
-    cart = request.session.get('cart', {})                 # Get cart
-    products = Product.objects.filter(pk__in=cart.keys())  # Get products in cart
-    cart_items = []
-    total = 0
-    for product in products:
-        qty = cart[str(product.pk)]                         # Quantity
-        subtotal = product.price * qty                       # Price * qty
-        total += subtotal                                    # Add to total
-        cart_items.append({'product': product, 'quantity': qty, 'subtotal': subtotal})
+    cart = carts.get_cart(request.user)                    # Logged-in users always have a DB cart
+    cart_items, total = carts.cart_items(request)
 
     if request.method == 'POST':
         name = request.POST['name']         # Shipping name
         address = request.POST['address']   # Shipping address
         phone = request.POST['phone']       # Contact phone
 
-        # Create new Order in DB with status pending
-        order = Order.objects.create(
-            user=request.user,
-            name=name,
-            address=address,
-            phone=phone,
-            total=total,
-            status='pending'
-        )
-
-        # Create OrderItems for each product in cart
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item['product'],
-                quantity=item['quantity'],
-                price=item['product'].price
-            )
-
-        request.session['cart'] = {}  # Clear cart after order
+        # Create the Order, its items and the stock decrements in one transaction
+        try:
+            order = place_order(request.user, carts.lines(cart), name=name, address=address, phone=phone, status='pending')
+        except (OutOfStock, EmptyOrder) as exc:
+            messages.error(request, str(exc))   # e.g. "Not enough stock for: Laptop"
+            return redirect('cart_view')
+
+        carts.clear(cart)  # Clear cart after order
         return render(request, 'store/checkout_success.html', {'order': order})
 
     # Show checkout form and summary
@@ -165,7 +144,7 @@ def checkout_view(request):
 # Show logged-in user's past orders (e.g., Saba's orders)
 @login_required
 def order_history_view(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')  # Get user's orders newest first
+    orders = Order.objects.with_items().filter(user=request.user).order_by('-created_at')  # Get user's orders newest first, items preloaded
     return render(request, 'store/order_history.html', {'orders': orders})
 
 # Admin-only: Mark an order as paid (simulate payment)
@@ -196,18 +175,22 @@ def api_product_list(request):
 
 @csrf_exempt
 @api_view(['GET', 'PUT', 'DELETE'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def api_product_detail(request, pk):
-    print("=== api_product_detail was called ===")
     try:
         product = Product.objects.get(pk=pk)
     except Product.DoesNotExist:
         return Response(status=404)
 
     if request.method == 'GET':
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
+        # Answer If-None-Match / If-Modified-Since before serializing anything
+        etag = make_etag('product', product.pk, product.updated_at, product.total_stock)
+        last_modified = product.updated_at if not product.stock_slots else None
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = Response(ProductSerializer(product).data)
+        return set_validators(response, etag, last_modified)
 
     elif request.method == 'PUT':
         serializer = ProductSerializer(product, data=request.data)
@@ -222,38 +205,151 @@ def api_product_detail(request, pk):
 
 
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from django.http import StreamingHttpResponse
+from . import bulk
 from .models import Category
 from .serializers import CategorySerializer
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+from .mixins import CatalogCacheMixin, ConditionalGetMixin, FastListMixin, SparseFieldsViewMixin, make_etag, not_modified, set_validators
+from . import cache as catalog_cache
+
+class CategoryViewSet(ConditionalGetMixin, CatalogCacheMixin, FastListMixin, SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
+    cache_namespace = 'category'
+    row_builder = category_rows
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     serializer_class = CategorySerializer
 
-from .pagination import ProductPagination
+from .pagination import ProductPagination, OrderPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from .search import FullTextSearchFilter
+from .filters import InStockFilter, ProductFilterSet, ProductOrderingFilter
+from . import facets as catalog_facets
+from . import reports
+from datetime import date
 from .permissions import IsStaffOrReadOnly, IsOwnerOrStaff
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(ConditionalGetMixin, CatalogCacheMixin, FastListMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.with_stock()
+    cache_namespace = 'product'
+    etag_sum_fields = ('slot_stock',)  # Hot products' stock lives outside the Product row
+    row_builder = product_rows
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     serializer_class = ProductSerializer
     pagination_class = ProductPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['category', 'price', 'stock']
+    filter_backends = [DjangoFilterBackend, InStockFilter, FullTextSearchFilter, ProductOrderingFilter]
+    filterset_class = ProductFilterSet
     search_fields = ['name',  'description']
     ordering_fields = ['price', 'created_at', 'stock']
     permission_classes =[IsStaffOrReadOnly]
 
+    # The filtered list page plus its facet counts, so a category page needs one request
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        response = self.list(request)  # Same paging, caching and ETag as /api/products/
+        if response.status_code == 200:
+            filtered = lambda: self.filter_queryset(Product.objects.with_stock())  # ?stock= goes by sellable_stock
+            response.data = dict(response.data, facets=catalog_facets.get_facets(request, filtered))
+        return response
+
+    # Staff-only: upsert products by SKU from an NDJSON (default) or CSV body
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser])
+    def bulk_import(self, request):
+        try:
+            batch_size = min(int(request.query_params.get('batch_size', 1000)), 5000)
+        except ValueError:
+            batch_size = 1000
+        # Read the raw body line by line; touching request.data would load it all
+        body = request._request
+        rows = bulk.read_csv(body) if request.content_type == 'text/csv' else bulk.read_ndjson(body)
+        result = bulk.import_products(rows, batch_size=max(batch_size, 1))
+        return Response(result, status=200 if not result['errors'] else 207)
+
+    # Staff-only: stream the whole catalog as NDJSON (default) or ?type=csv
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        rows = bulk.export_rows()
+        if request.query_params.get('type') == 'csv':
+            response = StreamingHttpResponse(bulk.export_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="products.csv"'
+        else:
+            response = StreamingHttpResponse(bulk.export_ndjson(rows), content_type='application/x-ndjson')
+        return response
+
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    row_builder = order_rows
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    pagination_class = OrderPagination
     permission_classes = [IsOwnerOrStaff]
+    queryset = Order.objects.with_items().order_by('-created_at')
 
     def get_queryset(self):
+        orders = super().get_queryset()  # Narrowed to ?fields= / ?omit= by SparseFieldsViewMixin
         if self.request.user.is_staff:
-            return Order.objects.all().order_by('-created_at')
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+            return orders
+        return orders.filter(user=self.request.user)
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-
+        # Same transactional write path as the HTML checkout
+        data = dict(serializer.validated_data)
+        lines = {}
+        for line in data.pop('lines'):
+            lines[line['product'].pk] = lines.get(line['product'].pk, 0) + line['quantity']
+        try:
+            serializer.instance = place_order(self.request.user, lines, **data)
+        except (OutOfStock, EmptyOrder) as exc:
+            raise ValidationError({'lines': [str(exc)]})
+
+
+
+# Staff-only: sales per day / product / category / status, read from the rollup tables
+# ?group=day (default), ?from=YYYY-MM-DD&to=YYYY-MM-DD (default: the last 30 days), ?limit=
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def api_sales_report(request):
+    group = request.query_params.get('group', 'day')
+    if group not in reports.GROUPS:
+        raise ValidationError({'group': [f'Choose one of: {", ".join(reports.GROUPS)}.']})
+    start, end = reports.default_range()
+    try:
+        start = date.fromisoformat(request.query_params.get('from') or start.isoformat())
+        end = date.fromisoformat(request.query_params.get('to') or end.isoformat())
+    except ValueError:
+        raise ValidationError({'from': ['Dates look like 2025-01-31.']})
+    try:
+        limit = min(max(int(request.query_params.get('limit', 50)), 1), 1000)
+    except ValueError:
+        raise ValidationError({'limit': ['Must be a number.']})
+    return Response({
+        'group': group,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'results': reports.sales_report(group, start, end, limit),
+    })
+
+
+# Staff-only: hit/miss counters of the catalog cache in this process
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def api_cache_stats(request):
+    return Response(catalog_cache.stats())
+
+
+# Logged-in user's cart: GET it, or POST many line changes at once, e.g.
+# {"changes": [{"product": 1, "quantity": 3}, {"product": 2, "delta": -1}, {"product": 5, "remove": true}]}
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def api_cart(request):
+    cart = carts.get_cart(request.user)
+    if request.method == 'POST':
+        serializer = CartUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        try:
+            cart = carts.apply_changes(cart, serializer.validated_data['changes'], serializer.validated_data.get('version'))
+        except carts.CartConflict as exc:
+            return Response({'error': str(exc), 'version': exc.version}, status=409)
+    return Response(CartSerializer(cart).data)
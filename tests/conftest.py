@@ -54,3 +54,16 @@ def authenticated_api_client(test_user):
     return client
 
 
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    from store import cache as catalog_cache
+    from store import authentication
+    from common import ratelimit
+    cache.clear()
+    catalog_cache.reset_stats()
+    authentication.clear()
+    ratelimit.reset()
+    yield
+    cache.clear()
@@ -0,0 +1,66 @@
+import re
+
+from django.db import connections
+
+# EXPLAIN-based check that requests only read big tables through indexes.
+#
+#     with QueryPlans() as plans:
+#         client.get('/api/products/?ordering=price')
+#     assert plans.full_scans() == []
+#
+# SQLite plans queries as if tables were large unless ANALYZE has run, and
+# on PostgreSQL sequential scans are switched off while explaining, so both
+# show the plan a big table would get even in a near-empty test database.
+
+# Tables that grow with the business; scanning categories or sessions is fine
+BIG_TABLES = ('store_product', 'store_order', 'store_orderitem', 'store_inventoryslot', 'store_cartline', 'auth_user')
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+class QueryPlans:
+    def __init__(self, using='default'):
+        self.connection = connections[using]
+        self.queries = []   # (sql, params) of every SELECT
+
+    def __enter__(self):
+        self.wrapper = self.connection.execute_wrapper(self.record)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wrapper.__exit__(*exc_info)
+
+    def record(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    def plans(self):
+        return [(sql, explain(self.connection, sql, params)) for sql, params in self.queries]
+
+    def full_scans(self, tables=BIG_TABLES):
+        # [(sql, plan line)] for every full scan of one of `tables`
+        pattern = SQLITE_SCAN if self.connection.vendor == 'sqlite' else POSTGRES_SCAN
+        scans = []
+        for sql, plan in self.plans():
+            for line in plan:
+                match = pattern.search(line.strip())
+                # "SCAN store_product USING INDEX ..." walks an index in order (with a LIMIT); that's fine
+                if match and match.group(1) in tables and 'USING' not in line:
+                    scans.append((sql, line.strip()))
+        return scans
+
+
+def explain(connection, sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            cursor.execute('EXPLAIN ' + sql, params)
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.execute('RESET enable_seqscan')
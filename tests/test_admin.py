@@ -0,0 +1,76 @@
+import pytest
+from django.urls import reverse
+from store.admin import EstimatedCountPaginator
+from store.models import Order, OrderItem, Product
+
+
+@pytest.fixture
+def admin_client(client, django_user_model):
+    client.force_login(django_user_model.objects.create_superuser('boss', 'boss@example.com', 'pass'))
+    return client
+
+@pytest.fixture
+def many_orders(test_user, other_user, create_test_products):
+    orders = []
+    for index in range(30):
+        user = test_user if index % 2 else other_user
+        order = Order.objects.create(user=user, name='A', address='B', phone='1', total=10)
+        OrderItem.objects.create(order=order, product=create_test_products[index % 2], quantity=1, price=10)
+        orders.append(order)
+    return orders
+
+@pytest.mark.django_db
+def test_order_changelist_queries_dont_grow_with_rows(admin_client, many_orders, django_assert_max_num_queries):
+    with django_assert_max_num_queries(10):
+        response = admin_client.get(reverse('admin:store_order_changelist'))
+    assert response.status_code == 200
+    with django_assert_max_num_queries(10):
+        assert admin_client.get(reverse('admin:store_orderitem_changelist')).status_code == 200
+
+@pytest.mark.django_db
+def test_user_filter_is_a_text_box(admin_client, many_orders, test_user, other_user):
+    url = reverse('admin:store_order_changelist')
+    page = admin_client.get(url).content.decode()
+    assert f'?user={other_user.pk}' not in page   # No link per user
+    assert 'name="user"' in page
+
+    response = admin_client.get(url, {'user': 'test_user', 'status__exact': 'pending'})
+    assert response.context['cl'].result_count == 15
+    assert 'name="status__exact" value="pending"' in response.content.decode()  # Kept when filtering by user
+    assert admin_client.get(url, {'user': str(other_user.pk)}).context['cl'].result_count == 15
+
+@pytest.mark.django_db
+def test_estimated_counts(admin_client, many_orders, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(EstimatedCountPaginator, 'exact_limit', 10)
+    paginator = EstimatedCountPaginator(Order.objects.order_by('-id'), 5)
+    with django_assert_num_queries(1):
+        assert paginator.count == many_orders[-1].pk  # Highest id, no COUNT(*)
+    # Filtered lists are counted, but only up to the limit
+    assert EstimatedCountPaginator(Order.objects.filter(status='pending').order_by('-id'), 5).count == 11
+    assert EstimatedCountPaginator(Order.objects.filter(pk__lte=many_orders[2].pk).order_by('-id'), 5).count == 3
+
+    response = admin_client.get(reverse('admin:store_order_changelist'))
+    assert response.context['cl'].result_count == many_orders[-1].pk
+
+@pytest.mark.django_db
+def test_foreign_keys_use_autocomplete(admin_client, many_orders):
+    page = admin_client.get(reverse('admin:store_order_change', args=[many_orders[0].pk])).content.decode()
+    assert 'admin-autocomplete' in page
+    assert 'data-field-name="product"' in page
+    assert '<option value="%d">Rui</option>' % Product.objects.get(name='Rui').pk not in page
+
+    page = admin_client.get(reverse('admin:store_orderitem_add')).content.decode()
+    assert page.count('admin-autocomplete') >= 2
+
+@pytest.mark.django_db
+def test_product_search_and_autocomplete(admin_client, create_test_products):
+    laptop = create_test_products[0]
+    Product.objects.filter(pk=laptop.pk).update(sku='LAP-1')
+    url = reverse('admin:store_product_changelist')
+    assert list(admin_client.get(url, {'q': 'powerful'}).context['cl'].result_list) == [laptop]
+    assert list(admin_client.get(url, {'q': 'LAP-1'}).context['cl'].result_list) == [laptop]
+
+    response = admin_client.get(reverse('admin:autocomplete'), {
+        'term': 'lap', 'app_label': 'store', 'model_name': 'orderitem', 'field_name': 'product',
+    })
+    assert [result['text'] for result in response.json()['results']] == ['Laptop']
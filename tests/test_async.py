@@ -0,0 +1,83 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import Client
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from common.middleware import DisableCSRFOnAPI
+from store.loadtest import percentile, run_load
+
+
+@pytest.mark.django_db
+def test_async_product_list_matches_sync(authenticated_api_client, create_test_products):
+    client = Client()
+    for params in [{}, {'ordering': '-price'}, {'search': 'laptop'}, {'fields': 'name,stock'}, {'category': create_test_products[1].category_id}]:
+        sync_body = authenticated_api_client.get(reverse('product-list'), params).json()
+        async_body = client.get(reverse('async_product_list'), params).json()
+        assert async_body['results'] == sync_body['results'], params
+
+@pytest.mark.django_db
+def test_async_product_cursor_pages(create_test_products):
+    client = Client()
+    first = client.get(reverse('async_product_list'), {'page_size': 1}).json()
+    assert first['results'][0]['name'] == 'Laptop'
+    second = client.get(first['next']).json()
+    assert second['results'][0]['name'] == 'Rui'
+    assert second['next'] is None
+
+@pytest.mark.django_db
+def test_async_product_list_etag_and_cache(create_test_products):
+    client = Client()
+    url = reverse('async_product_list')
+    first = client.get(url)
+    assert first['X-Cache'] == 'MISS'
+    assert client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code == status.HTTP_304_NOT_MODIFIED
+    assert client.get(url)['X-Cache'] == 'HIT'
+
+@pytest.mark.django_db
+def test_async_product_detail(authenticated_api_client, create_test_products):
+    product = create_test_products[0]
+    response = Client().get(reverse('async_product_detail', args=[product.pk]))
+    assert response.json() == authenticated_api_client.get(reverse('product-detail', args=[product.pk])).json()
+    not_modified = Client().get(reverse('async_product_detail', args=[product.pk]), HTTP_IF_NONE_MATCH=response['ETag'])
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert Client().get(reverse('async_product_detail', args=[999])).status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_async_bad_filter_is_400(create_test_products):
+    response = Client().get(reverse('async_product_list'), {'price': 'cheap'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'price' in response.json()
+
+@pytest.mark.django_db
+def test_async_categories_need_jwt(test_user, create_test_categories):
+    url = reverse('async_category_list')
+    assert Client().get(url).status_code == status.HTTP_401_UNAUTHORIZED
+    response = Client().get(url, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(test_user)}')
+    assert response.status_code == status.HTTP_200_OK
+    assert [category['name'] for category in response.json()] == ['Electronic', 'Fish']
+
+def test_csrf_middleware_stays_async():
+    class Request:
+        path = '/product/1/'
+
+    async def get_response(request):
+        return 'response'
+
+    middleware = DisableCSRFOnAPI(get_response)
+    request = Request()
+    assert async_to_sync(middleware)(request) == 'response'
+    assert request._dont_enforce_csrf_checks is True
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+@pytest.mark.django_db
+def test_run_load_against_live_server(live_server, create_test_products):
+    result = run_load(live_server.url + reverse('product-list'), total=10, concurrency=4)
+    assert result['errors'] == 0
+    assert result['requests'] == 10
+    assert result['p50'] <= result['p99']
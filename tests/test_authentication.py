@@ -0,0 +1,100 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from store import authentication
+from store.views import api_product_detail
+
+
+def auth_queries(queries):
+    return [query['sql'] for query in queries if 'auth_user' in query['sql'] or 'authtoken_token' in query['sql']]
+
+@pytest.fixture
+def jwt_get(test_user):
+    header = f'Bearer {AccessToken.for_user(test_user)}'
+
+    def get():
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('async_category_list'), HTTP_AUTHORIZATION=header)
+        return response, auth_queries(queries.captured_queries)
+    return get
+
+@pytest.mark.django_db
+def test_jwt_user_is_loaded_once(jwt_get, create_test_categories):
+    response, queries = jwt_get()
+    assert response.status_code == 200 and len(queries) == 1
+    response, queries = jwt_get()
+    assert response.status_code == 200 and queries == []
+
+@pytest.mark.django_db
+def test_deactivated_user_is_refused_at_once(jwt_get, test_user, django_capture_on_commit_callbacks):
+    assert jwt_get()[0].status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        test_user.is_active = False
+        test_user.save()
+    assert jwt_get()[0].status_code == 401
+
+@pytest.mark.django_db
+def test_changes_reach_other_processes(test_user, django_capture_on_commit_callbacks):
+    # Nothing local is cleared: the entry goes stale through the shared generation
+    assert authentication.get_user(test_user.pk).email == ''
+    with django_capture_on_commit_callbacks(execute=True):
+        test_user.set_password('new-password-123')
+        test_user.email = 'new@example.com'
+        test_user.save()
+    user = authentication.get_user(test_user.pk)
+    assert user.email == 'new@example.com' and user.check_password('new-password-123')
+
+@pytest.mark.django_db
+def test_update_needs_explicit_invalidation(test_user, django_capture_on_commit_callbacks):
+    authentication.get_user(test_user.pk)
+    type(test_user).objects.filter(pk=test_user.pk).update(is_staff=True)  # No signal
+    assert authentication.get_user(test_user.pk).is_staff is False
+    with django_capture_on_commit_callbacks(execute=True):
+        authentication.invalidate_user(test_user.pk)
+    assert authentication.get_user(test_user.pk).is_staff is True
+
+@pytest.mark.django_db
+def test_cached_user_is_a_copy(test_user):
+    first = authentication.get_user(test_user.pk)
+    first.marker = True
+    assert not hasattr(authentication.get_user(test_user.pk), 'marker')
+    assert authentication.get_user(test_user.pk + 100) is None
+
+@pytest.mark.django_db
+def test_ttl_and_size_limit(test_user, other_user, settings, django_assert_num_queries):
+    settings.AUTH_USER_CACHE_TTL = 0
+    authentication.get_user(test_user.pk)
+    with django_assert_num_queries(1):
+        authentication.get_user(test_user.pk)  # Expired
+
+    settings.AUTH_USER_CACHE_TTL = 60
+    settings.AUTH_USER_CACHE_SIZE = 1
+    authentication.get_user(test_user.pk)
+    authentication.get_user(other_user.pk)  # Pushes out test_user
+    with django_assert_num_queries(1):
+        authentication.get_user(test_user.pk)
+
+@pytest.mark.django_db
+def test_token_authentication_is_cached(test_user, create_test_products, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        token = Token.objects.create(user=test_user)
+    product = create_test_products[0]
+
+    def get():
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        with CaptureQueriesContext(connection) as queries:
+            response = api_product_detail(request, pk=product.pk)
+        return response.status_code, auth_queries(queries.captured_queries)
+
+    status, queries = get()
+    assert status == 200 and len(queries) == 2  # The token, then its user
+    assert get() == (200, [])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        token.delete()  # Logout
+    assert get()[0] == 401
@@ -0,0 +1,109 @@
+import json
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F, Sum
+from django.test.utils import CaptureQueriesContext
+from store import benchmark
+from store.datagen import BENCH_PASSWORD, BENCH_USERNAME, generate, get_bench_user
+from store.models import Category, Order, OrderItem, Product
+
+
+@pytest.fixture
+def dataset(db):
+    return generate(products=60, orders=80, items_per_order=3, users=5, categories=3, batch_size=25)
+
+
+def test_sample_products_without_sorting_the_table(dataset):
+    Product.objects.filter(pk__in=[1, 2, 3]).update(stock=0)
+    with CaptureQueriesContext(connection) as queries:
+        ids = benchmark.sample_products(20, seed=7, run=5)
+    assert len(ids) == 20 and not {1, 2, 3} & set(ids)
+    assert set(ids) <= set(Product.objects.filter(stock__gt=0).values_list('pk', flat=True))
+    assert ids == benchmark.sample_products(20, seed=7, run=5)  # Same seed, same sample
+    assert not any('RANDOM' in query['sql'].upper() for query in queries.captured_queries)
+
+def test_generate_counts_and_totals(dataset, api_client):
+    assert Category.objects.count() == 3
+    assert Product.objects.count() == 60
+    assert Order.objects.count() == 80
+    assert dataset['rows']['store.OrderItem'] == OrderItem.objects.count()
+    # The bench user can log in and has order history
+    bench = get_bench_user()
+    assert bench.check_password(BENCH_PASSWORD)
+    assert Order.objects.filter(user=bench).count() == 50
+    # Order totals match their items
+    order = Order.objects.annotate(items_total=Sum(F('items__price') * F('items__quantity'))).first()
+    assert order.total == order.items_total
+    # Explicit pks don't break later inserts, and the search index saw the raw inserts
+    assert Category.objects.create(name='After', slug='after').pk == 4
+    word = Product.objects.first().name.split()[0]
+    assert api_client.get('/api/products/', {'search': word}).json()['results']
+
+def test_generate_is_repeatable_and_stackable(db):
+    generate(products=10, orders=0, users=1, categories=1, seed=7)
+    names = list(Product.objects.order_by('pk').values_list('name', flat=True))
+    generate(products=10, orders=0, users=1, categories=1, seed=7)  # Adds new rows, no key clashes
+    assert Product.objects.count() == 20
+    assert [name.rsplit(' ', 1)[0] for name in names] == [
+        name.rsplit(' ', 1)[0] for name in Product.objects.order_by('pk').values_list('name', flat=True)[10:]
+    ]
+
+def test_in_process_scenarios(dataset):
+    driver = benchmark.InProcessDriver(get_bench_user())
+    workload = benchmark.Workload(Product.objects.filter(stock__gt=0).values_list('pk', flat=True))
+    results = benchmark.run(driver, workload, list(benchmark.SCENARIOS), iterations=3, warmup=1)
+    assert set(results) == set(benchmark.SCENARIOS)
+    for result in results.values():
+        assert result['errors'] == 0
+        assert result['queries'] > 0
+        assert result['p50'] <= result['p95'] <= result['p99']
+    assert Order.objects.count() > 80  # Checkouts placed orders
+
+def test_parse_log_formats():
+    lines = [
+        'INFO {"method": "GET", "path": "/api/products/", "query": "search=lamp", "status": 200}',
+        '{"method": "POST", "path": "/checkout/", "status": 200}',
+        '127.0.0.1 - - [18/Oct/2026:10:00:00] "GET /api/products/12/ HTTP/1.1" 200 512',
+        'not a request',
+    ]
+    assert benchmark.parse_log(lines) == [('GET', '/api/products/?search=lamp'), ('GET', '/api/products/12/')]
+
+def test_replay_groups_by_endpoint(dataset):
+    ids = list(Product.objects.values_list('pk', flat=True)[:2])
+    requests = [('GET', f'/api/products/{pk}/') for pk in ids] + [('GET', '/api/orders/')]
+    results = benchmark.replay(benchmark.InProcessDriver(get_bench_user()), requests)
+    assert results['GET /api/products/{id}/']['iterations'] == 2
+    assert results['GET /api/orders/']['errors'] == 0
+
+def test_regressions():
+    base = {'p50': 10.0, 'p95': 20.0, 'p99': 30.0, 'queries': 3.0, 'errors': 0}
+    assert benchmark.regressions({'a': dict(base, p95=24.0)}, {'a': base}) == []
+    problems = benchmark.regressions({'a': dict(base, p95=26.0, queries=4.0), 'new': base}, {'a': base})
+    assert len(problems) == 2
+    # Tiny absolute changes are noise
+    small = dict(base, p50=0.4, p95=0.5)
+    assert benchmark.regressions({'a': dict(small, p95=1.2)}, {'a': small}) == []
+
+def test_command_baseline_round_trip(dataset, tmp_path, capsys):
+    path = tmp_path / 'baseline.json'
+    call_command('benchmark', 'catalog_detail', '--iterations', '3', '--save-baseline', str(path))
+    saved = json.loads(path.read_text())
+    assert saved['catalog_detail']['errors'] == 0
+    call_command('benchmark', 'catalog_detail', '--iterations', '3', '--baseline', str(path), '--tolerance', '100')
+    assert 'No regressions' in capsys.readouterr().out
+
+    saved['catalog_detail']['queries'] = 0
+    path.write_text(json.dumps(saved))
+    with pytest.raises(CommandError, match='queries per iteration'):
+        call_command('benchmark', 'catalog_detail', '--iterations', '3', '--baseline', str(path), '--tolerance', '100')
+
+@pytest.mark.django_db(transaction=True)
+def test_http_driver_against_live_server(live_server):
+    generate(products=20, orders=5, items_per_order=2, users=2, categories=2)
+    driver = benchmark.HttpDriver(live_server.url, BENCH_USERNAME, BENCH_PASSWORD)
+    workload = benchmark.Workload(Product.objects.filter(stock__gt=0).values_list('pk', flat=True))
+    results = benchmark.run(driver, workload, ['catalog_detail', 'order_history', 'checkout'], iterations=2, warmup=0)
+    assert all(result['errors'] == 0 for result in results.values())
+    assert results['checkout']['queries'] is None  # No Server-Timing unless the request was sampled
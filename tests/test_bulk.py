@@ -0,0 +1,90 @@
+import json
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from rest_framework import status
+from store import inventory
+from store.models import Product, InventorySlot
+
+
+def ndjson(*rows):
+    return '\n'.join(json.dumps(row) for row in rows) + '\n'
+
+@pytest.fixture
+def staff_client(api_client, staff_user):
+    api_client.force_authenticate(user=staff_user)
+    return api_client
+
+@pytest.mark.django_db
+def test_import_upserts_by_sku(staff_client, create_test_categories):
+    url = reverse('product-bulk-import') + '?batch_size=2'
+    body = ndjson(
+        {'sku': 'A-1', 'name': 'Phone', 'price': '100.00', 'stock': 3, 'category': 'electronic'},
+        {'sku': 'A-2', 'name': 'Cod', 'price': '5.50', 'stock': 9, 'category': 'fish'},
+        {'sku': 'A-3', 'name': 'Tablet', 'price': '200.00', 'category': 'electronic'},
+    )
+    response = staff_client.generic('POST', url, body, content_type='application/x-ndjson')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {'upserted': 3, 'batches': 2, 'errors': []}
+
+    body = ndjson({'sku': 'A-1', 'name': 'Phone 2', 'price': '90.00', 'stock': 1, 'category': 'electronic'})
+    staff_client.generic('POST', url, body, content_type='application/x-ndjson')
+    assert Product.objects.count() == 3
+    phone = Product.objects.get(sku='A-1')
+    assert (phone.name, phone.price, phone.stock) == ('Phone 2', Decimal('90.00'), 1)
+
+@pytest.mark.django_db
+def test_import_reports_row_errors(staff_client, create_test_categories):
+    body = ndjson(
+        {'sku': 'B-1', 'name': 'Ok', 'price': '1.00', 'category': 'fish'},
+        {'sku': 'B-2', 'name': 'Bad price', 'price': 'free', 'category': 'fish'},
+        {'sku': 'B-3', 'name': 'Bad category', 'price': '1.00', 'category': 'nope'},
+    ) + '{not json\n'
+    response = staff_client.generic('POST', reverse('product-bulk-import'), body, content_type='application/x-ndjson')
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    assert response.data['upserted'] == 1
+    assert [error['row'] for error in response.data['errors']] == [2, 3, 4]
+    assert 'price' in response.data['errors'][0]['errors']
+    assert 'category' in response.data['errors'][1]['errors']
+
+@pytest.mark.django_db
+def test_import_csv(staff_client, create_test_categories):
+    body = 'sku,name,description,price,stock,category\nC-1,Shirt,"Soft, cotton",12.00,4,electronic\n'
+    response = staff_client.generic('POST', reverse('product-bulk-import'), body, content_type='text/csv')
+    assert response.data['upserted'] == 1
+    assert Product.objects.get(sku='C-1').description == 'Soft, cotton'
+
+@pytest.mark.django_db
+def test_import_is_staff_only(authenticated_api_client, create_test_categories):
+    body = ndjson({'sku': 'D-1', 'name': 'X', 'price': '1.00', 'category': 'fish'})
+    response = authenticated_api_client.generic('POST', reverse('product-bulk-import'), body, content_type='application/x-ndjson')
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert Product.objects.count() == 0
+
+@pytest.mark.django_db
+def test_export_streams_ndjson_and_csv(staff_client, create_test_products):
+    response = staff_client.get(reverse('product-export'))
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+    assert [row['name'] for row in rows] == ['Laptop', 'Rui']
+    assert rows[0]['category'] == 'electronic'
+
+    response = staff_client.get(reverse('product-export'), {'type': 'csv'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0] == 'sku,name,description,price,stock,category'
+    assert len(lines) == 3
+
+@pytest.mark.django_db
+def test_import_sets_total_stock_of_hot_products(staff_client, create_test_products):
+    laptop = create_test_products[0]
+    Product.objects.filter(pk=laptop.pk).update(sku='L-1')
+    laptop = inventory.make_hot(laptop, slots=4)  # 10 units over the slots
+    body = ndjson({'sku': 'L-1', 'name': 'Laptop', 'price': '1000.00', 'stock': 6, 'category': 'electronic'})
+    staff_client.generic('POST', reverse('product-bulk-import'), body, content_type='application/x-ndjson')
+
+    laptop = Product.objects.get(pk=laptop.pk)
+    assert laptop.stock == 0 and laptop.total_stock == 6  # Not 6 on top of the slots
+    assert sorted(InventorySlot.objects.filter(product=laptop).values_list('stock', flat=True)) == [1, 1, 2, 2]
+
+    response = staff_client.get(reverse('product-export'))
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+    assert rows[0]['stock'] == 6
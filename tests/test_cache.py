@@ -0,0 +1,121 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from store import cache as catalog_cache
+from store.models import Category
+from store.services import place_order
+
+
+@pytest.mark.django_db
+def test_product_list_served_from_cache(authenticated_api_client, create_test_products):
+    url = reverse('product-list')
+    first = authenticated_api_client.get(url)
+    second = authenticated_api_client.get(url)
+    assert first['X-Cache'] == 'MISS'
+    assert second['X-Cache'] == 'HIT'
+    assert first.data == second.data
+    assert catalog_cache.stats()['hits'] == 1
+    assert catalog_cache.stats()['misses'] == 1
+
+@pytest.mark.django_db
+def test_query_params_are_part_of_key(authenticated_api_client, create_test_products):
+    url = reverse('product-list')
+    authenticated_api_client.get(url)
+    response = authenticated_api_client.get(url, {'ordering': '-price'})
+    assert response['X-Cache'] == 'MISS'
+    assert response.data['results'][0]['name'] == 'Laptop'
+
+@pytest.mark.django_db
+def test_product_save_invalidates_list_and_detail(authenticated_api_client, create_test_products):
+    product = create_test_products[0]
+    list_url = reverse('product-list')
+    detail_url = reverse('product-detail', args=[product.pk])
+    authenticated_api_client.get(list_url)
+    authenticated_api_client.get(detail_url)
+
+    # Same path the admin takes: a plain model save
+    product.name = 'Gaming Laptop'
+    product.save()
+
+    response = authenticated_api_client.get(detail_url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.data['name'] == 'Gaming Laptop'
+    response = authenticated_api_client.get(list_url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.data['results'][0]['name'] == 'Gaming Laptop'
+
+@pytest.mark.django_db
+def test_checkout_invalidates_cached_stock(authenticated_api_client, test_user, create_test_products, django_capture_on_commit_callbacks):
+    laptop, _ = create_test_products
+    list_url = reverse('product-list')
+    laptop_url = reverse('product-detail', args=[laptop.pk])
+    first = authenticated_api_client.get(list_url)
+    authenticated_api_client.get(laptop_url)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        place_order(test_user, {laptop.pk: 3}, name='A', address='B', phone='1')
+
+    # The client's old ETag no longer matches and the page is rebuilt
+    response = authenticated_api_client.get(list_url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == status.HTTP_200_OK
+    assert response['X-Cache'] == 'MISS'
+    stock = {row['id']: row['stock'] for row in response.data['results']}
+    assert stock[laptop.pk] == laptop.stock - 3
+    response = authenticated_api_client.get(laptop_url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.data['stock'] == laptop.stock - 3
+
+@pytest.mark.django_db
+def test_product_delete_invalidates_list(authenticated_api_client, create_test_products, staff_user):
+    url = reverse('product-list')
+    assert len(authenticated_api_client.get(url).data['results']) == 2
+
+    authenticated_api_client.force_authenticate(user=staff_user)
+    response = authenticated_api_client.delete(reverse('product-detail', args=[create_test_products[1].pk]))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert len(authenticated_api_client.get(url).data['results']) == 1
+
+@pytest.mark.django_db
+def test_category_save_invalidates_category_list(authenticated_api_client, create_test_categories):
+    url = reverse('category-list')
+    authenticated_api_client.get(url)
+    Category.objects.create(name='Books', slug='books')
+    response = authenticated_api_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert len(response.data) == 3
+
+@pytest.mark.django_db
+def test_missing_product_is_not_cached(authenticated_api_client):
+    url = reverse('product-detail', args=[999])
+    assert authenticated_api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+    assert authenticated_api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_cache_stats_is_staff_only(authenticated_api_client, staff_user):
+    url = reverse('cache_stats')
+    assert authenticated_api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
+    authenticated_api_client.force_authenticate(user=staff_user)
+    response = authenticated_api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.data) == {'hits', 'misses', 'hit_rate'}
+
+@pytest.mark.django_db
+def test_scheme_and_host_are_part_of_key(authenticated_api_client, create_test_products, settings):
+    settings.ALLOWED_HOSTS = ['testserver', 'shop.example.com']
+    url = reverse('product-list')
+    authenticated_api_client.get(url)
+    assert authenticated_api_client.get(url, secure=True)['X-Cache'] == 'MISS'
+    assert authenticated_api_client.get(url, HTTP_HOST='shop.example.com')['X-Cache'] == 'MISS'
+    assert authenticated_api_client.get(url, secure=True)['X-Cache'] == 'HIT'
+
+def test_local_memory_catalog_cache_is_a_deploy_warning(settings):
+    from django.core import checks
+    from store.checks import check_catalog_cache
+    assert [warning.id for warning in check_catalog_cache(None)] == ['store.W001']
+    assert 'store.W001' not in [message.id for message in checks.run_checks()]  # Management commands still run
+    assert 'store.W001' in [message.id for message in checks.run_checks(include_deployment_checks=True)]
+    settings.DEBUG = True
+    assert check_catalog_cache(None) == []
+    settings.DEBUG = False
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}}
+    assert check_catalog_cache(None) == []
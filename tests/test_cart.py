@@ -0,0 +1,93 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from store import carts
+from store.models import Product
+
+
+@pytest.mark.django_db
+def test_batched_cart_update(authenticated_api_client, create_test_products):
+    laptop, fish = create_test_products
+    url = reverse('api_cart')
+    response = authenticated_api_client.post(url, {'changes': [
+        {'product': laptop.pk, 'quantity': 2},
+        {'product': fish.pk, 'delta': 3},
+        {'product': fish.pk, 'delta': -1},
+    ]}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['version'] == 1
+    assert response.data['items'] == 4
+    assert Decimal(response.data['total']) == Decimal('999.99') * 2 + Decimal('9.99') * 2
+    assert [(line['product']['name'], line['quantity']) for line in response.data['lines']] == [('Laptop', 2), ('Rui', 2)]
+
+    response = authenticated_api_client.post(url, {'changes': [{'product': laptop.pk, 'remove': True}]}, format='json')
+    assert [line['product']['name'] for line in response.data['lines']] == ['Rui']
+
+@pytest.mark.django_db
+def test_cart_update_query_count_does_not_grow_with_lines(test_user, create_test_categories):
+    category = create_test_categories[0]
+    products = [Product.objects.create(name=f'P{i}', description='', price=1, category=category) for i in range(30)]
+    cart = carts.get_cart(test_user)
+    with CaptureQueriesContext(connection) as few:
+        carts.apply_changes(cart, [{'product': p.pk, 'quantity': 1} for p in products[:2]])
+    with CaptureQueriesContext(connection) as many:
+        carts.apply_changes(cart, [{'product': p.pk, 'delta': 2} for p in products])
+    assert len(many.captured_queries) <= len(few.captured_queries) + 1  # + the bulk UPDATE of existing lines
+
+@pytest.mark.django_db
+def test_cart_totals_are_memoized_per_version(test_user, create_test_products, django_assert_num_queries):
+    cart = carts.apply_changes(carts.get_cart(test_user), [{'product': create_test_products[0].pk, 'quantity': 1}])
+    carts.totals(cart)
+    with django_assert_num_queries(0):
+        assert carts.totals(cart)['items'] == 1
+    cart = carts.apply_changes(cart, [{'product': create_test_products[0].pk, 'delta': 1}])
+    assert carts.totals(cart)['items'] == 2
+
+@pytest.mark.django_db
+def test_cart_version_conflict_and_unknown_product(authenticated_api_client, create_test_products):
+    url = reverse('api_cart')
+    pk = create_test_products[0].pk
+    authenticated_api_client.post(url, {'changes': [{'product': pk, 'quantity': 1}]}, format='json')
+    response = authenticated_api_client.post(url, {'version': 0, 'changes': [{'product': pk, 'quantity': 5}]}, format='json')
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.data['version'] == 1
+    response = authenticated_api_client.post(url, {'changes': [{'product': 9999, 'quantity': 1}]}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_session_cart_merges_on_login(client, test_user, create_test_products):
+    laptop, fish = create_test_products
+    carts.apply_changes(carts.get_cart(test_user), [{'product': laptop.pk, 'quantity': 1}])
+
+    client.post(reverse('product_detail', args=[laptop.pk]), {'quantity': 2})
+    client.post(reverse('product_detail', args=[fish.pk]), {'quantity': 1})
+    assert client.session['cart'] == {str(laptop.pk): 2, str(fish.pk): 1}
+
+    client.post(reverse('login'), {'username': 'test_user', 'password': 'pass123'})
+    assert carts.lines(carts.get_cart(test_user)) == {laptop.pk: 3, fish.pk: 1}
+    assert client.session['cart'] == {}
+
+    response = client.get(reverse('cart_view'))
+    assert response.context['total'] == Decimal('999.99') * 3 + Decimal('9.99')
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('logged_in', [False, True])
+def test_update_cart_only_changes_lines_in_the_cart(client, test_user, create_test_products, logged_in):
+    laptop, fish = create_test_products
+    if logged_in:
+        client.force_login(test_user)
+    client.post(reverse('product_detail', args=[laptop.pk]), {'quantity': 2})
+    url = reverse('update_cart')
+
+    for data in ({'action': 'increase'}, {'product_id': 'abc', 'action': 'increase'}, {'product_id': 9999, 'action': 'increase'}):
+        response = client.post(url, data, follow=True)
+        assert response.status_code == 200
+        assert [str(message) for message in response.context['messages']] == ['Unknown product.']
+    client.post(url, {'product_id': fish.pk, 'action': 'increase'})  # Not in the cart: ignored
+    client.post(url, {'product_id': laptop.pk, 'action': 'decrease'})
+
+    items, _ = carts.cart_items(client.get(reverse('cart_view')).wsgi_request)
+    assert [(item['product'].pk, item['quantity']) for item in items] == [(laptop.pk, 1)]
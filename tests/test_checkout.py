@@ -0,0 +1,88 @@
+import pytest
+from decimal import Decimal
+from unittest import mock
+from django.urls import reverse
+from rest_framework import status
+from store.models import Order, OrderItem, Product
+from store.services import place_order, OutOfStock
+from store import carts
+
+
+def set_cart(user, cart):
+    carts.apply_changes(carts.get_cart(user), [{'product': pk, 'quantity': qty} for pk, qty in cart.items()])
+
+@pytest.mark.django_db
+def test_checkout_creates_order_and_decrements_stock(client, test_user, create_test_products):
+    laptop, fish = create_test_products
+    client.force_login(test_user)
+    set_cart(test_user, {laptop.pk: 2, fish.pk: 3})
+
+    response = client.post(reverse('checkout'), {'name': 'A', 'address': 'B', 'phone': '1'})
+    assert response.status_code == 200
+
+    order = Order.objects.get()
+    assert order.total == Decimal('999.99') * 2 + Decimal('9.99') * 3
+    assert order.items.count() == 2
+    laptop.refresh_from_db()
+    fish.refresh_from_db()
+    assert (laptop.stock, fish.stock) == (8, 97)
+    assert carts.lines(carts.get_cart(test_user)) == {}
+
+@pytest.mark.django_db
+def test_checkout_rejects_when_stock_runs_out(client, test_user, create_test_products):
+    laptop, fish = create_test_products
+    client.force_login(test_user)
+    set_cart(test_user, {laptop.pk: 11, fish.pk: 1})
+
+    response = client.post(reverse('checkout'), {'name': 'A', 'address': 'B', 'phone': '1'})
+    assert response.status_code == 302
+    assert Order.objects.count() == 0
+    fish.refresh_from_db()
+    assert fish.stock == 100  # The line that fitted was rolled back too
+    assert carts.lines(carts.get_cart(test_user)) == {laptop.pk: 11, fish.pk: 1}
+
+@pytest.mark.django_db
+def test_out_of_stock_names_short_products(test_user, create_test_products):
+    laptop, fish = create_test_products
+    with pytest.raises(OutOfStock) as exc:
+        place_order(test_user, {laptop.pk: 11, fish.pk: 1}, name='A', address='B', phone='1')
+    assert exc.value.products == [laptop]
+
+@pytest.mark.django_db
+def test_crash_mid_checkout_leaves_nothing_behind(test_user, create_test_products):
+    laptop = create_test_products[0]
+    with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=RuntimeError):
+        with pytest.raises(RuntimeError):
+            place_order(test_user, {laptop.pk: 1}, name='A', address='B', phone='1')
+    assert Order.objects.count() == 0
+    laptop.refresh_from_db()
+    assert laptop.stock == 10
+
+@pytest.mark.django_db
+def test_api_order_create_uses_checkout_service(authenticated_api_client, create_test_products):
+    laptop, fish = create_test_products
+    data = {'name': 'A', 'address': 'B', 'phone': '1', 'lines': [
+        {'product': laptop.pk, 'quantity': 1},
+        {'product': fish.pk, 'quantity': 2},
+        {'product': fish.pk, 'quantity': 1},
+    ]}
+    response = authenticated_api_client.post(reverse('order-list'), data, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert Decimal(response.data['total']) == Decimal('999.99') + Decimal('9.99') * 3
+    assert len(response.data['items']) == 2
+    assert Product.objects.get(pk=fish.pk).stock == 97
+
+@pytest.mark.django_db
+def test_api_order_create_out_of_stock(authenticated_api_client, create_test_products):
+    laptop = create_test_products[0]
+    data = {'name': 'A', 'address': 'B', 'phone': '1', 'lines': [{'product': laptop.pk, 'quantity': 50}]}
+    response = authenticated_api_client.post(reverse('order-list'), data, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'lines' in response.data
+    assert Order.objects.count() == 0
+
+@pytest.mark.django_db
+def test_api_order_create_requires_lines(authenticated_api_client):
+    data = {'name': 'A', 'address': 'B', 'phone': '1'}
+    response = authenticated_api_client.post(reverse('order-list'), data, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,145 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from common import compression
+from common.compression import CompressionMiddleware
+
+
+@pytest.fixture
+def products(create_test_products, create_test_categories):
+    from store.models import Product
+    Product.objects.bulk_create([
+        Product(name=f'Bulk {i}', description='A product with a long description. ' * 5, price=i, stock=i, category=create_test_categories[0])
+        for i in range(20)
+    ])
+
+def test_choose_encoding():
+    best = 'br' if compression.brotli else 'gzip'
+    assert compression.choose_encoding('gzip, deflate, br') == best
+    assert compression.choose_encoding('gzip, deflate, br', html=True) == 'gzip'
+    assert compression.choose_encoding('br;q=0, gzip;q=0.5') == 'gzip'
+    assert compression.choose_encoding('gzip;q=0, *;q=0') is None
+    assert compression.choose_encoding('*') == best
+    assert compression.choose_encoding('identity') is None
+
+@pytest.mark.django_db
+def test_api_list_is_gzipped(products, authenticated_api_client):
+    url = reverse('product-list')
+    plain = authenticated_api_client.get(url)
+    assert 'Content-Encoding' not in plain and 'Accept-Encoding' in plain['Vary']
+
+    response = authenticated_api_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+    assert response['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.content)) == plain.json()
+    assert int(response['Content-Length']) == len(response.content) < len(plain.content) / 3
+    # The ETag is (or turns) weak and still matches on revalidation
+    assert response['ETag'].startswith('W/') and response['ETag'].endswith(plain['ETag'].removeprefix('W/'))
+    again = authenticated_api_client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert again.status_code == 304
+
+@pytest.mark.django_db
+def test_small_responses_are_sent_as_is(create_test_categories, authenticated_api_client):
+    response = authenticated_api_client.get(reverse('category-detail', args=[create_test_categories[0].pk]), HTTP_ACCEPT_ENCODING='gzip')
+    assert response.status_code == 200 and 'Content-Encoding' not in response
+
+@pytest.mark.django_db
+def test_html_gets_padded_gzip(products, client):
+    response = client.get(reverse('product_list'), HTTP_ACCEPT_ENCODING='br, gzip')
+    assert response['Content-Encoding'] == 'gzip'
+    assert response.content[3] & 0x08  # FNAME flag: random-length name against BREACH
+    assert b'Bulk 7' in gzip.decompress(response.content)
+
+def test_streaming_output_is_flushed_in_batches(settings):
+    settings.COMPRESSION_STREAM_FLUSH = 1500
+    chunks = [b'a' * 1000, b'b' * 1000, b'c' * 1000]
+    middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(iter(chunks), content_type='text/plain'))
+    response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+    assert response['Content-Encoding'] == 'gzip' and not response.has_header('Content-Length')
+
+    decoder = zlib.decompressobj(wbits=31)
+    parts = list(response.streaming_content)
+    # Flushed once past 1500 bytes, readable before the stream ends; the rest waits for the end
+    assert decoder.decompress(b''.join(parts[:-1])) == chunks[0] + chunks[1]
+    assert gzip.decompress(b''.join(parts)) == b''.join(chunks)
+
+def test_async_streaming():
+    async def chunks():
+        for chunk in (b'{"a": ' + b'1' * 600, b'}'):
+            yield chunk
+
+    async def view(request):
+        return StreamingHttpResponse(chunks(), content_type='application/json')
+
+    async def run():
+        response = await CompressionMiddleware(view)(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        return response, b''.join([part async for part in response.streaming_content])
+
+    response, body = async_to_sync(run)()
+    assert response['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(body) == b'{"a": ' + b'1' * 600 + b'}'
+
+def test_skipped_responses():
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+    body = b'x' * 1000
+    for response in (
+        HttpResponse(body, content_type='image/png'),
+        HttpResponse(body, headers={'Content-Encoding': 'br'}),
+        HttpResponse(body, headers={'Cache-Control': 'no-transform'}),
+        HttpResponse(body, status=206),
+    ):
+        assert CompressionMiddleware(lambda request, response=response: response)(request).content == body
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli not installed')
+def test_brotli():
+    response = CompressionMiddleware(lambda request: HttpResponse(b'{}' * 500, content_type='application/json'))(
+        RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+    )
+    assert response['Content-Encoding'] == 'br'
+    assert compression.brotli.decompress(response.content) == b'{}' * 500
+
+@pytest.fixture(scope='module')
+def collected(tmp_path_factory):
+    from django.test import override_settings
+    root = tmp_path_factory.mktemp('static')
+    with override_settings(STATIC_ROOT=str(root), STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'common.staticfiles.CompressedManifestStaticFilesStorage'},
+    }):
+        call_command('collectstatic', '--noinput', verbosity=0)
+        manifest = json.loads((root / 'staticfiles.json').read_text())['paths']
+        yield root, manifest
+
+def test_collectstatic_precompresses_hashed_files(collected):
+    root, manifest = collected
+    hashed = manifest['admin/css/base.css']
+    assert hashed != 'admin/css/base.css'
+    original = (root / hashed).read_bytes()
+    assert gzip.decompress((root / (hashed + '.gz')).read_bytes()) == original
+    assert not list(root.glob('**/*.png.gz'))  # Images aren't compressible
+
+@pytest.mark.django_db
+def test_static_files_are_served_precompressed_and_immutable(collected, client, settings):
+    root, manifest = collected
+    settings.STATIC_ROOT = str(root)
+    hashed = manifest['admin/css/base.css']
+    response = client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip')
+    assert response.status_code == 200
+    assert response['Content-Encoding'] == 'gzip' and response['Content-Type'] == 'text/css'
+    assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Accept-Encoding' in response['Vary']
+    assert b''.join(response.streaming_content) == (root / (hashed + '.gz')).read_bytes()
+
+    plain = client.get('/static/admin/css/base.css')
+    assert 'Content-Encoding' not in plain
+    assert plain['Cache-Control'] == 'public, max-age=3600'
+    assert client.get('/static/admin/css/base.css', HTTP_IF_MODIFIED_SINCE=plain['Last-Modified']).status_code == 304
+    assert client.get('/static/../manage.py').status_code == 404
+    assert client.get('/static/missing.css').status_code == 404
+    assert client.get(f'/static/{hashed}.gz', HTTP_ACCEPT_ENCODING='gzip').status_code == 404  # Only by the original name
@@ -0,0 +1,109 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from store import inventory
+from store.services import place_order
+from store.models import Product
+
+
+@pytest.mark.django_db
+def test_product_list_not_modified(authenticated_api_client, create_test_products):
+    url = reverse('product-list')
+    first = authenticated_api_client.get(url)
+    assert first.status_code == status.HTTP_200_OK
+    etag = first['ETag']
+    assert etag.startswith('W/"')
+
+    second = authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert second.status_code == status.HTTP_304_NOT_MODIFIED
+    assert second.content == b''
+
+@pytest.mark.django_db
+def test_list_etag_depends_on_query(authenticated_api_client, create_test_products):
+    url = reverse('product-list')
+    etag = authenticated_api_client.get(url)['ETag']
+    response = authenticated_api_client.get(url, {'ordering': '-price'}, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+
+@pytest.mark.django_db
+def test_list_etag_changes_on_update_and_delete(authenticated_api_client, create_test_products):
+    url = reverse('product-list')
+    laptop, fish = create_test_products
+    etag = authenticated_api_client.get(url)['ETag']
+
+    laptop.price = 899
+    laptop.save()
+    response = authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response['ETag']
+
+    # Deleting a row that isn't the newest one must still change the list
+    Product.objects.filter(pk=fish.pk).delete()
+    response = authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data['results']) == 1
+
+@pytest.mark.django_db
+def test_product_detail_if_modified_since(authenticated_api_client, create_test_products):
+    url = reverse('product-detail', args=[create_test_products[0].pk])
+    first = authenticated_api_client.get(url)
+    last_modified = first['Last-Modified']
+
+    response = authenticated_api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    response = authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+@pytest.mark.django_db
+def test_missing_product_is_still_404(authenticated_api_client, db):
+    response = authenticated_api_client.get(reverse('product-detail', args=[999]), HTTP_IF_NONE_MATCH='*')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_malformed_product_id_is_404(authenticated_api_client, db):
+    response = authenticated_api_client.get('/api/products/abc/')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_hot_product_etag_follows_slot_stock(authenticated_api_client, test_user, create_test_products, django_capture_on_commit_callbacks):
+    product = create_test_products[0]
+    inventory.make_hot(product, slots=2)
+    url = reverse('product-detail', args=[product.pk])
+    first = authenticated_api_client.get(url)
+    assert 'Last-Modified' not in first  # Slot claims don't touch updated_at
+
+    with django_capture_on_commit_callbacks(execute=True):
+        place_order(test_user, {product.pk: 1}, name='A', address='B', phone='1')
+    response = authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['stock'] == first.data['stock'] - 1
+
+@pytest.mark.django_db
+def test_category_list_not_modified(authenticated_api_client, create_test_categories):
+    url = reverse('category-list')
+    etag = authenticated_api_client.get(url)['ETag']
+    assert authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    category = create_test_categories[0]
+    category.name = 'Electronics'
+    category.save()
+    assert authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+@pytest.mark.django_db
+def test_order_detail_changes_with_status(authenticated_api_client, create_test_order):
+    url = reverse('order-detail', args=[create_test_order.pk])
+    etag = authenticated_api_client.get(url)['ETag']
+    assert authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    create_test_order.status = 'shipped'
+    create_test_order.save()
+    assert authenticated_api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+@pytest.mark.django_db
+def test_orders_etag_is_per_user(api_client, authenticated_api_client, create_test_order, other_user):
+    url = reverse('order-list')
+    etag = authenticated_api_client.get(url)['ETag']
+    api_client.force_authenticate(user=other_user)
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == []
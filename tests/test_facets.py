@@ -0,0 +1,103 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+from rest_framework import status
+from store import inventory
+from store.models import Category, Product
+from tests.explain import QueryPlans
+
+
+@pytest.fixture
+def catalog(create_test_products):
+    laptop, _ = create_test_products
+    Product.objects.create(name='Mouse', description='A mouse.', price=19.50, stock=0, category=laptop.category)
+    return create_test_products
+
+@pytest.mark.django_db
+def test_price_and_stock_ranges(api_client, catalog):
+    url = reverse('product-list')
+    names = lambda params: sorted(product['name'] for product in api_client.get(url, params).data['results'])
+    assert names({'price__gte': '10', 'price__lte': '500'}) == ['Mouse']
+    assert names({'stock__gte': '1'}) == ['Laptop', 'Rui']
+    assert names({'stock__lte': '10', 'price__lte': '100'}) == ['Mouse']
+    assert api_client.get(url, {'price__gte': 'cheap'}).status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_async_ranges_match(api_client, catalog):
+    params = {'price__gte': '10', 'stock__lte': '50'}
+    sync = api_client.get(reverse('product-list'), params).json()
+    assert Client().get(reverse('async_product_list'), params).json() == sync
+    assert Client().get(reverse('async_product_list'), {'stock__gte': 'x'}).status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_stock_filters_count_hot_product_slots(api_client, catalog):
+    laptop = inventory.make_hot(catalog[0], slots=4)  # Its 10 units move into the slots
+    assert Product.objects.get(pk=laptop.pk).stock < 10
+    url = reverse('product-list')
+    names = lambda params: [product['name'] for product in api_client.get(url, params).data['results']]
+    assert names({'stock': '10'}) == ['Laptop']
+    assert sorted(names({'stock__gte': '5'})) == ['Laptop', 'Rui']
+    assert names({'stock__lte': '50'}) == ['Laptop', 'Mouse']
+    assert names({'ordering': '-stock'}) == ['Rui', 'Laptop', 'Mouse']
+    # Cursors carry the sellable stock too
+    page = api_client.get(url, {'ordering': 'stock', 'page_size': 2})
+    assert [product['name'] for product in api_client.get(page.data['next']).data['results']] == ['Rui']
+    assert Client().get(reverse('async_product_list'), {'stock__gte': '5', 'ordering': '-stock'}).json() == \
+        api_client.get(url, {'stock__gte': '5', 'ordering': '-stock'}).json()
+    facets = api_client.get(reverse('product-facets'), {'stock__gte': '5'}).data['facets']
+    assert facets['count'] == facets['in_stock'] == 2
+
+@pytest.mark.django_db
+def test_facets(api_client, catalog, settings):
+    settings.CATALOG_PRICE_BUCKETS = [0, 10, 100]
+    laptop, fish = catalog
+    response = api_client.get(reverse('product-facets'), {'page_size': 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data['results']) == 2 and response.data['next']
+    facets = response.data['facets']
+    assert facets['count'] == 3
+    assert facets['in_stock'] == 2
+    assert facets['categories'] == [
+        {'id': laptop.category.pk, 'name': 'Electronic', 'slug': 'electronic', 'count': 2},
+        {'id': fish.category.pk, 'name': 'Fish', 'slug': 'fish', 'count': 1},
+    ]
+    assert facets['price'] == [
+        {'min': 0, 'max': 10, 'count': 1},
+        {'min': 10, 'max': 100, 'count': 1},
+        {'min': 100, 'max': None, 'count': 1},
+    ]
+
+    # Filters narrow the facets too
+    facets = api_client.get(reverse('product-facets'), {'in_stock': 'true', 'price__gte': '10'}).data['facets']
+    assert facets['count'] == facets['in_stock'] == 1
+    assert [category['name'] for category in facets['categories']] == ['Electronic']
+
+@pytest.mark.django_db
+def test_sold_out_hot_product_is_not_in_stock(api_client, catalog):
+    laptop = catalog[0]
+    inventory.make_hot(laptop, slots=2)
+    inventory.set_stock(laptop, 0)  # stock_slots stays 2, every slot is empty
+    facets = api_client.get(reverse('product-facets')).data['facets']
+    assert facets['count'] == 3 and facets['in_stock'] == 1
+
+@pytest.mark.django_db
+def test_facets_cached_per_filter_signature(api_client, catalog, django_assert_num_queries):
+    url = reverse('product-facets')
+    api_client.get(url, {'category': catalog[0].category.pk})
+    # Another ordering of the same filters reuses the counts: only the ?category=
+    # check and the page query run
+    with django_assert_num_queries(2):
+        api_client.get(url, {'category': catalog[0].category.pk, 'ordering': 'price'})
+    # A change to the catalog invalidates them
+    Product.objects.filter(pk=catalog[0].pk).delete()
+    assert api_client.get(url, {'category': catalog[0].category.pk}).data['facets']['count'] == 1
+
+@pytest.mark.django_db
+def test_facets_one_grouped_query(api_client, catalog):
+    Category.objects.create(name='Empty', slug='empty')
+    with QueryPlans() as plans:
+        response = api_client.get(reverse('product-facets'), {'search': 'fish'})
+    assert response.data['facets']['count'] == 1
+    grouped = [sql for sql, _ in plans.queries if 'COUNT(' in sql]
+    assert len(grouped) == 1
+    assert plans.full_scans() == []
@@ -0,0 +1,95 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from store import fieldsets
+from store.models import OrderItem
+
+
+def test_parse_nested_fields():
+    assert fieldsets.parse('id, items.quantity,items.product.name,,') == {
+        'id': {}, 'items': {'quantity': {}, 'product': {'name': {}}},
+    }
+    assert fieldsets.parse('') is None
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fast', [True, False])
+def test_product_list_fields(authenticated_api_client, create_test_products, settings, fast):
+    settings.FAST_LIST_RENDERING = fast
+    with CaptureQueriesContext(connection) as queries:
+        response = authenticated_api_client.get(reverse('product-list'), {'fields': 'name,price'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'][0] == {'name': 'Laptop', 'price': '999.99'}
+    select = [query['sql'] for query in queries.captured_queries if 'store_product' in query['sql']][-1]
+    assert 'description' not in select
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fast', [True, False])
+def test_product_list_omit(authenticated_api_client, create_test_products, settings, fast):
+    settings.FAST_LIST_RENDERING = fast
+    with CaptureQueriesContext(connection) as queries:
+        response = authenticated_api_client.get(reverse('product-list'), {'omit': 'description,image'})
+    product = response.data['results'][0]
+    assert 'description' not in product and 'image' not in product
+    assert product['stock'] == 10
+    select = [query['sql'] for query in queries.captured_queries if 'store_product' in query['sql']][-1]
+    assert 'description' not in select
+
+@pytest.mark.django_db
+def test_product_detail_fields(authenticated_api_client, create_test_products):
+    url = reverse('product-detail', args=[create_test_products[0].pk])
+    response = authenticated_api_client.get(url, {'fields': 'id,stock'})
+    assert response.data == {'id': create_test_products[0].pk, 'stock': 10}
+
+@pytest.mark.django_db
+def test_unknown_field_is_rejected(authenticated_api_client, create_test_products):
+    response = authenticated_api_client.get(reverse('product-list'), {'fields': 'name,colour'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'colour' in str(response.data['fields'])
+
+@pytest.mark.django_db
+def test_fields_ignored_on_write(api_client, staff_user, create_test_products):
+    api_client.force_authenticate(user=staff_user)
+    product = create_test_products[0]
+    response = api_client.patch(reverse('product-detail', args=[product.pk]) + '?fields=name', {'price': '5.00'}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['price'] == '5.00'
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fast', [True, False])
+def test_order_nested_fields(authenticated_api_client, create_test_order, create_test_products, settings, fast):
+    settings.FAST_LIST_RENDERING = fast
+    OrderItem.objects.create(order=create_test_order, product=create_test_products[0], quantity=2, price=Decimal('999.99'))
+    with CaptureQueriesContext(connection) as queries:
+        response = authenticated_api_client.get(reverse('order-list'), {'fields': 'id,items.quantity,items.product.name'})
+    assert response.data['results'] == [
+        {'id': create_test_order.pk, 'items': [{'product': {'name': 'Laptop'}, 'quantity': 2}]},
+    ]
+    # The prefetched items and their joined products are narrowed as well
+    items = [query['sql'] for query in queries.captured_queries if 'FROM "store_orderitem"' in query['sql']]
+    assert len(items) == 1
+    assert '"store_product"."name"' in items[0]
+    assert '"store_product"."description"' not in items[0] and '"store_product"."price"' not in items[0]
+    assert '"store_orderitem"."price"' not in items[0]
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fast', [True, False])
+def test_order_omit_items_skips_their_query(authenticated_api_client, create_test_order, settings, fast):
+    settings.FAST_LIST_RENDERING = fast
+    with CaptureQueriesContext(connection) as queries:
+        response = authenticated_api_client.get(reverse('order-list'), {'omit': 'items,address'})
+    order = response.data['results'][0]
+    assert 'items' not in order and 'address' not in order
+    assert order['user'] == 'test_user'
+    assert not any('store_orderitem' in query['sql'] for query in queries.captured_queries)
+
+@pytest.mark.django_db
+def test_joined_rows_are_narrowed(authenticated_api_client, create_test_order, settings):
+    settings.FAST_LIST_RENDERING = False
+    with CaptureQueriesContext(connection) as queries:
+        response = authenticated_api_client.get(reverse('order-list'), {'fields': 'id,user'})
+    assert response.data['results'] == [{'id': create_test_order.pk, 'user': 'test_user'}]
+    select = [query['sql'] for query in queries.captured_queries if 'FROM "store_order"' in query['sql']][-1]
+    assert '"auth_user"."username"' in select and '"auth_user"."password"' not in select
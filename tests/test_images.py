@@ -0,0 +1,114 @@
+import io
+import os
+import pytest
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from store import cache as catalog_cache
+from store import images
+from store import jobs
+from store.models import Job, Product
+
+
+def upload(name='shoe.png', size=(2000, 1000), mode='RGBA', color=(200, 30, 30, 128)):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def product(db, media, create_test_categories):
+    product = Product.objects.create(
+        name='Shoe', description='Red shoe', price=50, stock=3, category=create_test_categories[0], image=upload(),
+    )
+    assert jobs.run_pending() == 1  # The variants are made by a background job
+    product.refresh_from_db()
+    return product
+
+def test_variants_made_on_upload(product, media):
+    variants = product.image_variants
+    assert variants['source'] == product.image.name
+    assert list(variants['sizes']) == ['thumb', 'small', 'medium', 'large']
+    large = variants['sizes']['large']
+    assert (large['width'], large['height']) == (1200, 600)
+    with Image.open(media / large['webp']) as webp:
+        assert webp.format == 'WEBP' and webp.mode == 'RGBA'
+    with Image.open(media / variants['sizes']['thumb']['jpeg']) as jpeg:
+        assert jpeg.format == 'JPEG' and jpeg.size == (150, 75)
+    # Content-hashed names: regenerating the same image writes nothing new
+    assert images.generate(product) == variants
+
+@pytest.mark.django_db
+def test_small_images_are_not_upscaled(media, create_test_categories):
+    product = Product(name='Pin', description='Tiny', price=1, category=create_test_categories[0], image=upload(size=(100, 80), mode='RGB', color=(0, 0, 0)))
+    product.save()
+    manifest = images.generate(product)
+    assert list(manifest['sizes']) == ['thumb']
+    assert manifest['sizes']['thumb']['width'] == 100
+
+def test_replacing_the_image_removes_old_variants(product, media):
+    old = [media / name for name in images.variant_names(product.image_variants)]
+    product.image = upload('boot.png', color=(0, 0, 255, 255))
+    product.save()
+    jobs.run_pending()
+    product.refresh_from_db()
+    assert 'boot' in product.image_variants['sizes']['small']['webp']
+    assert not any(path.exists() for path in old)
+
+def test_repeated_saves_queue_one_job(product, media):
+    product.image = upload('boot.png', color=(0, 0, 255, 255))
+    product.save()
+    Job.objects.filter(name='make_image_variants').update(run_at=timezone.now() + timedelta(minutes=5))  # Waiting to retry
+    product.stock = 7
+    product.save()  # Variants still stale: the waiting job covers it
+    job = Job.objects.get(name='make_image_variants', payload={'product_id': product.pk})
+    assert job.run_at <= timezone.now()  # ...and runs now
+    assert jobs.run_pending() == 1
+
+def test_api_exposes_variant_urls(product, authenticated_api_client, settings):
+    detail = authenticated_api_client.get(reverse('product-detail', args=[product.pk])).json()
+    small = detail['image_variants']['small']
+    assert small['webp'].startswith('http://testserver/media/product/variants/shoe-small.')
+    assert small['width'] == 300
+    # The fast list path gives the same JSON as the serializer
+    fast = authenticated_api_client.get(reverse('product-list')).json()
+    settings.FAST_LIST_RENDERING = False
+    catalog_cache.bump_generation('product')  # Skip the cached page
+    assert authenticated_api_client.get(reverse('product-list')).json() == fast
+    assert fast['results'][0]['image_variants'] == detail['image_variants']
+
+def test_templates_use_picture(product, client):
+    page = client.get(reverse('product_list')).content.decode()
+    assert '<source type="image/webp" srcset="/media/product/variants/shoe-thumb.' in page
+    assert '1200w' in page
+    assert product.image.url not in page  # Not the original any more
+    assert 'type="image/webp"' in client.get(reverse('product_detail', args=[product.pk])).content.decode()
+
+def test_batch_command(product, media):
+    Product.objects.filter(pk=product.pk).update(image_variants={})
+    call_command('generate_image_variants', '--workers', '1')
+    product.refresh_from_db()
+    assert images.is_current(product)
+    call_command('generate_image_variants', '--workers', '1')  # Nothing stale: no-op
+
+def test_regenerate_in_process_pool(product, media):
+    # Workers are forked processes: they see the test data and write the files
+    for name in images.variant_names(product.image_variants):
+        os.remove(media / name)
+    result = images.regenerate([product.pk], workers=2)
+    assert result == {'done': 1, 'errors': {}}
+    assert all((media / name).exists() for name in images.variant_names(product.image_variants))
+
+@pytest.mark.django_db
+def test_missing_file_is_reported(media, create_test_categories):
+    product = Product.objects.create(name='Ghost', description='-', price=1, category=create_test_categories[0])
+    Product.objects.filter(pk=product.pk).update(image='product/missing.png')
+    result = images.regenerate([product.pk], workers=1)
+    assert 'missing.png' in result['errors'][product.pk]
@@ -0,0 +1,81 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+from rest_framework import status
+from store import inventory
+from store.services import place_order
+from tests.explain import QueryPlans
+
+
+def assert_indexed(client, url, params=None):
+    with QueryPlans() as plans:
+        response = client.get(url, params or {})
+    assert response.status_code == status.HTTP_200_OK, response.content
+    assert plans.queries
+    assert plans.full_scans() == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {},
+    {'ordering': 'price'},
+    {'ordering': '-price'},
+    {'ordering': '-created_at'},
+    # Not ?ordering=stock: it sorts by stock + slot stock, which no index holds
+    {'price': '9.99'},
+    {'stock': '100'},
+    {'category': 'CATEGORY'},
+    {'category': 'CATEGORY', 'ordering': 'price'},
+    {'category': 'CATEGORY', 'ordering': '-price', 'in_stock': 'true'},
+    {'search': 'lap'},
+])
+def test_product_list_uses_indexes(authenticated_api_client, create_test_products, params):
+    category = create_test_products[0].category
+    params = {key: category.pk if value == 'CATEGORY' else value for key, value in params.items()}
+    assert_indexed(authenticated_api_client, reverse('product-list'), params)
+
+@pytest.mark.django_db
+def test_product_next_page_and_detail_use_indexes(authenticated_api_client, create_test_products):
+    inventory.make_hot(create_test_products[0], slots=2)
+    page = authenticated_api_client.get(reverse('product-list'), {'page_size': 1, 'ordering': 'price'})
+    assert_indexed(authenticated_api_client, page.data['next'])
+    assert_indexed(authenticated_api_client, reverse('product-detail', args=[create_test_products[0].pk]))
+
+@pytest.mark.django_db
+def test_async_product_list_uses_indexes(create_test_products):
+    category = create_test_products[0].category
+    assert_indexed(Client(), reverse('async_product_list'), {'category': category.pk, 'ordering': 'price'})
+
+@pytest.mark.django_db
+def test_order_history_uses_indexes(authenticated_api_client, test_user, create_test_products):
+    order = place_order(test_user, {create_test_products[0].pk: 1}, name='A', address='B', phone='1')
+    assert_indexed(authenticated_api_client, reverse('order-list'))
+    assert_indexed(authenticated_api_client, reverse('order-list'), {'fields': 'id,total,items.product'})
+    assert_indexed(authenticated_api_client, reverse('order-detail', args=[order.pk]))
+
+@pytest.mark.django_db
+def test_in_stock_filter(api_client, create_test_products):
+    laptop, fish = create_test_products
+    laptop.stock = 0
+    laptop.save()
+    response = api_client.get(reverse('product-list'), {'in_stock': 'true'})
+    assert [product['id'] for product in response.data['results']] == [fish.pk]
+    # A hot product is in stock through its slots, until they run out
+    inventory.make_hot(fish, slots=2)
+    in_stock = fish.__class__.objects.filter(pk=fish.pk).in_stock()
+    assert in_stock.exists()
+    inventory.set_stock(fish, 0)
+    assert not in_stock.exists()
+
+@pytest.mark.django_db
+def test_in_stock_category_list_uses_partial_index(api_client, create_test_products):
+    with QueryPlans() as plans:
+        api_client.get(reverse('product-list'), {'category': create_test_products[0].category.pk, 'in_stock': 'true', 'ordering': 'price'})
+    assert any('product_in_stock_idx' in line for sql, plan in plans.plans() for line in plan)
+
+@pytest.mark.django_db
+def test_full_scans_are_reported(create_test_products):
+    from store.models import Product
+    with QueryPlans() as plans:
+        list(Product.objects.filter(description__contains='fish'))
+    assert len(plans.full_scans()) == 1
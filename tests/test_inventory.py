@@ -0,0 +1,85 @@
+import threading
+import pytest
+from django.db import connection, OperationalError
+from django.urls import reverse
+from store import inventory
+from store.models import Product, InventorySlot, Order
+from store.services import place_order, OutOfStock
+
+
+def slot_stock(product):
+    return sorted(InventorySlot.objects.filter(product=product).values_list('stock', flat=True))
+
+@pytest.mark.django_db
+def test_make_hot_spreads_stock_over_slots(create_test_products):
+    laptop = inventory.make_hot(create_test_products[0], slots=4)
+    assert laptop.stock == 0
+    assert slot_stock(laptop) == [2, 2, 3, 3]
+    assert Product.objects.get(pk=laptop.pk).total_stock == 10
+
+@pytest.mark.django_db
+def test_serializer_exposes_consolidated_stock(api_client, create_test_products):
+    laptop = inventory.make_hot(create_test_products[0], slots=4)
+    Product.objects.filter(pk=laptop.pk).update(stock=5)  # Restock into the pool
+    response = api_client.get(reverse('product-detail', args=[laptop.pk]))
+    assert response.data['stock'] == 15
+    response = api_client.get(reverse('product-list'))
+    assert response.data['results'][0]['stock'] == 15
+
+@pytest.mark.django_db
+def test_checkout_claims_from_slots(test_user, create_test_products):
+    laptop = inventory.make_hot(create_test_products[0], slots=4)
+    place_order(test_user, {laptop.pk: 2}, name='A', address='B', phone='1')
+    assert Product.objects.get(pk=laptop.pk).total_stock == 8
+
+@pytest.mark.django_db
+def test_claim_gathers_from_several_slots(test_user, create_test_products):
+    laptop = inventory.make_hot(create_test_products[0], slots=4)
+    place_order(test_user, {laptop.pk: 9}, name='A', address='B', phone='1')
+    assert Product.objects.get(pk=laptop.pk).total_stock == 1
+    with pytest.raises(OutOfStock):
+        place_order(test_user, {laptop.pk: 2}, name='A', address='B', phone='1')
+    assert Product.objects.get(pk=laptop.pk).total_stock == 1
+
+@pytest.mark.django_db
+def test_rebalance_and_make_cold(create_test_products):
+    laptop = inventory.make_hot(create_test_products[0], slots=2)
+    InventorySlot.objects.filter(product=laptop, slot=0).update(stock=0)
+    Product.objects.filter(pk=laptop.pk).update(stock=4)
+    laptop = inventory.rebalance(laptop)
+    assert slot_stock(laptop) == [4, 5]
+    laptop = inventory.make_cold(laptop)
+    assert (laptop.stock, laptop.stock_slots) == (9, 0)
+    assert not InventorySlot.objects.filter(product=laptop).exists()
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_checkouts_never_oversell(test_user, create_test_categories):
+    product = Product.objects.create(name='Flash deal', description='Hot', price=1, stock=40, category=create_test_categories[0])
+    inventory.make_hot(product, slots=4)
+    sold = []
+
+    def buyer():
+        try:
+            for _ in range(10):
+                for attempt in range(50):
+                    try:
+                        place_order(test_user, {product.pk: 1}, name='A', address='B', phone='1')
+                        sold.append(1)
+                    except OutOfStock:
+                        pass
+                    except OperationalError:
+                        continue  # SQLite lock timeout, try again
+                    break
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sold) == 40  # 60 attempts for 40 units
+    assert Order.objects.count() == 40
+    assert Product.objects.get(pk=product.pk).total_stock == 0
+    assert all(stock >= 0 for stock in InventorySlot.objects.values_list('stock', flat=True))
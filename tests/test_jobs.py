@@ -0,0 +1,174 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from store import carts, jobs
+from store.models import Job
+from store.services import OutOfStock, place_order
+
+
+@pytest.fixture
+def test_task():
+    # Temporary tasks: calls are recorded, `fail` raises while it's > 0
+    calls, state = [], {'fail': 0}
+
+    def flaky(value):
+        if state['fail'] > 0:
+            state['fail'] -= 1
+            raise RuntimeError('flaky failure')
+        calls.append(value)
+
+    jobs.task('test_flaky', max_attempts=3)(flaky)
+    yield calls, state
+    jobs.TASKS.pop('test_flaky')
+
+
+@pytest.mark.django_db
+def test_checkout_queues_confirmation_mail(client, test_user, create_test_products):
+    test_user.email = 'buyer@example.com'
+    test_user.save()
+    laptop, _ = create_test_products
+    client.force_login(test_user)
+    carts.apply_changes(carts.get_cart(test_user), [{'product': laptop.pk, 'quantity': 2}])
+
+    response = client.post(reverse('checkout'), {'name': 'A', 'address': 'Main St 1', 'phone': '1'})
+    assert response.status_code == 200
+    assert mail.outbox == []  # Not sent during the request
+    job = Job.objects.get()
+    assert (job.name, job.status) == ('send_order_confirmation', 'queued')
+
+    assert jobs.run_pending() == 1
+    assert not Job.objects.exists()
+    assert len(mail.outbox) == 1
+    message = mail.outbox[0]
+    assert message.to == ['buyer@example.com']
+    assert f'order #{job.payload["order_id"]}' in message.subject
+    assert 'Laptop x2' in message.body and 'Main St 1' in message.body
+
+@pytest.mark.django_db
+def test_job_rolls_back_with_the_order(test_user, create_test_products):
+    laptop, _ = create_test_products
+    with pytest.raises(OutOfStock):
+        place_order(test_user, {laptop.pk: 99}, name='A', address='B', phone='1')
+    assert not Job.objects.exists()
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            place_order(test_user, {laptop.pk: 1}, name='A', address='B', phone='1')
+            assert Job.objects.count() == 1
+            raise RuntimeError
+    assert not Job.objects.exists()
+
+@pytest.mark.django_db
+def test_no_mail_without_address_or_order(create_test_order):
+    jobs.enqueue('send_order_confirmation', order_id=create_test_order.pk)  # User has no email
+    jobs.enqueue('send_order_confirmation', order_id=create_test_order.pk + 100)
+    assert jobs.run_pending() == 2
+    assert mail.outbox == [] and not Job.objects.exists()
+
+@pytest.mark.django_db
+def test_failed_job_is_retried_with_backoff(test_task):
+    calls, state = test_task
+    state['fail'] = 1
+    job = jobs.enqueue('test_flaky', value=7)
+    assert jobs.run_pending() == 1
+
+    job.refresh_from_db()
+    assert (job.status, job.attempts, calls) == ('queued', 1, [])
+    assert 'flaky failure' in job.last_error
+    assert job.run_at > timezone.now() + timedelta(seconds=9)  # JOBS_RETRY_DELAY
+    assert jobs.run_pending() == 0  # Not due yet
+
+    Job.objects.update(run_at=timezone.now())
+    assert jobs.run_pending() == 1
+    assert calls == [7] and not Job.objects.exists()
+
+@pytest.mark.django_db
+def test_job_fails_after_max_attempts(test_task):
+    _, state = test_task
+    state['fail'] = 5
+    job = jobs.enqueue('test_flaky', value=1)
+    for _ in range(3):
+        Job.objects.filter(status='queued').update(run_at=timezone.now())
+        jobs.run_pending()
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == ('failed', 3)
+
+    Job.objects.create(name='gone', run_at=timezone.now())  # Task removed from the code
+    jobs.run_pending()
+    assert Job.objects.get(name='gone').status == 'failed'
+
+def test_retry_delay_doubles_up_to_the_cap(settings):
+    settings.JOBS_RETRY_DELAY = 10
+    settings.JOBS_MAX_RETRY_DELAY = 60
+    assert 10 <= jobs.retry_delay(1) <= 11
+    assert 40 <= jobs.retry_delay(3) <= 44
+    assert 60 <= jobs.retry_delay(10) <= 66
+
+@pytest.mark.django_db
+def test_claim_takes_each_due_job_once(test_task):
+    first = [jobs.enqueue('test_flaky', value=i).pk for i in range(3)]
+    later = jobs.enqueue('test_flaky', delay=60, value=9)
+    assert jobs.claim(2) == first[:2]
+    assert jobs.claim(5) == first[2:]
+    assert jobs.claim(5) == []
+    assert Job.objects.get(pk=later.pk).status == 'queued'
+
+@pytest.mark.django_db
+def test_stale_running_jobs_are_requeued(test_task):
+    job = jobs.enqueue('test_flaky', value=1)
+    spent = jobs.enqueue('test_flaky', value=2)
+    jobs.claim(2)
+    Job.objects.filter(pk=spent.pk).update(attempts=3)
+    assert jobs.requeue_stale() == 0
+    Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+    assert jobs.requeue_stale() == 2
+    assert Job.objects.get(pk=job.pk).status == 'queued'
+    assert Job.objects.get(pk=spent.pk).status == 'failed'
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_runs_jobs_on_a_thread_pool(test_task):
+    calls, _ = test_task
+    for value in range(10):
+        jobs.enqueue('test_flaky', value=value)
+    worker = jobs.Worker(concurrency=3, batch_size=4)
+    assert worker.run(once=True) == 10
+    assert sorted(calls) == list(range(10))
+    assert not Job.objects.exists()
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_stops_after_max_jobs_and_on_stop(test_task):
+    calls, _ = test_task
+    for value in range(5):
+        jobs.enqueue('test_flaky', value=value)
+    assert jobs.Worker(concurrency=2, batch_size=10).run(max_jobs=3) == 3
+    assert Job.objects.count() == 2
+    assert len(calls) == 3
+
+    worker = jobs.Worker(concurrency=1, poll_interval=0.05)
+    threading.Timer(0.3, worker.stop).start()
+    assert worker.run() == 2  # Polls the empty queue until stopped
+    assert sorted(calls) == list(range(5))
+
+@pytest.mark.django_db(transaction=True)
+def test_run_jobs_command(create_test_order, capsys):
+    jobs.enqueue('send_order_confirmation', order_id=create_test_order.pk)
+    call_command('run_jobs', '--once', '--concurrency', '2')
+    assert 'Stopped after 1 job(s), 0 failed' in capsys.readouterr().out
+    assert not Job.objects.exists()
+
+@pytest.mark.django_db
+def test_admin_retries_failed_jobs(client, staff_user):
+    staff_user.is_superuser = True
+    staff_user.save()
+    client.force_login(staff_user)
+    job = Job.objects.create(name='send_order_confirmation', status='failed', attempts=8, run_at=timezone.now())
+    response = client.post(reverse('admin:store_job_changelist'), {'action': 'retry', '_selected_action': [job.pk]})
+    assert response.status_code == 302
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == ('queued', 0)
@@ -0,0 +1,52 @@
+import io
+import json
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from store.loader import iter_json_array, load_fixture
+from store.models import Category, Product, Order
+
+
+def test_iter_json_array_across_chunk_boundaries():
+    data = [{'a': i, 'text': 'x, ]}' * i} for i in range(20)]
+    stream = io.StringIO(json.dumps(data, indent=2))
+    assert list(iter_json_array(stream, chunk_size=7)) == data
+
+def test_iter_json_array_rejects_truncated_file():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a": 1}, {"a":'), chunk_size=4))
+
+@pytest.mark.django_db
+def test_load_utf16_repo_fixture(capsys):
+    call_command('load_catalog', str(settings.BASE_DIR / 'clean_store_data.json'), '--chunk-size', '4')
+    assert Category.objects.count() == 2
+    assert Product.objects.count() == 18
+    assert Order.objects.get(pk=1).items.count() >= 1
+    # auto_now_add fields keep the fixture's timestamps
+    assert Product.objects.get(pk=1).created_at.isoformat().startswith('2025-07-15T12:33:50')
+    assert 'utf-16' in capsys.readouterr().out
+
+@pytest.mark.django_db
+def test_products_before_their_category(tmp_path):
+    fixture = tmp_path / 'seed.json'
+    fixture.write_text(json.dumps([
+        {'model': 'store.product', 'pk': 7, 'fields': {
+            'name': 'Cod', 'description': 'Fish', 'price': '3.00', 'stock': 1, 'category': 9,
+            'created_at': '2025-01-01T00:00:00Z', 'updated_at': '2025-01-01T00:00:00Z'}},
+        {'model': 'store.category', 'pk': 9, 'fields': {'name': 'Fish', 'slug': 'fish'}},
+    ]), encoding='utf-8')
+    result = load_fixture(str(fixture), chunk_size=1)
+    assert result['objects'] == 2
+    assert Product.objects.get(pk=7).category.slug == 'fish'
+
+@pytest.mark.django_db
+def test_dangling_reference_is_reported(tmp_path):
+    fixture = tmp_path / 'seed.json'
+    fixture.write_text(json.dumps([
+        {'model': 'store.product', 'pk': 1, 'fields': {
+            'name': 'Cod', 'description': 'Fish', 'price': '3.00', 'stock': 1, 'category': 404,
+            'created_at': '2025-01-01T00:00:00Z', 'updated_at': '2025-01-01T00:00:00Z'}},
+    ]), encoding='utf-8')
+    with pytest.raises(ValueError, match='store.Category pk=404'):
+        load_fixture(str(fixture))
+    assert Product.objects.count() == 0
@@ -0,0 +1,88 @@
+import base64
+import json
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from rest_framework import status
+from store.models import Product, Order
+
+
+@pytest.fixture
+def many_products(db, create_test_categories):
+    category = create_test_categories[0]
+    # Repeated prices force the id tiebreaker to do its job
+    return [
+        Product.objects.create(name=f'Item {i}', description='Item', price=Decimal(10 + i % 3), stock=i, category=category)
+        for i in range(12)
+    ]
+
+def walk(client, url, params):
+    names, response = [], client.get(url, params)
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        names.extend(p['name'] for p in response.data['results'])
+        if not response.data['next']:
+            return names, response
+        response = client.get(response.data['next'])
+
+@pytest.mark.django_db
+def test_cursor_walk_visits_every_product_once(api_client, many_products):
+    names, _ = walk(api_client, reverse('product-list'), {'page_size': 5})
+    assert names == [p.name for p in many_products]
+
+@pytest.mark.django_db
+def test_cursor_walk_follows_price_ordering(api_client, many_products):
+    names, _ = walk(api_client, reverse('product-list'), {'ordering': '-price', 'page_size': 4})
+    expected = sorted(many_products, key=lambda p: (-p.price, -p.id))
+    assert names == [p.name for p in expected]
+
+@pytest.mark.django_db
+def test_previous_link_returns_to_earlier_page(api_client, many_products):
+    url = reverse('product-list')
+    first = api_client.get(url, {'ordering': 'price', 'page_size': 4})
+    assert first.data['previous'] is None
+    second = api_client.get(first.data['next'])
+    back = api_client.get(second.data['previous'])
+    assert back.data['results'] == first.data['results']
+    assert back.data['next'] is not None
+
+@pytest.mark.django_db
+def test_page_size_is_capped(api_client, many_products):
+    response = api_client.get(reverse('product-list'), {'page_size': 10000})
+    assert len(response.data['results']) == 12
+    assert 'count' not in response.data
+
+@pytest.mark.django_db
+def test_invalid_cursor_is_404(api_client, many_products):
+    response = api_client.get(reverse('product-list'), {'cursor': 'not-a-cursor'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'ordering': 'price'}, {'search': 'item'}])
+@pytest.mark.parametrize('values', [['abc', 1], [{'x': 1}, 1], [None, None], ['10', 'abc'], ['10', 2 ** 80]])
+def test_tampered_cursor_is_404(api_client, many_products, params, values):
+    payload = json.dumps({'d': 'next', 'v': values}).encode()
+    params = {**params, 'cursor': base64.urlsafe_b64encode(payload).decode()}
+    response = api_client.get(reverse('product-list'), params)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_page_number_mode_is_opt_in(api_client, many_products):
+    response = api_client.get(reverse('product-list'), {'page': 2})
+    assert response.data['count'] == 12
+    assert [p['name'] for p in response.data['results']] == [p.name for p in many_products[5:10]]
+
+@pytest.mark.django_db
+def test_orders_are_paginated_newest_first(authenticated_api_client, test_user, other_user):
+    for i in range(25):
+        Order.objects.create(user=test_user, name='A', address='B', phone='1', total=Decimal('1.00'))
+    Order.objects.create(user=other_user, name='X', address='Y', phone='2', total=Decimal('1.00'))
+
+    response = authenticated_api_client.get(reverse('order-list'))
+    assert len(response.data['results']) == 20
+    ids = [o['id'] for o in response.data['results']]
+    assert ids == sorted(ids, reverse=True)
+
+    rest = authenticated_api_client.get(response.data['next'])
+    assert len(rest.data['results']) == 5
+    assert rest.data['next'] is None
@@ -0,0 +1,102 @@
+import json
+import logging
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+
+@pytest.fixture
+def profile_all(settings):
+    settings.PROFILING_SAMPLE_RATE = 1.0
+    settings.PROFILING_SLOW_MS = 10_000
+    settings.PROFILING_SERVER_TIMING = True
+    return settings
+
+def log_records(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == 'common.profiling']
+
+@pytest.mark.django_db
+def test_server_timing_and_log_line(profile_all, authenticated_api_client, create_test_products, caplog):
+    caplog.set_level(logging.INFO, logger='common.profiling')
+    response = authenticated_api_client.get(reverse('product-list'))
+    header = response['Server-Timing']
+    for name in ['db', 'serialize', 'render', 'template', 'view', 'total']:
+        assert f'{name};dur=' in header
+    [record] = log_records(caplog)
+    assert record['path'] == reverse('product-list')
+    assert record['status'] == 200
+    assert record['db_queries'] >= 1
+    assert record['serialize_ms'] > 0 and record['render_ms'] > 0
+    assert f'desc="{record["db_queries"]} queries"' in header
+    assert 'slow_queries' not in record
+
+@pytest.mark.django_db
+def test_unsampled_requests_are_untouched(settings, authenticated_api_client, create_test_products, caplog):
+    settings.PROFILING_SAMPLE_RATE = 0
+    caplog.set_level(logging.INFO, logger='common.profiling')
+    response = authenticated_api_client.get(reverse('product-list'))
+    assert 'Server-Timing' not in response
+    assert log_records(caplog) == []
+
+@pytest.mark.django_db
+def test_slow_unsampled_request_is_logged(settings, authenticated_api_client, create_test_products, caplog):
+    settings.PROFILING_SAMPLE_RATE = 0
+    settings.PROFILING_SLOW_MS = 0
+    caplog.set_level(logging.INFO, logger='common.profiling')
+    authenticated_api_client.get(reverse('product-list'))
+    [record] = log_records(caplog)
+    assert record['slow'] is True and record['sampled'] is False
+    assert caplog.records[-1].levelno == logging.WARNING
+
+@pytest.mark.django_db
+def test_slow_request_dumps_queries_with_call_site(profile_all, authenticated_api_client, create_test_order, caplog):
+    profile_all.PROFILING_SLOW_MS = 0
+    profile_all.PROFILING_QUERY_DUMP = 2
+    caplog.set_level(logging.INFO, logger='common.profiling')
+    authenticated_api_client.get(reverse('order-list'))
+    [record] = log_records(caplog)
+    assert 1 <= len(record['slow_queries']) <= 2
+    query = record['slow_queries'][0]
+    assert query['sql'].startswith('SELECT')
+    assert query['at'].startswith('store')
+
+@pytest.mark.django_db
+def test_template_time_is_measured(profile_all, create_test_products, caplog):
+    caplog.set_level(logging.INFO, logger='common.profiling')
+    Client().get(reverse('product_list'))
+    [record] = log_records(caplog)
+    assert record['template_ms'] > 0
+    assert record['view_ms'] >= record['template_ms']
+
+@pytest.mark.django_db
+def test_async_views_are_profiled(profile_all, create_test_products, caplog):
+    caplog.set_level(logging.INFO, logger='common.profiling')
+    response = Client().get(reverse('async_product_list'))
+    assert 'db;dur=' in response['Server-Timing']
+    [record] = log_records(caplog)
+    assert record['db_queries'] == 1  # The page; the ETag comes from the cache generation
+
+@pytest.mark.django_db
+def test_middleware_in_async_mode(profile_all, create_test_products):
+    response = async_to_sync(AsyncClient().get)(reverse('async_product_list'))
+    assert response.status_code == 200
+    assert 'db;dur=' in response['Server-Timing']
+
+@pytest.mark.django_db
+def test_server_timing_is_only_sent_internally(profile_all, client, staff_user, create_test_products):
+    profile_all.PROFILING_SERVER_TIMING = 'internal'
+    profile_all.INTERNAL_IPS = ['10.0.0.9']
+    url = reverse('product_list')
+    assert 'Server-Timing' not in client.get(url)
+    assert 'Server-Timing' in Client(REMOTE_ADDR='10.0.0.9').get(url)
+    client.force_login(staff_user)
+    assert 'Server-Timing' in client.get(url)
+
+    async def get(login):
+        async_client = AsyncClient()
+        if login:
+            await async_client.aforce_login(staff_user)
+        return await async_client.get(reverse('async_product_list'))
+    assert 'Server-Timing' not in async_to_sync(get)(False)
+    assert 'Server-Timing' in async_to_sync(get)(True)
@@ -0,0 +1,46 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from store.models import Order, OrderItem
+
+
+def place_orders(user, products, count):
+    for i in range(count):
+        order = Order.objects.create(user=user, name='A', address='B', phone='1', total=Decimal('10.00'))
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=i + 1, price=product.price)
+
+def count_queries(fetch):
+    with CaptureQueriesContext(connection) as ctx:
+        response = fetch()
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+@pytest.mark.django_db
+def test_order_api_query_count_is_constant(authenticated_api_client, test_user, create_test_products):
+    url = reverse('order-list')
+    place_orders(test_user, create_test_products, 2)
+    few = count_queries(lambda: authenticated_api_client.get(url))
+    place_orders(test_user, create_test_products, 10)
+    many = count_queries(lambda: authenticated_api_client.get(url))
+    assert few == many
+
+@pytest.mark.django_db
+def test_order_api_items_use_light_product(authenticated_api_client, test_user, create_test_products):
+    place_orders(test_user, create_test_products[:1], 1)
+    response = authenticated_api_client.get(reverse('order-list'))
+    item = response.data['results'][0]['items'][0]
+    assert item['quantity'] == 1
+    assert set(item['product']) == {'id', 'name', 'price'}
+
+@pytest.mark.django_db
+def test_order_history_query_count_is_constant(client, test_user, create_test_products):
+    client.force_login(test_user)
+    url = reverse('order_history')
+    place_orders(test_user, create_test_products, 2)
+    few = count_queries(lambda: client.get(url))
+    place_orders(test_user, create_test_products, 10)
+    many = count_queries(lambda: client.get(url))
+    assert few == many
@@ -0,0 +1,111 @@
+import types
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient, Client, RequestFactory
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from common import ratelimit
+
+
+@pytest.fixture
+def limits(settings):
+    settings.RATE_LIMITS = {'catalog': (1, 3), 'search': (1, 1), 'auth': (0.5, 2)}
+    return settings
+
+def test_bucket_refills_at_the_rate():
+    store = ratelimit.LocalStore()
+    assert [store.take('k', 2, 3, 100.0) for _ in range(3)] == [0, 0, 0]
+    assert store.take('k', 2, 3, 100.0) == 0.5      # Next token in 1 / rate seconds
+    assert store.take('k', 2, 3, 100.5) == 0        # ...and there it is
+    assert store.take('k', 2, 3, 200.0) == 0        # Never more than burst
+    assert store.buckets['k'][0] == 2
+
+def test_cache_store_is_shared(settings):
+    first, second = ratelimit.CacheStore(), ratelimit.CacheStore()  # Two processes
+    assert first.take('k', 1, 2, 100.0) == 0
+    assert second.take('k', 1, 2, 100.0) == 0
+    assert first.take('k', 1, 2, 100.0) == 1
+
+@pytest.mark.django_db
+def test_auth_views_are_limited_per_ip(limits, client, monkeypatch):
+    # Frozen clock: password hashing is slow enough to refill the bucket
+    monkeypatch.setattr(ratelimit, 'time', types.SimpleNamespace(time=lambda: 1000.0))
+    login = {'username': 'nobody', 'password': 'wrong'}
+    assert [client.post(reverse('login'), login).status_code for _ in range(2)] == [200, 200]
+    response = client.post(reverse('login'), login)
+    assert response.status_code == 429
+    assert response['Retry-After'] == '2'
+    assert response.json() == {'detail': 'Request was throttled.'}
+    # Another address has its own bucket; pages outside the groups aren't limited
+    assert Client(REMOTE_ADDR='10.0.0.2').post(reverse('register'), {'username': 'new', 'password': 'x'}).status_code == 302
+    assert client.get(reverse('cart_view')).status_code == 200
+
+@pytest.mark.django_db
+def test_auth_forms_can_be_loaded_freely(limits, client):
+    assert {client.get(reverse('login')).status_code for _ in range(5)} == {200}
+    assert {client.get(reverse('register')).status_code for _ in range(5)} == {200}
+    assert client.post(reverse('login'), {'username': 'nobody', 'password': 'wrong'}).status_code == 200  # Bucket still full
+
+@pytest.mark.django_db
+def test_search_has_its_own_bucket(limits, create_test_products):
+    client = Client()
+    url = reverse('async_product_list')
+    assert client.get(url, {'search': 'laptop'}).status_code == 200
+    assert client.get(url, {'search': 'fish'}).status_code == 429
+    assert client.get(url).status_code == 200  # Plain browsing is still allowed
+
+@pytest.mark.django_db
+def test_clients_are_users_when_known(test_user, other_user, settings):
+    settings.RATE_LIMIT_PROXY_COUNT = 1
+    factory = RequestFactory()
+    request = factory.get('/', HTTP_X_FORWARDED_FOR='203.0.113.9, 10.0.0.1', REMOTE_ADDR='10.0.0.5')
+    assert ratelimit.client_key(request) == 'ip:10.0.0.1'  # The address our proxy saw
+    assert ratelimit.client_key(request, other_user) == f'user:{other_user.pk}'
+
+    request = factory.get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(test_user)}')
+    assert ratelimit.client_key(request) == f'user:{test_user.pk}'
+    request = factory.get('/', HTTP_AUTHORIZATION='Bearer forged', REMOTE_ADDR='10.0.0.7')
+    assert ratelimit.client_key(request) == 'ip:10.0.0.7'
+
+@pytest.mark.django_db
+def test_async_requests_are_limited(limits, create_test_products):
+    client = AsyncClient()
+    url = reverse('async_product_detail', args=[create_test_products[0].pk])
+    statuses = [async_to_sync(client.get)(url).status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    assert ratelimit.in_flight() == 0
+
+@pytest.mark.django_db
+def test_busy_process_sheds_all_but_checkout(settings, client, test_user, create_test_products):
+    settings.ADMISSION_MAX_CONCURRENCY = 3
+    settings.ADMISSION_RESERVED = 1
+    client.force_login(test_user)
+    assert ratelimit.admit(None) and ratelimit.admit(None)  # Two requests already running
+    try:
+        response = client.get(reverse('product_list'))
+        assert response.status_code == 503
+        assert response['Retry-After'] == '1'
+        assert client.get(reverse('order_history')).status_code == 200  # Uses the reserved slot
+    finally:
+        ratelimit.release()
+        ratelimit.release()
+    assert client.get(reverse('product_list')).status_code == 200
+    assert ratelimit.in_flight() == 0
+
+@pytest.mark.django_db  # close() sends request_finished, which closes old DB connections
+def test_streaming_response_holds_its_slot_until_closed(settings):
+    settings.ADMISSION_MAX_CONCURRENCY = 3
+    settings.ADMISSION_RESERVED = 1
+    middleware = ratelimit.RateLimitMiddleware(lambda request: StreamingHttpResponse(iter([b'row\n'] * 3)))
+    response = middleware(RequestFactory().get('/'))
+    assert ratelimit.in_flight() == 1  # Body not sent yet
+    assert b''.join(response.streaming_content) == b'row\n' * 3
+    response.close()
+    assert ratelimit.in_flight() == 0
+
+@pytest.mark.django_db
+def test_disabled(limits, client):
+    limits.RATE_LIMIT_ENABLED = False
+    assert {client.post(reverse('login'), {'username': 'nobody', 'password': 'wrong'}).status_code for _ in range(5)} == {200}
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from store.models import DailyCategorySales, DailyOrderStatus, DailyProductSales, Order
+from store.services import place_order
+
+
+def snapshot():
+    return (
+        sorted(DailyProductSales.objects.exclude(quantity=0).values_list('day', 'product', 'quantity', 'revenue')),
+        sorted(DailyCategorySales.objects.exclude(quantity=0).values_list('day', 'category', 'quantity', 'revenue')),
+        sorted(DailyOrderStatus.objects.exclude(orders=0).values_list('day', 'status', 'orders', 'revenue')),
+    )
+
+@pytest.fixture
+def orders(test_user, create_test_products):
+    laptop, fish = create_test_products
+    first = place_order(test_user, {laptop.pk: 1, fish.pk: 2}, name='A', address='B', phone='1')
+    second = place_order(test_user, {fish.pk: 3}, name='A', address='B', phone='1')
+    return first, second
+
+@pytest.mark.django_db
+def test_place_order_updates_rollups(orders, create_test_products):
+    laptop, fish = create_test_products
+    today = timezone.localdate()
+    assert DailyProductSales.objects.get(day=today, product=fish).quantity == 5
+    assert DailyProductSales.objects.get(day=today, product=laptop).revenue == Decimal('999.99')
+    assert DailyCategorySales.objects.get(day=today, category=fish.category).revenue == Decimal('49.95')
+    pending = DailyOrderStatus.objects.get(day=today, status='pending')
+    assert pending.orders == 2
+    assert pending.revenue == orders[0].total + orders[1].total
+
+@pytest.mark.django_db
+def test_mark_order_paid_moves_status(client, staff_user, orders):
+    client.force_login(staff_user)
+    client.post(reverse('mark_order_paid', args=[orders[0].pk]))
+    today = timezone.localdate()
+    assert DailyOrderStatus.objects.get(day=today, status='pending').orders == 1
+    assert DailyOrderStatus.objects.get(day=today, status='placed').revenue == orders[0].total
+
+@pytest.mark.django_db
+def test_admin_list_editable_status(client, orders, django_user_model):
+    admin = django_user_model.objects.create_superuser('boss', 'boss@example.com', 'pass')
+    client.force_login(admin)
+    first, second = orders
+    response = client.post(reverse('admin:store_order_changelist'), {
+        'form-TOTAL_FORMS': '2', 'form-INITIAL_FORMS': '2',
+        'form-0-id': str(second.pk), 'form-0-status': 'shipped',
+        'form-1-id': str(first.pk), 'form-1-status': 'pending',
+        '_save': 'Save',
+    })
+    assert response.status_code == 302
+    statuses = dict(DailyOrderStatus.objects.values_list('status', 'orders'))
+    assert statuses == {'pending': 1, 'shipped': 1}
+
+@pytest.mark.django_db
+def test_delete_and_rebuild(orders):
+    orders[1].delete()
+    incremental = snapshot()
+    assert DailyOrderStatus.objects.get(status='pending').orders == 1
+
+    # Orders written behind the ORM's back are caught up by the backfill
+    Order.objects.filter(pk=orders[0].pk).update(status='delivered', created_at=timezone.now() - timedelta(days=3))
+    call_command('backfill_sales')
+    assert snapshot() != incremental
+    Order.objects.filter(pk=orders[0].pk).update(status='pending', created_at=orders[0].created_at)
+    call_command('backfill_sales')
+    assert snapshot() == incremental
+
+@pytest.mark.django_db
+def test_backfill_range_leaves_other_days(orders):
+    today = timezone.localdate()
+    DailyOrderStatus.objects.create(day=today - timedelta(days=10), status='placed', orders=7, revenue=70)
+    call_command('backfill_sales', '--from', today.isoformat())
+    assert DailyOrderStatus.objects.get(day=today - timedelta(days=10)).orders == 7
+    assert DailyOrderStatus.objects.get(day=today, status='pending').orders == 2
+
+@pytest.mark.django_db
+def test_sales_report_endpoint(api_client, staff_user, test_user, orders, create_test_products):
+    url = reverse('sales_report')
+    api_client.force_authenticate(user=test_user)
+    assert api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+    api_client.force_authenticate(user=staff_user)
+    today = timezone.localdate().isoformat()
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url)
+    assert response.data['to'] == today
+    assert response.data['results'] == [{
+        'day': today, 'orders': 2, 'quantity': 6, 'revenue': str(sum(order.total for order in orders)),
+    }]
+    # Only rollup tables are read
+    assert not any('"store_order"' in query['sql'] or '"store_orderitem"' in query['sql'] for query in queries)
+
+    products = api_client.get(url, {'group': 'product'}).data['results']
+    assert [row['name'] for row in products] == ['Laptop', 'Rui']
+    assert products[1] == {'product': create_test_products[1].pk, 'name': 'Rui', 'quantity': 5, 'revenue': '49.95'}
+    assert api_client.get(url, {'group': 'category'}).data['results'][0]['name'] == 'Electronic'
+    assert api_client.get(url, {'group': 'status'}).data['results'] == [
+        {'status': 'pending', 'orders': 2, 'revenue': str(sum(order.total for order in orders))},
+    ]
+    assert api_client.get(url, {'from': '2000-01-01', 'to': '2000-01-31'}).data['results'] == []
+    assert api_client.get(url, {'group': 'week'}).status_code == status.HTTP_400_BAD_REQUEST
+    assert api_client.get(url, {'from': 'yesterday'}).status_code == status.HTTP_400_BAD_REQUEST
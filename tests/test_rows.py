@@ -0,0 +1,80 @@
+import pytest
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from store import inventory
+from store.models import Order, OrderItem, Product
+from store.renderers import FastJSONRenderer
+from store.serializers import OrderSerializer, ProductSerializer, order_rows, product_rows
+
+
+def slow_list(client, url, settings, **params):
+    settings.FAST_LIST_RENDERING = False
+    try:
+        return client.get(url, params)
+    finally:
+        settings.FAST_LIST_RENDERING = True
+
+@pytest.mark.django_db
+def test_product_rows_match_serializer(create_test_products, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    laptop, fish = create_test_products
+    laptop.image = SimpleUploadedFile('laptop.jpg', b'not really a jpeg')
+    laptop.save()
+    inventory.make_hot(fish, slots=3)
+
+    request = RequestFactory().get('/api/products/')
+    queryset = Product.objects.with_stock().order_by('pk')
+    expected = ProductSerializer(queryset, many=True, context={'request': request}).data
+    rows = product_rows.build(queryset.values(*product_rows.columns()), request)
+    assert rows == expected
+    assert [list(row) for row in rows] == [list(row) for row in expected]  # Same key order
+    assert rows[0]['image'].startswith('http://testserver/media/product/laptop')
+    assert rows[1]['stock'] == 100
+
+@pytest.mark.django_db
+def test_order_rows_match_serializer(create_test_order, create_test_products):
+    laptop, fish = create_test_products
+    OrderItem.objects.create(order=create_test_order, product=laptop, quantity=1, price=Decimal('999.99'))
+    OrderItem.objects.create(order=create_test_order, product=fish, quantity=3, price=Decimal('9.99'))
+
+    queryset = Order.objects.with_items().order_by('pk')
+    expected = OrderSerializer(queryset, many=True).data
+    assert order_rows.build(queryset.prefetch_related(None).values(*order_rows.columns())) == expected
+
+@pytest.mark.django_db
+def test_product_list_body_is_unchanged(authenticated_api_client, create_test_products, settings):
+    url = reverse('product-list')
+    for params in [{}, {'ordering': '-price'}, {'search': 'laptop'}, {'page': 1}, {'page_size': 1}]:
+        fast = authenticated_api_client.get(url, params)
+        slow = slow_list(authenticated_api_client, url, settings, **params)
+        assert fast.content == slow.content, params
+
+@pytest.mark.django_db
+def test_fast_list_cursor_pages(authenticated_api_client, create_test_products):
+    url = reverse('product-list')
+    first = authenticated_api_client.get(url, {'page_size': 1, 'ordering': 'price'})
+    assert first.data['results'][0]['name'] == 'Rui'
+    second = authenticated_api_client.get(first.data['next'])
+    assert second.data['results'][0]['name'] == 'Laptop'
+
+@pytest.mark.django_db
+def test_order_list_body_is_unchanged(authenticated_api_client, create_test_order, create_test_products, settings):
+    OrderItem.objects.create(order=create_test_order, product=create_test_products[0], quantity=2, price=Decimal('999.99'))
+    url = reverse('order-list')
+    assert authenticated_api_client.get(url).content == slow_list(authenticated_api_client, url, settings).content
+
+def test_fast_renderer_matches_json_renderer():
+    data = {'price': Decimal('9.99'), 'name': 'Čaj   ☕', 'nested': [{'a': None, 'b': True, 'c': 1.5}], 1: 'x'}
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    assert FastJSONRenderer().render({'n': 2 ** 70}) == JSONRenderer().render({'n': 2 ** 70})
+    assert FastJSONRenderer().render(None) == b''
+
+@pytest.mark.django_db
+def test_benchmark_command(create_test_products, capsys):
+    call_command('benchmark_lists', 'products', 'categories', '--repeat', '2')
+    out = capsys.readouterr().out
+    assert 'products:' in out and 'categories:' in out
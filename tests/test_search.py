@@ -0,0 +1,51 @@
+import pytest
+from django.urls import reverse
+from store.models import Product
+
+
+@pytest.mark.django_db
+def test_search_matches_name_and_description(api_client, create_test_products):
+    url = reverse('product-list')
+    response = api_client.get(url, {'search': 'laptop'})
+    assert [p['name'] for p in response.data['results']] == ['Laptop']
+
+    response = api_client.get(url, {'search': 'fish'})
+    assert [p['name'] for p in response.data['results']] == ['Rui']
+
+@pytest.mark.django_db
+def test_search_matches_prefix(api_client, create_test_products):
+    response = api_client.get(reverse('product-list'), {'search': 'lapt'})
+    assert [p['name'] for p in response.data['results']] == ['Laptop']
+
+@pytest.mark.django_db
+def test_search_ranked_by_relevance(api_client, create_test_categories):
+    category = create_test_categories[0]
+    Product.objects.create(name='Cable', description='Works with any laptop.', price=5, stock=1, category=category)
+    Product.objects.create(name='Laptop Pro', description='Laptop for laptop lovers.', price=5, stock=1, category=category)
+    response = api_client.get(reverse('product-list'), {'search': 'laptop'})
+    assert [p['name'] for p in response.data['results']] == ['Laptop Pro', 'Cable']
+
+@pytest.mark.django_db
+def test_search_index_follows_updates_and_deletes(api_client, create_test_products):
+    url = reverse('product-list')
+    laptop, fish = create_test_products
+
+    Product.objects.filter(pk=laptop.pk).update(name='Notebook', description='A thin notebook.')
+    assert api_client.get(url, {'search': 'laptop'}).data['results'] == []
+    assert len(api_client.get(url, {'search': 'notebook'}).data['results']) == 1
+
+    fish.delete()
+    assert api_client.get(url, {'search': 'fish'}).data['results'] == []
+
+@pytest.mark.django_db
+def test_search_ignores_query_syntax(api_client, create_test_products):
+    url = reverse('product-list')
+    assert api_client.get(url, {'search': '"laptop'}).status_code == 200
+    assert api_client.get(url, {'search': '*"()'}).data['results'] == []
+
+@pytest.mark.django_db
+def test_ordering_param_overrides_rank(api_client, create_test_products):
+    response = api_client.get(reverse('product-list'), {'search': 'a', 'ordering': 'price'})
+    assert response.status_code == 200
+    prices = [p['price'] for p in response.data['results']]
+    assert prices == sorted(prices, key=float)
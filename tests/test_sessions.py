@@ -0,0 +1,120 @@
+import pytest
+from datetime import timedelta
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from common import sessions
+from common.sessions import SessionStore
+
+
+def session_writes(ctx):
+    return [q['sql'] for q in ctx.captured_queries
+            if 'django_session' in q['sql'] and not q['sql'].lstrip().upper().startswith('SELECT')]
+
+@pytest.fixture
+def stored_session(db):
+    session = SessionStore()
+    session['cart'] = {'1': 2}
+    session.save()
+    return session.session_key
+
+@pytest.mark.django_db
+def test_unchanged_session_is_not_written(stored_session):
+    session = SessionStore(stored_session)
+    session['cart'] = {'1': 2}  # Marks it modified, but the payload is the same
+    with CaptureQueriesContext(connection) as ctx:
+        session.save()
+    assert ctx.captured_queries == []
+
+@pytest.mark.django_db
+def test_changed_session_is_written(stored_session):
+    session = SessionStore(stored_session)
+    session['cart'] = {'1': 3}
+    with CaptureQueriesContext(connection) as ctx:
+        session.save()
+    assert len(session_writes(ctx)) == 1
+    cache.clear()
+    assert SessionStore(stored_session)['cart'] == {'1': 3}  # Database fallback
+
+@pytest.mark.django_db
+def test_reads_come_from_cache(stored_session):
+    with CaptureQueriesContext(connection) as ctx:
+        assert SessionStore(stored_session)['cart'] == {'1': 2}
+    assert ctx.captured_queries == []
+
+@pytest.mark.django_db
+def test_old_unchanged_session_is_refreshed(stored_session, settings):
+    settings.SESSION_REFRESH_INTERVAL = 0
+    session = SessionStore(stored_session)
+    session.modified = True
+    with CaptureQueriesContext(connection) as ctx:
+        session.save()
+    assert len(session_writes(ctx)) == 1
+
+@pytest.mark.django_db
+def test_database_fallback_refreshes_custom_expiry(db):
+    session = SessionStore()
+    session['cart'] = {'1': 2}
+    session.set_expiry(session.get_session_cookie_age() * 2)  # expire_date says nothing about the write time
+    session.save()
+    cache.clear()
+
+    session = SessionStore(session.session_key)
+    session.modified = True
+    with CaptureQueriesContext(connection) as ctx:
+        session.save()
+    assert len(session_writes(ctx)) == 1
+    session = SessionStore(session.session_key)
+    session.modified = True
+    with CaptureQueriesContext(connection) as ctx:
+        session.save()
+    assert ctx.captured_queries == []  # The write time is in the cached record now
+
+@pytest.mark.django_db
+def test_deferred_keys_are_batched(stored_session, settings):
+    settings.SESSION_DEFERRED_KEYS = ['last_seen']
+    settings.SESSION_WRITE_BATCH = 1000
+    session = SessionStore(stored_session)
+    session['last_seen'] = 'now'
+    with CaptureQueriesContext(connection) as ctx:
+        session.save()
+    assert ctx.captured_queries == []
+    assert SessionStore(stored_session)['last_seen'] == 'now'  # Visible through the cache
+
+    assert sessions.flush_deferred() == 1
+    cache.clear()
+    assert SessionStore(stored_session)['last_seen'] == 'now'
+
+@pytest.mark.django_db
+def test_deferred_write_never_resurrects_deleted_session(stored_session, settings):
+    settings.SESSION_DEFERRED_KEYS = ['last_seen']
+    session = SessionStore(stored_session)
+    session['last_seen'] = 'now'
+    session.save()
+    Session.objects.filter(session_key=stored_session).delete()
+    sessions.flush_deferred()
+    assert not Session.objects.filter(session_key=stored_session).exists()
+
+@pytest.mark.django_db
+def test_purge_sessions_in_batches(stored_session):
+    past = timezone.now() - timedelta(days=1)
+    Session.objects.bulk_create([
+        Session(session_key=f'expired{i:03}', session_data='', expire_date=past) for i in range(25)
+    ])
+    call_command('purge_sessions', '--batch-size', '10')
+    assert Session.objects.count() == 1
+
+def test_engine_is_refused_with_a_local_memory_cache(settings):
+    from store.checks import check_session_cache
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'},
+        'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+    settings.SESSION_ENGINE = 'common.sessions'
+    settings.SESSION_CACHE_ALIAS = 'local'
+    assert [error.id for error in check_session_cache(None)] == ['store.E002']
+    settings.SESSION_CACHE_ALIAS = 'default'
+    assert check_session_cache(None) == []